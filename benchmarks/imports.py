@@ -0,0 +1,94 @@
+import argparse
+import ast
+import glob
+import json
+import os
+import subprocess
+import sys
+
+# Libraries whose import alone costs a noticeable part of a cold start; a page should only load them where it uses them
+HEAVY_MODULES = ['tensorflow', 'keras', 'torch', 'pytorch_tabnet', 'sklearn', 'sksurv', 'lifelines', 'statsmodels',
+                 'scipy', 'matplotlib', 'seaborn', 'plotly']
+
+# Functions that unpickle model stacks; a page should only call them once a prediction needs the models
+MODEL_LOADERS = ['load_models', 'load_artifact', 'load_variant']
+
+# Function to collect the module-level import statements of a page (what runs before it can draw anything)
+def page_imports(path):
+    with open(path, encoding='utf-8') as file:
+        tree = ast.parse(file.read(), filename=path)
+    return '\n'.join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+# Function to list the model loaders a page calls at module level, outside any branch or function. Only the imports
+# are timed, so these would run on every cold start without showing up in the seconds reported.
+def eager_loads(path):
+    with open(path, encoding='utf-8') as file:
+        tree = ast.parse(file.read(), filename=path)
+    calls = []
+    for node in tree.body:
+        if isinstance(node, (ast.Assign, ast.AnnAssign, ast.Expr)):
+            for call in ast.walk(node):
+                if isinstance(call, ast.Call):
+                    name = call.func.attr if isinstance(call.func, ast.Attribute) else getattr(call.func, 'id', None)
+                    if name in MODEL_LOADERS:
+                        calls.append(f"{name} (line {call.lineno})")
+    return calls
+
+# Function to parse the output of python -X importtime into {module: (self seconds, cumulative seconds, depth)}
+def parse_importtime(stderr):
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # One space after the separator, then two more per level of nesting
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules[name.strip()] = (int(self_us) / 1e6, int(cumulative_us) / 1e6, depth)
+    return modules
+
+# Function to import a page's modules in a fresh interpreter and report how long that took and which heavy libraries it loaded
+def measure_page(path, root):
+    source = page_imports(path)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', source], cwd=root, capture_output=True, text=True,
+                            env={**os.environ, 'PYTHONPATH': root})
+    if result.returncode != 0:
+        return {'page': os.path.basename(path), 'seconds': None, 'heavy': [], 'slowest': [], 'eager_loads': eager_loads(path),
+                'error': result.stderr.strip().splitlines()[-1]}
+    modules = parse_importtime(result.stderr)
+    # The outermost entries are the statements of the page itself; everything else is nested inside them
+    top_level = {name: cumulative for name, (_, cumulative, depth) in modules.items() if depth == 0}
+    heavy = {name: cumulative for name, (_, cumulative, _) in modules.items() if name in HEAVY_MODULES}
+    return {'page': os.path.basename(path), 'seconds': sum(top_level.values()),
+            'heavy': sorted(heavy, key=heavy.get, reverse=True),
+            'slowest': [(name, round(seconds, 3)) for name, seconds in sorted(top_level.items(), key=lambda item: -item[1])[:5]],
+            'eager_loads': eager_loads(path), 'error': None}
+
+def main(argv=None):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description='Time the module-level imports of every Streamlit page in a fresh interpreter.')
+    parser.add_argument('pages', nargs='*', help='Page files (default: Home.py and pages/*.py)')
+    parser.add_argument('--repeat', type=int, default=3, help='Fresh interpreters per page; the fastest is kept (default: 3)')
+    parser.add_argument('--output', default=None, help='Also write the JSON results here')
+    args = parser.parse_args(argv)
+
+    pages = args.pages or [os.path.join(root, 'Home.py')] + sorted(glob.glob(os.path.join(root, 'pages', '*.py')))
+    results = []
+    for page in pages:
+        runs = [measure_page(page, root) for _ in range(args.repeat)]
+        results.append(min(runs, key=lambda run: float('inf') if run['seconds'] is None else run['seconds']))
+    for result in results:
+        if result['error']:
+            print(f"{result['page']:<45} failed: {result['error']}")
+            continue
+        slowest = ', '.join(f"{name} {seconds:.2f}s" for name, seconds in result['slowest'])
+        print(f"{result['page']:<45} {result['seconds']:6.2f} s  heavy: {', '.join(result['heavy']) or '-'}  slowest: {slowest}")
+        if result['eager_loads']:
+            print(f"{'':<45} models loaded at module level (not timed): {', '.join(result['eager_loads'])}")
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f"Results written to {args.output}", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
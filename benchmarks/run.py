@@ -0,0 +1,180 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import synthetic
+
+# Function to describe the code and environment the numbers were measured on
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    import sklearn
+    return {'commit': commit, 'python': platform.python_version(), 'pandas': pd.__version__,
+            'numpy': np.__version__, 'sklearn': sklearn.__version__, 'machine': platform.machine(),
+            'cpus': os.cpu_count()}
+
+# Function to time a stage (best of repeat runs) and measure its peak traced memory in one more run
+def measure(stage, rows, func, repeat=1, memory=True):
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start_time = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start_time)
+    peak_mb = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        func()
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    seconds = min(timings)
+    return {'stage': stage, 'rows': rows, 'seconds': seconds, 'rows_per_second': rows / max(seconds, 1e-9), 'peak_mb': peak_mb}
+
+# Function to fit small stand-in models with the same inputs as FW_123.pkl / ttnf_rf_fw1.pkl
+def stand_in_models(seed=0, n_rows=5000):
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder
+
+    from pylife import cascade, ttnf
+
+    rng = np.random.default_rng(seed)
+
+    def forest(categorical):
+        encoder = ColumnTransformer([('onehot', OneHotEncoder(handle_unknown='ignore'), categorical)], remainder='passthrough')
+        return Pipeline([('encode', encoder), ('forest', RandomForestRegressor(n_estimators=100, max_depth=12, n_jobs=1, random_state=seed))])
+
+    inventory = synthetic.cascade_inventory(n_rows, seed)
+    inventory['Age at 1st Failure'] = rng.uniform(1, 40, n_rows)
+    inventory['Age at 2nd Failure'] = rng.uniform(1, 15, n_rows)
+    cascade_models = {}
+    for key, numerical, categorical in [('model_first_failure', cascade.numerical_features_model1, cascade.categorical_features_model1),
+                                        ('model_second_failure', cascade.numerical_features_model2, cascade.categorical_features_model2),
+                                        ('model_third_failure', cascade.numerical_features_model3, cascade.categorical_features_model3)]:
+        cascade_models[key] = forest(categorical).fit(inventory[numerical + categorical], rng.uniform(1, 40, n_rows))
+
+    segments = synthetic.ttnf_segments(n_rows, seed)
+    categorical_positions = [ttnf.required_columns.index(column) for column in ['FAULT_TYPE', 'Material', 'Urbanization', 'Soil Corrosivity']]
+    ttnf_models = {'ttnf': forest(categorical_positions).fit(np.array(segments[ttnf.required_columns]), rng.uniform(0, 10, n_rows))}
+    return cascade_models, ttnf_models
+
+# Function to load the shipped models when present, falling back to the stand-ins
+def benchmark_models(real_models):
+    from pylife.models import CASCADE_MODEL_PATH, TTNF_MODEL_PATH, load_models
+    if real_models and os.path.exists(CASCADE_MODEL_PATH) and os.path.exists(TTNF_MODEL_PATH):
+        return load_models(CASCADE_MODEL_PATH), load_models(TTNF_MODEL_PATH), 'shipped'
+    cascade_models, ttnf_models = stand_in_models()
+    return cascade_models, ttnf_models, 'stand-in'
+
+# Function to run every stage on synthetic tables of one size
+def run_size(n_rows, work_directory, models, repeat, memory):
+    import pylife.datasets
+    from pylife import cascade, ttnf
+    from pylife.cox import design_matrix, fit_cox
+    from pylife.metrics import FailureCube
+    from pylife.schema import SURVIVAL_SCHEMA, apply_schema
+    from pylife.survival import KaplanMeierCurves
+
+    cascade_models, ttnf_models = models
+    results = []
+
+    def add(stage, func, rows=n_rows):
+        result = measure(stage, rows, func, repeat, memory)
+        result['size'] = n_rows
+        results.append(result)
+        print(f"{n_rows:>9} {stage:<24} {result['seconds']:9.3f} s {result['rows_per_second']:>12,.0f} rows/s"
+              + (f" {result['peak_mb']:9.1f} MB" if result['peak_mb'] is not None else ''), file=sys.stderr)
+
+    # Load: raw CSV parsing (page 2 before the dataset cache) and the Parquet dataset cache
+    inventory_path = os.path.join(work_directory, f'inventory_{n_rows}.csv')
+    survival_path = os.path.join(work_directory, f'survival_{n_rows}.csv')
+    synthetic.cascade_inventory(n_rows).to_csv(inventory_path, index=False)
+    synthetic.survival_records(n_rows).to_csv(survival_path, index=False)
+    pylife.datasets.DATASET_CACHE_DIRECTORY = os.path.join(work_directory, 'dataset_cache')
+
+    add('read_csv_chunked', lambda: pd.concat(pd.read_csv(survival_path, chunksize=10000), ignore_index=True))
+
+    def load_cold():
+        cached = os.path.join(pylife.datasets.DATASET_CACHE_DIRECTORY, f"{pylife.datasets.content_sha256(survival_path)[:16]}.parquet")
+        if os.path.exists(cached):
+            os.remove(cached)
+        pylife.datasets.load_dataset(survival_path)
+    add('load_dataset_cold', load_cold)
+    add('load_dataset_warm', lambda: pylife.datasets.load_dataset(survival_path))
+
+    # Multi-file merge (page 2): per-file frames then pd.concat, against one pre-allocated pass
+    survival_cached = pylife.datasets.dataset_path(survival_path)
+    merge_columns = ['Duration', 'Status', 'LENGTH', 'Year', 'A_MAT']
+    add('concat_loaded_files', lambda: pd.concat([pylife.datasets.load_dataset(survival_path)[merge_columns] for _ in range(4)],
+                                                 ignore_index=True), rows=4 * n_rows)
+    add('combine_datasets', lambda: pylife.datasets.combine_datasets([survival_cached] * 4, merge_columns), rows=4 * n_rows)
+
+    # Preprocessing and survival fitting (page 3)
+    survival = pd.read_csv(survival_path)
+    add('apply_schema', lambda: apply_schema(survival, SURVIVAL_SCHEMA))
+    typed = apply_schema(survival, SURVIVAL_SCHEMA)
+    add('cox_design_matrix', lambda: design_matrix(typed))
+    add('kaplan_meier_all_levels', lambda: KaplanMeierCurves('A_MAT').update(typed).curves())
+    add('cox_fit', lambda: fit_cox(typed))
+
+    # Failure-rate metrics (page 4)
+    records = apply_schema(synthetic.failure_records(n_rows), {'FAULT_TYPE': 'category'})
+    add('failure_metrics', lambda: (lambda cube: (cube.metrics('A_MAT'), cube.heatmap('A_MAT')))(FailureCube(records)))
+
+    # Batch prediction (pages 5 and 6)
+    inventory = pd.read_csv(inventory_path)
+    add('cascade_predict', lambda: cascade.predict_failure_cascade(inventory.copy(), cascade_models))
+    segments = synthetic.ttnf_segments(n_rows)
+    add('ttnf_predict', lambda: ttnf.predict_batch(ttnf_models['ttnf'], segments[ttnf.required_columns]))
+    return results
+
+# Function to print how each stage changed against an earlier results file
+def compare(results, baseline_path):
+    with open(baseline_path) as file:
+        baseline = {(r['size'], r['stage']): r for r in json.load(file)['results']}
+    print(f"\n{'size':>9} {'stage':<24} {'before':>9} {'after':>9} {'speedup':>8}")
+    for result in results:
+        before = baseline.get((result['size'], result['stage']))
+        if before is not None:
+            print(f"{result['size']:>9} {result['stage']:<24} {before['seconds']:9.3f} {result['seconds']:9.3f} {before['seconds'] / max(result['seconds'], 1e-9):7.2f}x")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time loading, preprocessing, survival fitting and batch prediction on synthetic pipe inventories.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help='Rows per synthetic table (default: 10k 100k 1M)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per stage; the best is kept (default: 3)')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the extra traced run that measures peak memory')
+    parser.add_argument('--real-models', action='store_true', help='Use FW_123.pkl / ttnf_rf_fw1.pkl when present instead of stand-in forests')
+    parser.add_argument('--output', default='bench_results.json', help='Where to write the JSON results (default: bench_results.json)')
+    parser.add_argument('--compare', default=None, help='Earlier results file to compare against')
+    args = parser.parse_args(argv)
+
+    *models, model_source = benchmark_models(args.real_models)
+    results = []
+    with tempfile.TemporaryDirectory() as work_directory:
+        for n_rows in args.sizes:
+            results.extend(run_size(n_rows, work_directory, models, args.repeat, not args.no_memory))
+
+    report = {'environment': {**environment(), 'models': model_source}, 'results': results}
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
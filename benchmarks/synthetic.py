@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+# Levels seen in SampleData1.csv / Survival.csv / the failure record workbooks
+MATERIALS = ['DI', 'S', 'SS', 'PE', 'UPVC', 'AC', 'CI']
+LANDUSES = ['URBAN', 'RURAL', 'WATERBODY']
+LOCATIONS = ['CARRIAGEWAY', 'FOOTWAY', 'Other Location']
+CORROSIVITY = ['Non-Corrosive', 'Mildly Corrosive', 'Highly-Corrosive']
+FAULT_TYPES = ['BURST', 'LEAK']
+DEFECTS = ['C01', 'C02', 'C03', 'C04', 'C05', 'C06']
+DEFECT_NATURES = ['M', 'N', 'J']
+DISTRICTS = [f'D{i:02d}' for i in range(18)]
+
+# Function to generate a pipe inventory shaped like SampleData1.csv (input of the failure cascade)
+def cascade_inventory(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Year of Installation': rng.integers(1950, 2020, n_rows),
+        'SA': rng.gamma(2.0, 5.0, n_rows).round(6),
+        'AADT': rng.integers(500, 90000, n_rows).astype(float),
+        'PRESSURE(bar)': rng.uniform(0.5, 9.0, n_rows).round(2),
+        'MWI_1': rng.uniform(4.5, 6.5, n_rows).round(8),
+        'A_MAT': rng.choice(MATERIALS[:4], n_rows),
+        'LANDUSE': rng.choice(LANDUSES, n_rows),
+        'TYPE': rng.choice(LOCATIONS, n_rows),
+        'LPR_Corros': rng.choice(CORROSIVITY, n_rows),
+        'DEFECT1LV1': rng.choice(DEFECTS[:5], n_rows),
+        'DEF_NATURE': rng.choice(DEFECT_NATURES, n_rows),
+    })
+
+# Function to generate failure histories shaped like Survival.csv (input of page 3)
+def survival_records(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    year = rng.integers(1960, 2015, n_rows)
+    duration = rng.integers(1, 60, n_rows)
+    return pd.DataFrame({
+        'Duration': duration,
+        'Status': rng.integers(0, 2, n_rows),
+        'No. of previous failures': rng.poisson(1.0, n_rows),
+        'LENGTH': rng.gamma(1.5, 40.0, n_rows).round(3),
+        'A_DIAM': rng.choice([80, 100, 150, 200, 250, 300, 450], n_rows),
+        'Year': year,
+        'PRESSURE(bar)': rng.uniform(0.5, 9.0, n_rows).round(2),
+        'Failure Year': np.minimum(year + duration, 2023),
+        'AADT (traffic) ( When failure occurred )': rng.integers(500, 90000, n_rows).astype(float),
+        'Mean Dew Point (deg. C) ( When failure occurred )': rng.uniform(10, 25, n_rows).round(1),
+        'Mean Relative Humidity (%) ( When failure occurred )': rng.integers(60, 90, n_rows).astype(float),
+        'Total Rainfall (mm) ( When failure occurred )': np.where(rng.random(n_rows) < 0.3, np.nan, rng.gamma(2.0, 100.0, n_rows).round(1)),
+        'LANDUSE': rng.choice(LANDUSES, n_rows),
+        'LPR_Corros': rng.choice(CORROSIVITY, n_rows),
+        'A_MAT': rng.choice(MATERIALS[:5], n_rows),
+        'TYPE': rng.choice(LOCATIONS, n_rows),
+        'FAULT_TYPE': rng.choice(FAULT_TYPES + ['OTHERS'], n_rows, p=[0.6, 0.35, 0.05]),
+        'DEFECT1LV1': rng.choice(DEFECTS, n_rows),
+        'DEF_NATURE': rng.choice(DEFECT_NATURES, n_rows),
+    })
+
+# Function to generate failure records shaped like the page 4 workbooks
+def failure_records(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'LENGTH': rng.gamma(1.5, 40.0, n_rows).round(3),
+        'A_MAT': rng.choice(MATERIALS, n_rows),
+        'N_DISTRICT': rng.choice(DISTRICTS, n_rows),
+        'LANDUSE': rng.choice(LANDUSES, n_rows),
+        'Failure Year': rng.integers(2005, 2023, n_rows),
+        'FAULT_TYPE': rng.choice(FAULT_TYPES, n_rows, p=[0.4, 0.6]),
+    })
+
+# Function to generate segments shaped like the page 6 TTNF input
+def ttnf_segments(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Year of Installation': rng.integers(1950, 2020, n_rows),
+        'NOPF': rng.poisson(1.0, n_rows),
+        'APF': rng.uniform(0, 40, n_rows).round(2),
+        'Length': rng.gamma(1.5, 40.0, n_rows).round(3),
+        'Pressure': rng.uniform(0.5, 9.0, n_rows).round(2),
+        'FAULT_TYPE': rng.choice(FAULT_TYPES, n_rows),
+        'A_DIAM': rng.choice([80, 100, 150, 200, 250, 300], n_rows),
+        'Material': rng.choice(MATERIALS[:4], n_rows),
+        'Urbanization': rng.choice(LANDUSES[:2], n_rows),
+        'Soil Corrosivity': rng.choice(CORROSIVITY, n_rows),
+        'Latitude': rng.uniform(22.15, 22.55, n_rows).round(6),
+        'Longitude': rng.uniform(113.85, 114.35, n_rows).round(6),
+        'Effect of Traffic Load': rng.uniform(0, 1, n_rows).round(3),
+    })
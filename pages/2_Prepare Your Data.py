@@ -1,6 +1,12 @@
 import pandas as pd
 import streamlit as st
 import os
+from pylife.changes import diff_frames
+from pylife.datasets import combine_datasets, dataset_path
+from pylife.io import table_columns
+from pylife.instrumentation import timed
+from pylife.schema import optimize_dtypes
+from pylife.ui import timing_panel
 
 # Header
 st.header("Prepare the Data")
@@ -9,13 +15,10 @@ st.header("Prepare the Data")
 output_directory = "output_csv_files"
 os.makedirs(output_directory, exist_ok=True)
 
-# Function to load CSV data in chunks using pandas
-def load_csv_pandas(uploaded_file):
+# Function to spill an uploaded CSV to its Parquet copy on disk (parsed once per file content)
+def spill_csv(uploaded_file):
     try:
-        # Read CSV in chunks
-        chunks = pd.read_csv(uploaded_file, chunksize=10000)
-        df = pd.concat(chunks, ignore_index=True)
-        return df
+        return dataset_path(uploaded_file)
     except Exception as e:
         st.error(f"Error loading {uploaded_file.name}: {e}")
         return None
@@ -25,18 +28,18 @@ with st.sidebar.header('1. Upload your CSV files for Analysis'):
     uploaded_files = st.sidebar.file_uploader("Upload your input CSV files", type=["csv"], accept_multiple_files=True)
 
 if uploaded_files:
-    # Load all uploaded files using pandas
-    pandas_dfs = [load_csv_pandas(file) for file in uploaded_files if file is not None]
-    pandas_dfs = [df for df in pandas_dfs if df is not None]  # Filter out any None values
+    # Spill all uploaded files to disk; nothing is loaded into memory yet
+    dataset_paths = [spill_csv(file) for file in uploaded_files if file is not None]
+    dataset_paths = [path for path in dataset_paths if path is not None]  # Filter out any None values
     
-    if pandas_dfs:
+    if dataset_paths:
         st.sidebar.success("Files uploaded successfully!")
         st.write("Files loaded successfully!")
         
         st.header('2. Select Columns for Concatenation')
         
-        # Get common columns from all dataframes
-        common_columns = list(set.intersection(*(set(df.columns) for df in pandas_dfs)))
+        # Get common columns from the headers of all files
+        common_columns = list(set.intersection(*(set(table_columns(path)) for path in dataset_paths)))
         
         # Multi-select step for selecting columns
         concat_columns = st.multiselect('Select columns to concatenate on:', common_columns, default=common_columns)
@@ -44,8 +47,13 @@ if uploaded_files:
         if concat_columns:
             st.write("Columns selected for concatenation:", concat_columns)
             
-            # Concatenate dataframes on selected columns using pandas
-            concatenated_df = pd.concat([df[concat_columns] for df in pandas_dfs], axis=0, ignore_index=True)
+            # Read only the selected columns of each file straight into one pre-allocated frame
+            with timed('concat_uploads') as timing:
+                concatenated_df = combine_datasets(dataset_paths, concat_columns)
+                timing.rows = len(concatenated_df)
+
+            # Downcast integer columns; text stays plain so the editor accepts new values
+            concatenated_df = optimize_dtypes(concatenated_df, categorize=False)
             
             # Provide a summary of the concatenated dataframe
             st.write(f"Shape of concatenated dataframe: {concatenated_df.shape}")
@@ -53,7 +61,12 @@ if uploaded_files:
             
             # Use st.data_editor to explore the concatenated dataframe
             st.header('3. Explore and Edit Data')
-            edited_df = st.data_editor(concatenated_df, num_rows="dynamic")
+            edited_df = st.data_editor(concatenated_df, num_rows="dynamic", key="data_editor")
+
+            # The editor tracks edits against the concatenated frame by row position
+            editor_state = st.session_state.get("data_editor", {})
+            st.write(f"Pending edits: {len(editor_state.get('added_rows', []))} inserted, "
+                     f"{len(editor_state.get('edited_rows', {}))} modified, {len(editor_state.get('deleted_rows', []))} deleted rows")
             
             # Display the edited dataframe
             st.write("Edited Dataframe:")
@@ -62,7 +75,23 @@ if uploaded_files:
             # Button to save the edited dataframe to a CSV file
             if st.button('Save Edited CSV'):
                 output_file_path = os.path.join(output_directory, "edited_concatenated_data.csv")
-                edited_df.to_csv(output_file_path, index=False)
-                st.success(f"Edited data saved to {output_file_path}")
+                # Compare with the last save of the same concatenation, or with the upload itself on the first save
+                base_key = (tuple(concat_columns), int(pd.util.hash_pandas_object(concatenated_df).sum()))
+                saved = st.session_state.get("saved_edit")
+                base = saved[1] if saved is not None and saved[0] == base_key else concatenated_df
+                changes = diff_frames(base, edited_df)
+                if changes.empty and base is not concatenated_df:
+                    st.info("No changes since the last save.")
+                else:
+                    with timed('save_edited_csv', rows=len(edited_df)):
+                        edited_df.to_csv(output_file_path, index=False)
+                    summary = changes.summary()
+                    since = "the last save" if base is not concatenated_df else "the upload"
+                    st.success(f"Edited data saved to {output_file_path} ({summary['inserted']} inserted, "
+                               f"{summary['modified']} modified, {summary['deleted']} deleted rows since {since})")
+                    st.session_state["saved_edit"] = (base_key, edited_df.copy())
 else:
     st.info('Awaiting CSV files to be uploaded.')
+
+# Optional per-stage timing panel
+timing_panel()
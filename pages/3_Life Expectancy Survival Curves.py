@@ -1,23 +1,34 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-from lifelines import KaplanMeierFitter
-from sklearn.preprocessing import StandardScaler
-from sklearn.impute import SimpleImputer
-from sksurv.linear_model import CoxPHSurvivalAnalysis
-from sksurv.util import Surv
-import numpy as np
-
-# Load your data
-@st.cache_data
+from pylife.cox import cached_fit_cox
+from pylife.datasets import DATASET_CACHE_DIRECTORY, content_sha256
+from pylife.schema import CATEGORICAL_COLUMNS, SURVIVAL_SCHEMA, missing_columns
+from pylife.shared_cache import shared_dataset
+from pylife.forecast import DEFAULT_SCENARIOS, FailureForecast, cox_baseline, cox_multipliers, km_baselines
+from pylife.instrumentation import lazy_import, timed
+from pylife.priority import RANK_BY, cached_ranking
+from pylife.survival import KaplanMeierCurves
+from pylife import jobs
+from pylife.ui import job_panel, timing_panel, track_job
+
+# Load your data; every session shares one read-only copy per file content, so appended records are picked up
 def load_data(file_path):
     try:
-        data = pd.read_csv(file_path)
+        data = shared_dataset(file_path, schema=SURVIVAL_SCHEMA)
+        missing = missing_columns(data, SURVIVAL_SCHEMA)
+        if missing:
+            raise ValueError(f"missing columns {missing}")
         return data
     except Exception as e:
         st.error(f"Error loading data: {e}")
         return None
 
+# Function to keep one set of Kaplan-Meier curves per file and stratifying column, shared across reruns.
+# Each set holds the records it has counted, so only the most recently used ones are kept.
+@st.cache_resource(max_entries=16)
+def load_km_curves(file_path, group_column):
+    return KaplanMeierCurves(group_column)
+
 st.title('Kaplan-Meier Curves and Survival Regression for Water Pipeline Types')
 
 # Input for file path
@@ -27,76 +38,116 @@ if file_path:
     data = load_data(file_path)
 
     if data is not None:
+        # Curves for every level are computed in one pass and only updated for appended records
+        strata_options = [column for column in CATEGORICAL_COLUMNS if column in data.columns]
+        strata_column = st.selectbox('Stratify curves by', strata_options, index=strata_options.index('A_MAT'))
+        km_curves = load_km_curves(file_path, strata_column).sync(data)
+
         # Select pipeline types to compare
-        pipeline_types = st.multiselect('Select pipeline types', data['A_MAT'].unique())
+        label = 'Select pipeline types' if strata_column == 'A_MAT' else f'Select {strata_column} levels'
+        pipeline_types = st.multiselect(label, km_curves.levels())
 
+        cox_fit = None
         if pipeline_types:
-            plt.figure(figsize=(10, 6))
-
-            for pipeline_type in pipeline_types:
-                subset = data[data['A_MAT'] == pipeline_type]
-                kmf = KaplanMeierFitter()
-                kmf.fit(subset['Duration'], event_observed=subset['Status'], label=pipeline_type)
-                kmf.plot_survival_function()
-
-            plt.title('Kaplan-Meier Curves')
-            plt.xlabel('Time')
-            plt.ylabel('Survival Probability')
-            st.pyplot(plt)
-
-            # Define numerical features
-            numerical_cols = ['No. of previous failures', 'LENGTH', 'A_DIAM', 'Year', 'PRESSURE(bar)', 'Failure Year', 
-                              'AADT (traffic) ( When failure occurred )', 'Mean Dew Point (deg. C) ( When failure occurred )', 
-                              'Mean Relative Humidity (%) ( When failure occurred )', 'Total Rainfall (mm) ( When failure occurred )']
-
-            # Ensure all numerical columns are of numeric type
-            data[numerical_cols] = data[numerical_cols].apply(pd.to_numeric)
-
-            # One-hot encode categorical features
-            categorical_cols = ['A_MAT', 'LANDUSE', 'LPR_Corros', 'FAULT_TYPE', 'DEFECT1LV1', 'DEF_NATURE', 'TYPE']
-            data = pd.get_dummies(data, columns=categorical_cols)
-
-            # Convert boolean columns to integers
-            bool_cols = data.select_dtypes(include=['bool']).columns
-            data[bool_cols] = data[bool_cols].astype(int)
-
-            # Handle inf and NaN values
-            data.replace([np.inf, -np.inf], np.nan, inplace=True)
-            imputer = SimpleImputer(strategy='mean')
-            data[numerical_cols] = imputer.fit_transform(data[numerical_cols])
-
-            # Scale numerical features
-            scaler = StandardScaler()
-            data[numerical_cols] = scaler.fit_transform(data[numerical_cols])
-
-            # Prepare data for survival analysis
-            y = np.array([(event, time) for event, time in zip(data['Status'].astype(bool), data['Duration'])],
-                         dtype=[('Status', bool), ('Duration', float)])
-            X = data.drop(columns=['Status', 'Duration'])
-
-            # Run survival regression
+            with timed('render_km_plot'):
+                plt = lazy_import('matplotlib.pyplot')
+                plt.figure(figsize=(10, 6))
+
+                for pipeline_type in pipeline_types:
+                    curve = km_curves.curve(pipeline_type)
+                    line, = plt.step(curve.index, curve['survival'], where='post', label=pipeline_type)
+                    plt.fill_between(curve.index, curve['lower'], curve['upper'], step='post', alpha=0.3, color=line.get_color())
+
+                plt.title('Kaplan-Meier Curves')
+                plt.xlabel('Time')
+                plt.ylabel('Survival Probability')
+                plt.legend()
+                st.pyplot(plt)
+
+            # Run survival regression (fitted once per dataset version, independent of the selection above)
             st.subheader('Survival Regression and Risk Scores')
-            cph = CoxPHSurvivalAnalysis(0.1)
-            if data.isnull().values.any():
-                st.write("Data contains NaN values. Please clean your data before fitting the model.")
-            elif np.isinf(data.values).any():
-                st.write("Data contains infinite values. Please clean your data before fitting the model.")
-            else:
-                try:
-                    cph.fit(X, y)
-                    st.write("Model coefficients:")
-                    st.write(pd.DataFrame(cph.coef_, index=X.columns, columns=['Coefficient']))
-                except Exception as e:
-                    st.write(f"Error fitting CoxPHSurvivalAnalysis: {e}")
+            try:
+                data_hash = content_sha256(file_path)
+                cox_fit = cached_fit_cox(data, data_hash, source=file_path, spill_directory=DATASET_CACHE_DIRECTORY)
+                st.write("Model coefficients:")
+                st.write(cox_fit.coefficients())
 
                 # Calculate risk scores
-                try:
-                    data['risk_score'] = cph.predict(X)
-                except Exception as e:
-                    st.write(f"Error calculating risk scores: {e}")
+                data['risk_score'] = cox_fit.risk_scores
+
+                # Rank segments for replacement (sorted once per dataset, so changing the filters or budget is cheap)
+                st.subheader('Replacement Priorities')
+                ranking = cached_ranking(data, data_hash)
+                rank_labels = {'risk': 'Risk score', 'risk_per_km': 'Risk per km of pipe'}
+                rank_by = st.radio('Rank segments by', RANK_BY, format_func=rank_labels.get, horizontal=True)
+                filter_column = st.selectbox('Filter by', ['None'] + strata_options)
+                filters = {}
+                if filter_column != 'None':
+                    filter_levels = st.multiselect(f'{filter_column} levels', sorted(data[filter_column].dropna().unique()))
+                    if filter_levels:
+                        filters = {filter_column: filter_levels}
+                top_k = st.number_input('Number of segments', min_value=1, max_value=len(data), value=min(100, len(data)))
+                budget_km = st.number_input('Length budget (km, 0 for no budget)', min_value=0.0, value=0.0)
+                if budget_km > 0:
+                    priorities = ranking.within_budget(budget_km, filters, rank_by, k=top_k)
+                else:
+                    priorities = ranking.top_k(top_k, filters, rank_by)
+                total_km = priorities['cumulative_km'].iloc[-1] if len(priorities) else 0.0
+                st.write(f"{len(priorities)} segments, {total_km:.2f} km of pipe")
+                st.dataframe(priorities)
+                st.download_button('Download priorities', priorities.to_csv(index=False), 'replacement_priorities.csv', 'text/csv')
+            except Exception as e:
+                st.write(f"Error fitting CoxPHSurvivalAnalysis: {e}")
         else:
             st.write('Please select at least one pipeline type.')
+
+        # Expected failures per year across the network, simulated from the curves above or the Cox risk scores
+        st.subheader('Network Failure Forecast')
+        multipliers = None
+        if cox_fit is not None:
+            try:
+                multipliers = cox_multipliers(cox_fit)
+            except ValueError as e:
+                st.caption(f"The Cox regression is not offered for the forecast: {e}.")
+        forecast_methods = ['Kaplan-Meier curves'] + (['Cox regression'] if multipliers is not None else [])
+        forecast_method = st.radio('Forecast from', forecast_methods, horizontal=True,
+                                   help='Cox regression becomes available once the regression above has been fitted with usable risk scores')
+        group_options = [column for column in CATEGORICAL_COLUMNS + ['District', 'N_DISTRICT'] if column in data.columns and column != 'FAULT_TYPE']
+        forecast_groups = st.multiselect('Break down by', group_options, default=['A_MAT'] if 'A_MAT' in group_options else [])
+        cols = st.columns(2)
+        horizon = cols[0].number_input('Years ahead', min_value=1, max_value=50, value=10)
+        n_scenarios = cols[1].number_input('Scenarios', min_value=100, max_value=20000, value=DEFAULT_SCENARIOS, step=100)
+        if st.button('Run forecast'):
+            # Every record is a segment that has survived to its Duration
+            if forecast_method == 'Cox regression':
+                forecast = FailureForecast(data, cox_baseline(cox_fit), multipliers=multipliers, group_columns=forecast_groups)
+            else:
+                forecast = FailureForecast(data, km_baselines(km_curves), baseline_column=strata_column, group_columns=forecast_groups)
+            result = forecast.run(int(horizon), int(n_scenarios))
+            if forecast.n_skipped:
+                st.write(f"{forecast.n_skipped} records without a duration, risk score or curve were left out.")
+            totals = result.summary()
+            st.write('Expected failures across the network (with 5%, 50% and 95% scenario quantiles):')
+            st.dataframe(totals.unstack('Fault type'))
+            st.line_chart(totals['expected'].unstack('Fault type'))
+            for column in forecast_groups:
+                st.write(f'Expected failures by {column}:')
+                st.dataframe(result.summary(column).xs('All', level='Fault type')['expected'].unstack(column))
+            st.download_button('Download forecast', pd.concat([result.summary(column).reset_index().assign(Group=column)
+                                                              for column in [None] + forecast_groups]).to_csv(index=False),
+                               'failure_forecast.csv', 'text/csv')
+
+        # Long fits on large files can run in a worker process instead of blocking the page
+        with st.expander('Run fits in the background'):
+            if st.button('Queue Cox regression fit'):
+                track_job(jobs.submit('cox', file_path))
+            if st.button(f'Queue Kaplan-Meier curves by {strata_column}'):
+                track_job(jobs.submit('km', file_path, group_column=strata_column))
+        job_panel(kinds=('cox', 'km'))
     else:
         st.write('Failed to load data. Please check the file path and format.')
 else:
     st.write('Please enter a valid file path.')
+
+# Optional per-stage timing panel
+timing_panel()
@@ -1,35 +1,31 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from matplotlib.ticker import ScalarFormatter
+from pylife.datasets import content_sha256
+from pylife.figures import box_summary, cached_figure, mean_summary, plot_boxes, plot_mean_bars
+from pylife.instrumentation import lazy_import, timed
+from pylife.metrics import cached_failure_cube
+from pylife.schema import FAILURE_RECORD_SCHEMA, missing_columns
+from pylife.shared_cache import shared_dataset
+from pylife.ui import timing_panel
 
 st.set_page_config(page_title='Failure Rate and Time-to-Failure Trends in Hong Kong', layout='wide')
 
-# Function to calculate metrics
-@st.cache_data
-def calculate_metrics(df, index_var):
-    table_count = pd.pivot_table(df, values='LENGTH', index=[index_var, 'FAULT_TYPE'], aggfunc='count').unstack(fill_value=0)
-    table_sum = pd.pivot_table(df, values='LENGTH', index=index_var, aggfunc='sum')
-    table_sum[f'{index_var}_Km'] = table_sum['LENGTH'] / 1000
-    table_combined = pd.concat([table_count, table_sum], axis=1)
-    
-    if ('LENGTH', 'BURST') in table_combined.columns:
-        table_combined[f'bursts/km_{index_var}'] = table_combined[('LENGTH', 'BURST')] / table_combined[f'{index_var}_Km']
-    if ('LENGTH', 'LEAK') in table_combined.columns:
-        table_combined[f'leaks/km_{index_var}'] = table_combined[('LENGTH', 'LEAK')] / table_combined[f'{index_var}_Km']
-    
-    return table_combined
-
-# Function to load data
-@st.cache_data
+# Function to load data; every session shares one read-only copy per file content
 def load_data(uploaded_file):
     try:
-        return pd.read_excel(uploaded_file)
+        df = shared_dataset(uploaded_file, schema=FAILURE_RECORD_SCHEMA)
+        missing = missing_columns(df, FAILURE_RECORD_SCHEMA)
+        if missing:
+            raise ValueError(f"missing columns {missing}")
+        return df
     except Exception as e:
         st.error(f"Error loading file: {e}")
         return None
         
+# Plotting libraries, imported the first time a figure is actually drawn (cached figures never need them)
+def plotting():
+    return lazy_import('matplotlib.pyplot'), lazy_import('seaborn')
+
 # Streamlit app
 
 st.title('Failure Rate and Time-to-Failure Trends in Hong Kong')
@@ -40,10 +36,15 @@ uploaded_files = st.sidebar.file_uploader("Choose Excel files", accept_multiple_
 
 if uploaded_files:
     dataframes = []
+    cubes = {}
+    hashes = {}
     for uploaded_file in uploaded_files:
         df = load_data(uploaded_file)
         if df is not None:
             dataframes.append((uploaded_file.name, df))
+            # One failure-rate cube per file content; an edited re-upload only re-aggregates the changed rows
+            hashes[uploaded_file.name] = content_sha256(uploaded_file)
+            cubes[uploaded_file.name] = cached_failure_cube(df, hashes[uploaded_file.name], source=uploaded_file.name)
             st.sidebar.write(f"Uploaded file: {uploaded_file.name}")
             st.sidebar.dataframe(df.head())  # Display only the first few rows
 
@@ -67,86 +68,116 @@ if uploaded_files:
                 st.subheader('Data Analysis')
                 for file_name, df in dataframes:
                     if selected_var in df.columns:
-                        table_metrics = calculate_metrics(df, selected_var)
+                        table_metrics = cubes[file_name].metrics(selected_var)
                         st.subheader(f'Data Analysis for {file_name}')
                         st.dataframe(table_metrics)
 
+            # Figures are rendered once per dataset version and plot parameters, then shown from the PNG cache
             with tab2:
                 st.subheader('Bar Plot')
                 if comparison_type == 'Failure Rate':
                     for file_name, df in dataframes:
                         if selected_var in df.columns:
-                            table_metrics = calculate_metrics(df, selected_var)
                             st.write(f'Bar Plot for {file_name}')
-                            fig, ax = plt.subplots(figsize=(8, 4))
-                            if f'bursts/km_{selected_var}' in table_metrics.columns:
-                                sns.barplot(x=table_metrics.index, y=f'bursts/km_{selected_var}', data=table_metrics, ax=ax, palette="viridis")
-                                ax.set_ylabel('bursts/km')
-                            elif f'leaks/km_{selected_var}' in table_metrics.columns:
-                                sns.barplot(x=table_metrics.index, y=f'leaks/km_{selected_var}', data=table_metrics, ax=ax, palette="magma")
-                                ax.set_ylabel('leaks/km')
-                            ax.set_title(f'Bar Plot for {selected_var} in {file_name}')
-                            ax.set_xlabel(selected_var)
-                            st.pyplot(fig)
+
+                            def draw_bar_plot():
+                                plt, sns = plotting()
+                                table_metrics = cubes[file_name].metrics(selected_var)
+                                fig, ax = plt.subplots(figsize=(8, 4))
+                                if f'bursts/km_{selected_var}' in table_metrics.columns:
+                                    sns.barplot(x=table_metrics.index, y=f'bursts/km_{selected_var}', data=table_metrics, ax=ax, palette="viridis")
+                                    ax.set_ylabel('bursts/km')
+                                elif f'leaks/km_{selected_var}' in table_metrics.columns:
+                                    sns.barplot(x=table_metrics.index, y=f'leaks/km_{selected_var}', data=table_metrics, ax=ax, palette="magma")
+                                    ax.set_ylabel('leaks/km')
+                                ax.set_title(f'Bar Plot for {selected_var} in {file_name}')
+                                ax.set_xlabel(selected_var)
+                                return fig
+
+                            with timed('render_bar_plot'):
+                                st.image(cached_figure(('failure_rate_bar', hashes[file_name], file_name, selected_var), draw_bar_plot))
 
                     # Add a third chart for comparison of FW and SW
                     if len(dataframes) >= 2:
                         df1_name, df1 = dataframes[0]
                         df2_name, df2 = dataframes[1]
                         if selected_var in df1.columns and selected_var in df2.columns:
-                            table_metrics1 = calculate_metrics(df1, selected_var)
-                            table_metrics2 = calculate_metrics(df2, selected_var)
-                            combined_metrics = pd.concat([table_metrics1.assign(Dataset='FW'), table_metrics2.assign(Dataset='SW')])
-
                             st.write('Comparison of FW and SW')
-                            fig, ax = plt.subplots(figsize=(10, 6))
-                            if f'bursts/km_{selected_var}' in combined_metrics.columns:
-                                sns.barplot(x=combined_metrics.index, y=f'bursts/km_{selected_var}', hue='Dataset', data=combined_metrics, ax=ax, palette="viridis")
-                                ax.set_ylabel('bursts/km')
-                            elif f'leaks/km_{selected_var}' in combined_metrics.columns:
-                                sns.barplot(x=combined_metrics.index, y=f'leaks/km_{selected_var}', hue='Dataset', data=combined_metrics, ax=ax, palette="magma")
-                                ax.set_ylabel('leaks/km')
-                            ax.set_title(f'Comparison of FW and SW for {selected_var}')
-                            ax.set_xlabel(selected_var)
-                            st.pyplot(fig)
+
+                            def draw_comparison_plot():
+                                plt, sns = plotting()
+                                table_metrics1 = cubes[df1_name].metrics(selected_var)
+                                table_metrics2 = cubes[df2_name].metrics(selected_var)
+                                combined_metrics = pd.concat([table_metrics1.assign(Dataset='FW'), table_metrics2.assign(Dataset='SW')])
+                                fig, ax = plt.subplots(figsize=(10, 6))
+                                if f'bursts/km_{selected_var}' in combined_metrics.columns:
+                                    sns.barplot(x=combined_metrics.index, y=f'bursts/km_{selected_var}', hue='Dataset', data=combined_metrics, ax=ax, palette="viridis")
+                                    ax.set_ylabel('bursts/km')
+                                elif f'leaks/km_{selected_var}' in combined_metrics.columns:
+                                    sns.barplot(x=combined_metrics.index, y=f'leaks/km_{selected_var}', hue='Dataset', data=combined_metrics, ax=ax, palette="magma")
+                                    ax.set_ylabel('leaks/km')
+                                ax.set_title(f'Comparison of FW and SW for {selected_var}')
+                                ax.set_xlabel(selected_var)
+                                return fig
+
+                            with timed('render_bar_plot'):
+                                st.image(cached_figure(('failure_rate_comparison', hashes[df1_name], hashes[df2_name], selected_var), draw_comparison_plot))
                 else:
-                    combined_df = pd.concat([df.assign(Dataset=file_name) for file_name, df in dataframes])
-                    fig, ax = plt.subplots(figsize=(10, 6))
-                    sns.barplot(x='Failure Year', y='LENGTH', hue='Dataset', data=combined_df, ax=ax, palette="viridis")
-                    ax.set_title(f'Comparative Bar Plot for {selected_var}')
-                    ax.set_xlabel('Failure Year')
-                    ax.set_ylabel('LENGTH')
-                    st.pyplot(fig)
+                    # Mean length per failure year with a 95% interval, from per-file summaries rather than every record.
+                    # It does not depend on the selected variable, so neither does its title or its cache key.
+                    def draw_time_to_failure_plot():
+                        plt = lazy_import('matplotlib.pyplot')
+                        summary = pd.concat([mean_summary(df, 'Failure Year', 'LENGTH').assign(Dataset=file_name) for file_name, df in dataframes])
+                        fig, ax = plt.subplots(figsize=(10, 6))
+                        plot_mean_bars(ax, summary, 'Failure Year', hue='Dataset', palette="viridis")
+                        ax.set_title('Comparative Bar Plot of LENGTH by Failure Year')
+                        ax.set_xlabel('Failure Year')
+                        ax.set_ylabel('LENGTH')
+                        return fig
+
+                    with timed('render_bar_plot'):
+                        key = ('time_to_failure_bar', tuple((file_name, hashes[file_name]) for file_name, _ in dataframes))
+                        st.image(cached_figure(key, draw_time_to_failure_plot))
 
             with tab3:
                 st.subheader('Box Plot')
                 for file_name, df in dataframes:
                     if selected_var in df.columns:
-                        fig, ax = plt.subplots(figsize=(8, 4))
-                        sns.boxplot(data=df, x=selected_var, y='LENGTH', hue='FAULT_TYPE', ax=ax)
-                        ax.set_title(f'Box Plot for {selected_var} in {file_name}')
-                        ax.set_xlabel(selected_var)
-                        ax.set_ylabel('Length')
-                        st.pyplot(fig)
+                        # Quartiles, whiskers and a capped sample of outliers per box instead of every record
+                        def draw_box_plot():
+                            plt = lazy_import('matplotlib.pyplot')
+                            stats, fliers = box_summary(df, selected_var, 'LENGTH', hue='FAULT_TYPE')
+                            fig, ax = plt.subplots(figsize=(8, 4))
+                            plot_boxes(ax, stats, fliers, selected_var, 'LENGTH', hue='FAULT_TYPE')
+                            ax.set_title(f'Box Plot for {selected_var} in {file_name}')
+                            ax.set_xlabel(selected_var)
+                            ax.set_ylabel('Length')
+                            return fig
+
+                        with timed('render_box_plot'):
+                            st.image(cached_figure(('box', hashes[file_name], file_name, selected_var), draw_box_plot))
 
             with tab4:
                 st.subheader('Heatmap')
                 for file_name, df in dataframes:
                     if selected_var in df.columns:
-                        failure_counts = df.pivot_table(values='LENGTH', index='Failure Year', columns=selected_var, aggfunc='count').fillna(0)
-                        total_lengths = df.groupby(selected_var)['LENGTH'].sum()
-                        heatmap_data = failure_counts.div(total_lengths, axis=1) * 100  # Scaling factor
-
-                        fig, ax = plt.subplots(figsize=(10, 6))
-                        sns.heatmap(heatmap_data, annot=True, cmap='coolwarm', ax=ax)
-                        cbar = ax.collections[0].colorbar
-                        cbar.set_label('Failures per km (x10^-2)')
-                        cbar.ax.yaxis.set_major_formatter(ScalarFormatter())
-                        cbar.ax.yaxis.set_major_formatter(ScalarFormatter(useMathText=True))
-                        cbar.ax.yaxis.get_offset_text().set_position((-0.1, 0))
-                        cbar.ax.yaxis.get_offset_text().set_fontsize(10)
-                        ax.set_title(f'Heatmap for {selected_var} in {file_name} by Year')
-                        st.pyplot(fig)
+                        def draw_heatmap():
+                            plt, sns = plotting()
+                            heatmap_data = cubes[file_name].heatmap(selected_var, scale=100)  # Scaling factor
+                            fig, ax = plt.subplots(figsize=(10, 6))
+                            sns.heatmap(heatmap_data, annot=True, cmap='coolwarm', ax=ax)
+                            cbar = ax.collections[0].colorbar
+                            cbar.set_label('Failures per km (x10^-2)')
+                            ScalarFormatter = lazy_import('matplotlib.ticker').ScalarFormatter
+                            cbar.ax.yaxis.set_major_formatter(ScalarFormatter())
+                            cbar.ax.yaxis.set_major_formatter(ScalarFormatter(useMathText=True))
+                            cbar.ax.yaxis.get_offset_text().set_position((-0.1, 0))
+                            cbar.ax.yaxis.get_offset_text().set_fontsize(10)
+                            ax.set_title(f'Heatmap for {selected_var} in {file_name} by Year')
+                            return fig
+
+                        with timed('render_heatmap'):
+                            st.image(cached_figure(('heatmap', hashes[file_name], file_name, selected_var), draw_heatmap))
                     else:
                         st.error(f"Selected variable '{selected_var}' not found in one of the datasets")
         else:
@@ -154,4 +185,7 @@ if uploaded_files:
     else:
         st.error(f"The variable '{selected_var}' is not found in the uploaded file.")
 else:
-    st.error("Failed to load the file. Please check the file format and try again.") 
+    st.error("Failed to load the file. Please check the file format and try again.")
+
+# Optional per-stage timing panel
+timing_panel()
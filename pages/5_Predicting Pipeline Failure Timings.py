@@ -1,25 +1,34 @@
 import streamlit as st
-import pickle
+import time
 import pandas as pd
-import plotly.express as px
-
-# Function to make predictions
-def predict_failure(model, input_data, numerical_features, categorical_features):
-    columns = numerical_features + categorical_features
-    input_df = pd.DataFrame([input_data], columns=columns)
-    return model.predict(input_df)[0]
+import pylife
+from pylife.instrumentation import lazy_import, timed
+from pylife.intervals import DEFAULT_SAMPLES, cascade_intervals
+from pylife.schema import CASCADE_INPUT_SCHEMA
+from pylife.shared_cache import shared_dataset
+from pylife import jobs
+from pylife.ui import cache_report, job_panel, timing_panel, track_job
+from pylife.registry import artifact_path
+from pylife.parallel import predict_parallel, predict_parallel_stream
+from pylife.prediction_cache import get_cache
+from pylife.cascade import (PREDICTION_COLUMNS, predict_failure, predict_failure_cascade, predict_failure_stream,
+                            numerical_features_model1, categorical_features_model1,
+                            numerical_features_model2, categorical_features_model2,
+                            numerical_features_model3, categorical_features_model3)
 
 # Function to load the models
 @st.cache_resource
 def load_models(model_path):
-    with open(model_path, 'rb') as file:
-        return pickle.load(file)
+    return pylife.load_models(model_path)
+
+# Models from the promoted retrained version if there is one; they are loaded when a prediction first needs them
+CASCADE_MODEL_PATH = artifact_path('cascade')
 
-# Load all models
-models = load_models('FW_123.pkl')
-model_first_failure = models['model_first_failure']
-model_second_failure = models['model_second_failure']
-model_third_failure = models['model_third_failure']
+# Predictions already made by this model version, so repeated queries and re-uploads only score new or edited rows
+cascade_cache = get_cache('cascade', CASCADE_MODEL_PATH, PREDICTION_COLUMNS)
+first_failure_cache = get_cache('first_failure', CASCADE_MODEL_PATH, ['First Failure Prediction'])
+second_failure_cache = get_cache('second_failure', CASCADE_MODEL_PATH, ['Second Failure Prediction'])
+third_failure_cache = get_cache('third_failure', CASCADE_MODEL_PATH, ['Third Failure Prediction'])
 
 # Streamlit app
 st.title("Single Point Prediction")
@@ -27,16 +36,6 @@ st.title("Single Point Prediction")
 # Tabs for different failure predictions
 tab1, tab2, tab3 = st.tabs(["Time to First Failure", "Time to Second Failure", "Time to Third Failure"])
 
-# Features for each model
-numerical_features_model1 = ['Year of Installation', 'SA', 'PRESSURE(bar)', 'AADT','MWI_1']
-categorical_features_model1 = ['A_MAT', 'LANDUSE', 'TYPE', 'LPR_Corros']
-
-numerical_features_model2 = ['Year of Installation', 'Age at 1st Failure', 'SA', 'PRESSURE(bar)', 'AADT','MWI_1']
-categorical_features_model2 = ['A_MAT', 'LANDUSE', 'TYPE', 'LPR_Corros']
-
-numerical_features_model3 = ['Age at 1st Failure', 'Age at 2nd Failure', 'SA', 'PRESSURE(bar)', 'AADT','MWI_1']
-categorical_features_model3 = ['A_MAT', 'LANDUSE', 'TYPE', 'LPR_Corros']
-
 def input_form(numerical_features, categorical_features, key_prefix):
     inputs = {}
     cols = st.columns(2)
@@ -65,21 +64,21 @@ with tab1:
     st.header("Time to First Failure Prediction")
     input_data = input_form(numerical_features_model1, categorical_features_model1, "first_failure")
     if st.button("Predict First Failure", key="first_failure_button"):
-        prediction = predict_failure(model_first_failure, list(input_data.values()), numerical_features_model1, categorical_features_model1)
+        prediction = predict_failure(load_models(CASCADE_MODEL_PATH)['model_first_failure'], list(input_data.values()), numerical_features_model1, categorical_features_model1, first_failure_cache)
         st.success(f"Predicted time to first failure: {prediction}")
 
 with tab2:
     st.header("Time to Second Failure Prediction")
     input_data = input_form(numerical_features_model2, categorical_features_model2, "second_failure")
     if st.button("Predict Second Failure", key="second_failure_button"):
-        prediction = predict_failure(model_second_failure, list(input_data.values()), numerical_features_model2, categorical_features_model2)
+        prediction = predict_failure(load_models(CASCADE_MODEL_PATH)['model_second_failure'], list(input_data.values()), numerical_features_model2, categorical_features_model2, second_failure_cache)
         st.success(f"Predicted time to second failure: {prediction}")
 
 with tab3:
     st.header("Time to Third Failure Prediction")
     input_data = input_form(numerical_features_model3, categorical_features_model3, "third_failure")
     if st.button("Predict Third Failure", key="third_failure_button"):
-        prediction = predict_failure(model_third_failure, list(input_data.values()), numerical_features_model3, categorical_features_model3)
+        prediction = predict_failure(load_models(CASCADE_MODEL_PATH)['model_third_failure'], list(input_data.values()), numerical_features_model3, categorical_features_model3, third_failure_cache)
         st.success(f"Predicted time to third failure: {prediction}")
 
 # Section for CSV upload and batch prediction
@@ -87,7 +86,20 @@ st.header("Batch Prediction from CSV")
 
 uploaded_file = st.file_uploader("Upload your CSV file", type=["csv"])
 if uploaded_file is not None:
-    data = pd.read_csv(uploaded_file)
+    stream_mode = st.checkbox("Stream large files in chunks", help="Read, predict and save the file one chunk at a time to keep memory use bounded")
+    chunk_size = st.number_input("Rows per chunk", min_value=1000, value=50000, step=1000, disabled=not stream_mode)
+    parallel_mode = st.checkbox("Score in parallel across CPU cores", help="Split the rows into shards and score them in a pool of worker processes")
+    background_mode = st.checkbox("Run in the background", help="Queue the file as a job that keeps running while you use the app; progress and the download appear below")
+    interval_mode = st.checkbox("Add prediction intervals", help="Propagate the spread of each model's trees through the cascade with Monte Carlo draws (whole-file scoring only)")
+    interval_level = st.slider("Interval level", min_value=0.5, max_value=0.99, value=0.9, disabled=not interval_mode)
+    n_draws = st.number_input("Monte Carlo draws", min_value=20, max_value=1000, value=DEFAULT_SAMPLES, step=10, disabled=not interval_mode)
+    if stream_mode:
+        # Only the header and a few rows are needed for the preview and column checks
+        data = pd.read_csv(uploaded_file, nrows=5)
+        uploaded_file.seek(0)
+    else:
+        # Shared read-only copy per file content; the prediction columns are added to this session's view only
+        data = shared_dataset(uploaded_file, schema=CASCADE_INPUT_SCHEMA)
     st.write("Data Preview:")
     st.write(data.head())
 
@@ -107,22 +119,53 @@ if uploaded_file is not None:
             st.error(f"The uploaded CSV is missing the following columns for the second failure prediction: {missing_columns_model2 - {'Age at 1st Failure'}}")
         elif missing_columns_model3 - {'Age at 1st Failure', 'Age at 2nd Failure'}:
             st.error(f"The uploaded CSV is missing the following columns for the third failure prediction: {missing_columns_model3 - {'Age at 1st Failure', 'Age at 2nd Failure'}}")
+        elif background_mode:
+            # The job streams the file through the models in a worker process
+            uploaded_file.seek(0)
+            job_id = jobs.submit('cascade', uploaded_file, model_path=CASCADE_MODEL_PATH, chunk_size=int(chunk_size))
+            track_job(job_id)
+            st.success(f"Queued job {job_id}")
+        elif stream_mode:
+            # Predict chunk by chunk and append each chunk to predictions.csv
+            progress_bar = st.progress(0.0)
+            start_time = time.perf_counter()
+            rows_done = 0
+            cache_before = cascade_cache.stats()
+            if parallel_mode:
+                progress = predict_parallel_stream(uploaded_file, "predictions.csv", int(chunk_size), 'cascade', CASCADE_MODEL_PATH)
+            else:
+                progress = predict_failure_stream(uploaded_file, "predictions.csv", int(chunk_size), load_models(CASCADE_MODEL_PATH), cascade_cache)
+            for rows_done in progress:
+                progress_bar.progress(min(uploaded_file.tell() / max(uploaded_file.size, 1), 1.0), text=f"Scored {rows_done} rows")
+            progress_bar.progress(1.0, text=f"Scored {rows_done} rows")
+            elapsed = time.perf_counter() - start_time
+            st.write(f"Scored {rows_done} rows in {elapsed:.2f} s ({rows_done / max(elapsed, 1e-9):,.0f} rows/s)")
+            if not parallel_mode:
+                cache_report(cascade_cache, cache_before)
+            st.success("Predictions saved to predictions.csv")
+
+            # Display the first rows of the streamed output
+            st.write("Predictions (first rows):")
+            st.write(pd.read_csv("predictions.csv", nrows=1000))
         else:
-            # Predict first failure
-            data['First Failure Prediction'] = data.apply(lambda row: predict_failure(model_first_failure, row[numerical_features_model1 + categorical_features_model1], numerical_features_model1, categorical_features_model1), axis=1)
-            
-            # Prepare data for second failure prediction
-            data['Age at 1st Failure'] = data['First Failure Prediction']
-            
-            # Predict second failure
-            data['Second Failure Prediction'] = data.apply(lambda row: predict_failure(model_second_failure, row[numerical_features_model2 + categorical_features_model2], numerical_features_model2, categorical_features_model2), axis=1)
-            
-            # Prepare data for third failure prediction
-            data['Age at 2nd Failure'] = data['Second Failure Prediction']
-            
-            # Predict third failure
-            data['Third Failure Prediction'] = data.apply(lambda row: predict_failure(model_third_failure, row[numerical_features_model3 + categorical_features_model3], numerical_features_model3, categorical_features_model3), axis=1)
-            
+            # Run the three models once each over the whole file
+            start_time = time.perf_counter()
+            cache_before = cascade_cache.stats()
+            if parallel_mode:
+                data = predict_parallel(data, 'cascade', CASCADE_MODEL_PATH, cache=cascade_cache)
+            else:
+                data = predict_failure_cascade(data, load_models(CASCADE_MODEL_PATH), cascade_cache)
+            elapsed = time.perf_counter() - start_time
+            st.write(f"Scored {len(data)} rows in {elapsed:.2f} s ({len(data) / max(elapsed, 1e-9):,.0f} rows/s)")
+            cache_report(cascade_cache, cache_before)
+
+            if interval_mode:
+                # Lower and upper bounds for every prediction, with first-failure uncertainty carried into the later models
+                try:
+                    data = cascade_intervals(data, load_models(CASCADE_MODEL_PATH), interval_level, int(n_draws))
+                except NotImplementedError as e:
+                    st.warning(f"Prediction intervals are not available for these models: {e}")
+
             # Display final data with predictions
             st.write("Predictions:")
             st.write(data)
@@ -132,9 +175,14 @@ if uploaded_file is not None:
             st.success("Predictions saved to predictions.csv")
             
             # Visualization
-            fig = px.scatter(data, x='Year of Installation', y=['First Failure Prediction', 'Second Failure Prediction', 'Third Failure Prediction'], 
-                             labels={'value': 'Time to Failure', 'variable': 'Failure Type'}, title="Failure Predictions")
-            st.plotly_chart(fig)
+            with timed('render_prediction_plot', rows=len(data)):
+                px = lazy_import('plotly.express')
+                fig = px.scatter(data, x='Year of Installation', y=['First Failure Prediction', 'Second Failure Prediction', 'Third Failure Prediction'], 
+                                 labels={'value': 'Time to Failure', 'variable': 'Failure Type'}, title="Failure Predictions")
+                st.plotly_chart(fig)
+
+# Progress and results of the batch jobs queued from this page
+job_panel(kinds=('cascade',))
 
 # Sidebar for surface area calculation
 st.sidebar.header("Calculate Surface Area")
@@ -147,3 +195,6 @@ if st.sidebar.button("Calculate Surface Area"):
     radius = width / 2
     surface_area = 2 * 3.14159 * radius * (radius + length)
     st.sidebar.write(f"The surface area of the pipe is: {surface_area:.2f} square meters.")
+
+# Optional per-stage timing panel
+timing_panel()
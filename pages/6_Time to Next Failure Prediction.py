@@ -1,60 +1,164 @@
-import numpy as np
+import os
+import time
 import pandas as pd
-import pickle
 import streamlit as st
+import pylife
+from pylife.datasets import content_sha256
+from pylife.instrumentation import lazy_import, timed
+from pylife.intervals import predict_intervals
+from pylife.registry import artifact_path, file_sha256
+from pylife.schema import TTNF_INPUT_SCHEMA
+from pylife.shared_cache import shared_dataset
+from pylife.parallel import predict_parallel, predict_parallel_stream
+from pylife.prediction_cache import get_cache
+from pylife.spatial import cached_spatial_index, summarize
+from pylife.ttnf import predict_batch, predict_stream, required_columns
+from pylife import jobs
+from pylife.ui import cache_report, job_panel, timing_panel, track_job
 
 st.header("Sequential Leak Prediction")
 
 # Function to load the models
 @st.cache_resource
 def load_models(model_path):
-    with open(model_path, 'rb') as file:
-        return pickle.load(file)
+    return pylife.load_models(model_path, column_names=required_columns)
 
-# Load all models
-model_path = 'ttnf_rf_fw1.pkl'
-models = load_models(model_path)
-model = models['ttnf']
+# Model from the promoted retrained version if there is one; it is loaded when a prediction first needs it
+model_path = artifact_path('ttnf_rf')
 
-# Define a function for prediction
-def predict(features):
-    features = np.array(features).reshape(1, -1)
-    prediction = model.predict(features)
-    return prediction[0]
+# Predictions already made by this model version, so re-uploads only score new or edited rows
+ttnf_cache = get_cache('ttnf', model_path, ['Prediction'])
 
 # Streamlit app layout
 st.title('Batch Prediction from CSV')
 
+# Specify the directory where the predictions will be saved
+output_directory = "output_csv_files"
+os.makedirs(output_directory, exist_ok=True)
+
 # File uploader
 uploaded_file = st.file_uploader("Choose a CSV file", type="csv")
 
 if uploaded_file is not None:
+    stream_mode = st.checkbox("Stream large files in chunks", help="Read, predict and save the file one chunk at a time to keep memory use bounded")
+    chunk_size = st.number_input("Rows per chunk", min_value=1000, value=50000, step=1000, disabled=not stream_mode)
+    parallel_mode = st.checkbox("Score in parallel across CPU cores", help="Split the rows into shards and score them in a pool of worker processes")
+    background_mode = st.checkbox("Run in the background", help="Queue the file as a job that keeps running while you use the app; progress and the download appear below")
+    interval_mode = st.checkbox("Add prediction intervals", help="Bound every prediction by the spread of the forest's trees (whole-file scoring only)")
+    interval_level = st.slider("Interval level", min_value=0.5, max_value=0.99, value=0.9, disabled=not interval_mode)
+
     # Read the CSV file
-    data = pd.read_csv(uploaded_file)
+    if stream_mode:
+        # Only the header and a few rows are needed for the preview and column checks
+        data = pd.read_csv(uploaded_file, nrows=5)
+        uploaded_file.seek(0)
+    else:
+        # Shared read-only copy per file content; the prediction columns are added to this session's view only
+        data = shared_dataset(uploaded_file, schema=TTNF_INPUT_SCHEMA)
     
     # Display the data
     st.write("Data Preview:")
     st.write(data.head())
     
     # Ensure the required columns are present
-    required_columns = ['Year of Installation', 'NOPF', 'APF', 'Length', 'Pressure',
-                        'FAULT_TYPE', 'A_DIAM', 'Material', 'Urbanization', 'Soil Corrosivity',
-                        'Latitude', 'Longitude', 'Effect of Traffic Load']
-    
     if all(column in data.columns for column in required_columns):
-        # Extract features
-        features = data[required_columns]
-        
-        # Make predictions
-        predictions = features.apply(lambda row: predict(row), axis=1)
-        
-        # Add predictions to the DataFrame
-        data['Prediction'] = predictions
-        
-        # Display the predictions
-        st.write("Predictions:")
-        st.write(data)
+        if background_mode:
+            if st.button("Queue prediction job"):
+                # The job streams the file through the model in a worker process
+                job_id = jobs.submit('ttnf', uploaded_file, model_path=model_path, output_name="ttnf_predictions.csv", chunk_size=int(chunk_size))
+                track_job(job_id)
+                st.success(f"Queued job {job_id}")
+        elif stream_mode:
+            if st.button("Stream predictions to CSV"):
+                # Predict chunk by chunk and append each chunk to the output file
+                output_file_path = os.path.join(output_directory, "ttnf_predictions.csv")
+                progress_bar = st.progress(0.0)
+                start_time = time.perf_counter()
+                rows_done = 0
+                cache_before = ttnf_cache.stats()
+                if parallel_mode:
+                    progress = predict_parallel_stream(uploaded_file, output_file_path, int(chunk_size), 'ttnf', model_path)
+                else:
+                    progress = predict_stream(uploaded_file, output_file_path, int(chunk_size), load_models(model_path)['ttnf'], ttnf_cache)
+                for rows_done in progress:
+                    progress_bar.progress(min(uploaded_file.tell() / max(uploaded_file.size, 1), 1.0), text=f"Scored {rows_done} rows")
+                progress_bar.progress(1.0, text=f"Scored {rows_done} rows")
+                elapsed = time.perf_counter() - start_time
+                st.write(f"Scored {rows_done} rows in {elapsed:.2f} s ({rows_done / max(elapsed, 1e-9):,.0f} rows/s)")
+                if not parallel_mode:
+                    cache_report(ttnf_cache, cache_before)
+                st.success(f"Predictions saved to {output_file_path}")
+
+                # Display the first rows of the streamed output
+                st.write("Predictions (first rows):")
+                st.write(pd.read_csv(output_file_path, nrows=1000))
+        else:
+            cache_before = ttnf_cache.stats()
+            if parallel_mode:
+                # Score shards of rows in worker processes, each holding its own copy of the model
+                data = predict_parallel(data, 'ttnf', model_path, cache=ttnf_cache)
+            else:
+                # Extract features
+                features = data[required_columns]
+
+                # Make predictions for all rows not already in the cache in one model call
+                data['Prediction'] = predict_batch(load_models(model_path)['ttnf'], features, ttnf_cache)
+            cache_report(ttnf_cache, cache_before)
+
+            if interval_mode:
+                # Lower and upper bounds from the individual trees' predictions
+                try:
+                    data['Prediction Lower'], data['Prediction Upper'] = predict_intervals(load_models(model_path)['ttnf'], data[required_columns], interval_level)
+                except NotImplementedError as e:
+                    st.warning(f"Prediction intervals are not available for this model: {e}")
+            
+            # Display the predictions
+            st.write("Predictions:")
+            st.write(data)
+
+            # Hotspot map, area queries and per-region summaries, all served from the spatial index
+            st.header("Spatial Summary")
+            cell_size = st.number_input("Grid cell size (degrees)", min_value=0.001, max_value=1.0, value=0.01, step=0.005, format="%.3f")
+            # Indexed once per uploaded file, model version and cell size, and dropped along with the file's shared frame
+            spatial_index = cached_spatial_index(data, content_sha256(uploaded_file), file_sha256(model_path), cell_size)
+            cells = spatial_index.cells()
+            with timed('render_hotspot_map', rows=len(cells)):
+                px = lazy_import('plotly.express')
+                fig = px.scatter(cells, x='Longitude', y='Latitude', color='mean', size='segments', color_continuous_scale='RdYlGn',
+                                 labels={'mean': 'Mean predicted TTNF'}, title="Predicted time to next failure per grid cell")
+                st.plotly_chart(fig)
+
+            query_mode = st.radio("Find segments", ["In a bounding box", "Within a radius"], horizontal=True)
+            cols = st.columns(4 if query_mode == "In a bounding box" else 3)
+            if query_mode == "In a bounding box":
+                min_lat = cols[0].number_input("Min latitude", value=float(cells['Latitude'].min() - cell_size / 2), format="%.4f")
+                min_lon = cols[1].number_input("Min longitude", value=float(cells['Longitude'].min() - cell_size / 2), format="%.4f")
+                max_lat = cols[2].number_input("Max latitude", value=float(cells['Latitude'].max() + cell_size / 2), format="%.4f")
+                max_lon = cols[3].number_input("Max longitude", value=float(cells['Longitude'].max() + cell_size / 2), format="%.4f")
+                area = spatial_index.bbox(min_lat, min_lon, max_lat, max_lon)
+            else:
+                centre_lat = cols[0].number_input("Latitude", value=float(cells['Latitude'].mean()), format="%.4f")
+                centre_lon = cols[1].number_input("Longitude", value=float(cells['Longitude'].mean()), format="%.4f")
+                radius_km = cols[2].number_input("Radius (km)", min_value=0.0, value=1.0)
+                area = spatial_index.within_radius(centre_lat, centre_lon, radius_km)
+            summary = summarize(area)
+            st.write(f"{summary['segments']} segments, predicted time to next failure: mean {summary['mean']:.2f}, "
+                     f"min {summary['min']:.2f}, max {summary['max']:.2f}")
+            st.dataframe(area)
+
+            region_columns = [column for column in data.columns if column != 'Prediction' and not pd.api.types.is_numeric_dtype(data[column])]
+            if region_columns:
+                region_column = st.selectbox("Summarize by region", region_columns,
+                                             index=region_columns.index('District') if 'District' in region_columns else 0)
+                st.dataframe(spatial_index.regions(region_column))
     else:
-        st.error(f"Expected {len(required_columns)} features, but got {features.shape[1]}. Please check the input data.")
+        missing_columns = [column for column in required_columns if column not in data.columns]
+        st.error(f"Expected {len(required_columns)} features, but {len(missing_columns)} are missing: {missing_columns}. Please check the input data.")
 else:
     st.error("The uploaded CSV file does not contain all the required columns.")
+
+# Progress and results of the prediction jobs queued from this page
+job_panel(kinds=('ttnf',))
+
+# Optional per-stage timing panel
+timing_panel()
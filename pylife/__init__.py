@@ -0,0 +1,6 @@
+# Headless prediction pipelines shared by the Streamlit pages and the command line.
+# Only pylife.ui, which the pages use, imports streamlit; pylife.figures imports matplotlib and seaborn inside the
+# functions that draw, so importing the package (e.g. from the command line) loads no plotting library.
+from pylife.models import load_models
+from pylife.cascade import predict_failure, predict_failure_batch, predict_failure_cascade, predict_failure_stream
+from pylife.ttnf import predict, predict_batch, predict_stream
@@ -0,0 +1,5 @@
+import sys
+
+from pylife.cli import main
+
+sys.exit(main())
@@ -0,0 +1,92 @@
+import pandas as pd
+
+from pylife.features import CompiledModel
+from pylife.instrumentation import timed
+from pylife.io import TableWriter, iter_table_chunks
+from pylife.prediction_cache import row_hashes
+
+# Features for each model
+numerical_features_model1 = ['Year of Installation', 'SA', 'PRESSURE(bar)', 'AADT','MWI_1']
+categorical_features_model1 = ['A_MAT', 'LANDUSE', 'TYPE', 'LPR_Corros']
+
+numerical_features_model2 = ['Year of Installation', 'Age at 1st Failure', 'SA', 'PRESSURE(bar)', 'AADT','MWI_1']
+categorical_features_model2 = ['A_MAT', 'LANDUSE', 'TYPE', 'LPR_Corros']
+
+numerical_features_model3 = ['Age at 1st Failure', 'Age at 2nd Failure', 'SA', 'PRESSURE(bar)', 'AADT','MWI_1']
+categorical_features_model3 = ['A_MAT', 'LANDUSE', 'TYPE', 'LPR_Corros']
+
+PREDICTION_COLUMNS = ['First Failure Prediction', 'Second Failure Prediction', 'Third Failure Prediction']
+
+# Columns the cascade reads from the input (the 'Age at ...' columns are filled in by the cascade itself)
+input_features = [feature for feature in dict.fromkeys(numerical_features_model1 + categorical_features_model1 +
+                                                         numerical_features_model2 + categorical_features_model2 +
+                                                         numerical_features_model3 + categorical_features_model3)
+                  if feature not in ('Age at 1st Failure', 'Age at 2nd Failure')]
+
+# Function to make predictions
+def predict_failure(model, input_data, numerical_features, categorical_features, cache=None):
+    columns = numerical_features + categorical_features
+
+    def score(positions):
+        with timed('cascade_predict_single', rows=1):
+            if isinstance(model, CompiledModel):
+                # The compiled transform reads the values straight from a dict, without building a frame
+                return model.predict(dict(zip(columns, input_data)))
+            return model.predict(pd.DataFrame([input_data], columns=columns))
+
+    if cache is None:
+        return score(None)[0]
+    return cache.resolve(row_hashes(pd.DataFrame([input_data], columns=columns), columns), score)[0, 0]
+
+# Function to make predictions for every row of a frame with a single model call
+def predict_failure_batch(model, data, numerical_features, categorical_features):
+    columns = numerical_features + categorical_features
+    with timed('cascade_predict', rows=len(data)):
+        return model.predict(data[columns])
+
+# Function to list the input columns the cascade needs but the data does not have
+def missing_columns(columns):
+    return set(input_features) - set(columns)
+
+# Function to write an (n, 3) array of cascade outputs into the frame, in the same column order as the cascade
+def assign_predictions(data, values):
+    data['First Failure Prediction'] = values[:, 0]
+    data['Age at 1st Failure'] = values[:, 0]
+    data['Second Failure Prediction'] = values[:, 1]
+    data['Age at 2nd Failure'] = values[:, 1]
+    data['Third Failure Prediction'] = values[:, 2]
+    return data
+
+# Function to run the 1st -> 2nd -> 3rd failure cascade over a whole frame,
+# scoring only the rows the cache (if given) has not seen before
+def predict_failure_cascade(data, models, cache=None):
+    if cache is not None:
+        values = cache.resolve(row_hashes(data, input_features),
+                               lambda positions: predict_failure_cascade(data.iloc[positions].copy(), models)[PREDICTION_COLUMNS])
+        return assign_predictions(data, values)
+
+    # Predict first failure
+    data['First Failure Prediction'] = predict_failure_batch(models['model_first_failure'], data, numerical_features_model1, categorical_features_model1)
+
+    # Prepare data for second failure prediction
+    data['Age at 1st Failure'] = data['First Failure Prediction']
+
+    # Predict second failure
+    data['Second Failure Prediction'] = predict_failure_batch(models['model_second_failure'], data, numerical_features_model2, categorical_features_model2)
+
+    # Prepare data for third failure prediction
+    data['Age at 2nd Failure'] = data['Second Failure Prediction']
+
+    # Predict third failure
+    data['Third Failure Prediction'] = predict_failure_batch(models['model_third_failure'], data, numerical_features_model3, categorical_features_model3)
+    return data
+
+# Function to stream a CSV/Parquet source through the cascade chunk by chunk, appending to output_path
+def predict_failure_stream(source, output_path, chunk_size, models, cache=None):
+    rows_done = 0
+    with TableWriter(output_path) as writer:
+        for chunk in iter_table_chunks(source, chunk_size):
+            chunk = predict_failure_cascade(chunk, models, cache)
+            writer.write(chunk)
+            rows_done += len(chunk)
+            yield rows_done
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from pylife.prediction_cache import row_hashes
+
+# Class describing how one version of a table became the next: rows inserted, rows modified
+# (before and after the edit, sharing their labels) and rows deleted
+class ChangeSet:
+    def __init__(self, inserted, modified_before, modified_after, deleted):
+        self.inserted = inserted
+        self.modified_before = modified_before
+        self.modified_after = modified_after
+        self.deleted = deleted
+
+    @property
+    def empty(self):
+        return len(self.inserted) == 0 and len(self.modified_after) == 0 and len(self.deleted) == 0
+
+    def summary(self):
+        return {'inserted': len(self.inserted), 'modified': len(self.modified_after), 'deleted': len(self.deleted)}
+
+    # Rows whose values leave the table: deleted rows and the old side of modified rows
+    def removed_rows(self):
+        return pd.concat([self.deleted, self.modified_before])
+
+    # Rows whose values enter the table: inserted rows and the new side of modified rows
+    def added_rows(self):
+        return pd.concat([self.inserted, self.modified_after])
+
+# Function to compare two versions of a table row by row label, as st.data_editor keeps labels of
+# untouched rows, drops the labels of deleted rows and gives inserted rows new ones
+def diff_frames(base, edited, columns=None):
+    if not base.index.is_unique or not edited.index.is_unique:
+        raise ValueError("row labels must be unique to track changes")
+    columns = list(base.columns) if columns is None else list(columns)
+    common = base.index.intersection(edited.index)
+    # Hashes of the raw values, with only int and float unified: a column the editor turned from int to float
+    # does not count as edited, added whitespace or a missing value typed in as text does
+    changed = common[row_hashes(base.loc[common], columns) != row_hashes(edited.loc[common], columns)]
+    return ChangeSet(inserted=edited.loc[edited.index.difference(base.index), columns],
+                     modified_before=base.loc[changed, columns],
+                     modified_after=edited.loc[changed, columns],
+                     deleted=base.loc[base.index.difference(edited.index), columns])
+
+# Function to key each row by its content and how many identical rows precede it,
+# so duplicated rows are matched one for one
+def _occurrence_keys(hashes):
+    occurrence = pd.Series(hashes).groupby(hashes).cumcount().to_numpy().astype('uint64')
+    return hashes + occurrence * np.uint64(0x9E3779B97F4A7C15)
+
+# Function to compare two versions of a table by content only (for reloaded files whose row labels are
+# renumbered); edits show up as a deleted old row and an inserted new row
+def diff_rows(base, new, columns=None):
+    columns = list(base.columns) if columns is None else list(columns)
+    base_keys = _occurrence_keys(row_hashes(base, columns))
+    new_keys = _occurrence_keys(row_hashes(new, columns))
+    empty = base.iloc[:0][columns]
+    return ChangeSet(inserted=new.loc[~np.isin(new_keys, base_keys), columns],
+                     modified_before=empty, modified_after=empty,
+                     deleted=base.loc[~np.isin(base_keys, new_keys), columns])
@@ -0,0 +1,120 @@
+import argparse
+import json
+import sys
+import time
+
+import pandas as pd
+
+from pylife import cascade, jobs, parallel, training, ttnf
+from pylife.io import read_table, table_columns, write_table
+from pylife.models import CASCADE_MODEL_PATH, TTNF_MODEL_PATH, load_models
+from pylife.registry import file_sha256, list_artifacts, promote
+
+# Function to build the command-line parser
+def build_parser():
+    parser = argparse.ArgumentParser(prog='pylife', description='Score pipeline inventories without starting the Streamlit app.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    cascade_parser = subparsers.add_parser('cascade', help='Predict time to 1st, 2nd and 3rd failure')
+    cascade_parser.add_argument('--models', default=CASCADE_MODEL_PATH, help=f'Pickled cascade models (default: {CASCADE_MODEL_PATH})')
+
+    ttnf_parser = subparsers.add_parser('ttnf', help='Predict time to next failure')
+    ttnf_parser.add_argument('--models', default=TTNF_MODEL_PATH, help=f'Pickled TTNF model (default: {TTNF_MODEL_PATH})')
+
+    for subparser in (cascade_parser, ttnf_parser):
+        subparser.add_argument('input', help='Input CSV or Parquet file')
+        subparser.add_argument('-o', '--output', default='predictions.csv', help='Output CSV or Parquet file (default: predictions.csv)')
+        subparser.add_argument('--chunksize', type=int, default=None, help='Stream the input in chunks of this many rows')
+        subparser.add_argument('--jobs', type=int, default=1, help='Worker processes to score with (0 = one per CPU core, default: 1)')
+
+    subparsers.add_parser('models', help='List the registered model artifacts with their versions and hashes')
+    subparsers.add_parser('jobs', help='List the background jobs queued from the app, newest first')
+
+    train_parser = subparsers.add_parser('train', help='Retrain the cascade or TTNF models with a cross-validated grid search')
+    train_parser.add_argument('artifact', choices=['cascade', 'ttnf_rf'], help='Artifact to retrain')
+    train_parser.add_argument('input', help='Training CSV or Parquet file with the model inputs and targets')
+    train_parser.add_argument('--folds', type=int, default=training.DEFAULT_FOLDS, help=f'Cross-validation folds (default: {training.DEFAULT_FOLDS})')
+    train_parser.add_argument('--grid', default=None, help='Forest settings to search as JSON, e.g. \'{"n_estimators": [100, 300]}\' (default: built-in grid)')
+    train_parser.add_argument('--seed', type=int, default=0, help='Seed of the fold split and the forests (default: 0)')
+    train_parser.add_argument('--jobs', type=int, default=0, help='Worker processes to search with (0 = one per CPU core, default: 0)')
+    train_parser.add_argument('--promote', action='store_true', help='Serve the new version from the app and CLI right away')
+    subparsers.add_parser('versions', help='List the retrained model versions, newest first per artifact')
+    return parser
+
+# Function to print the search results of one model as it finishes
+def report_trials(key, trials):
+    table = trials.assign(params=trials['params'].map(json.dumps)).drop(columns='trial')
+    print(f"{key}:\n{table.head(5).to_string(index=False)}", file=sys.stderr)
+
+# Function to retrain an artifact from a training table and optionally promote it
+def train(args):
+    missing = training.missing_columns(args.artifact, table_columns(args.input))
+    if missing:
+        print(f"error: {args.input} is missing the following columns: {sorted(missing)}", file=sys.stderr)
+        return 2
+    start_time = time.perf_counter()
+    path = training.train_artifact(args.artifact, read_table(args.input), file_sha256(args.input),
+                                   json.loads(args.grid) if args.grid else None, args.folds, args.seed, args.jobs, report_trials)
+    if args.promote:
+        promote(args.artifact, path)
+    print(f"Trained {path} in {time.perf_counter() - start_time:.1f} s" + (' and promoted it' if args.promote else ''))
+    return 0
+
+# Function to score a whole table in memory
+def score_table(command, input_path, output_path, models):
+    data = read_table(input_path)
+    if command == 'cascade':
+        data = cascade.predict_failure_cascade(data, models)
+    else:
+        data['Prediction'] = ttnf.predict_batch(models['ttnf'], data[ttnf.required_columns])
+    write_table(data, output_path)
+    return len(data)
+
+# Function to stream a table through the models chunk by chunk
+def stream_table(command, input_path, output_path, chunk_size, models):
+    if command == 'cascade':
+        return cascade.predict_failure_stream(input_path, output_path, chunk_size, models)
+    return ttnf.predict_stream(input_path, output_path, chunk_size, models['ttnf'])
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'models':
+        print(pd.DataFrame(list_artifacts()).to_string(index=False))
+        return 0
+    if args.command == 'jobs':
+        columns = ['id', 'kind', 'status', 'rows_done', 'rows_total', 'input', 'error']
+        print(pd.DataFrame(jobs.list_jobs(), columns=columns).to_string(index=False))
+        return 0
+    if args.command == 'versions':
+        print(pd.DataFrame(training.list_versions()).to_string(index=False))
+        return 0
+    if args.command == 'train':
+        return train(args)
+
+    module = cascade if args.command == 'cascade' else ttnf
+
+    # Check the header before loading any model
+    missing = module.missing_columns(table_columns(args.input))
+    if missing:
+        print(f"error: {args.input} is missing the following columns: {sorted(missing)}", file=sys.stderr)
+        return 2
+
+    start_time = time.perf_counter()
+    if args.chunksize:
+        if args.jobs != 1:
+            progress = parallel.predict_parallel_stream(args.input, args.output, args.chunksize, args.command, args.models, args.jobs)
+        else:
+            progress = stream_table(args.command, args.input, args.output, args.chunksize, load_models(args.models))
+        rows_done = 0
+        for rows_done in progress:
+            print(f"Scored {rows_done} rows", file=sys.stderr)
+    elif args.jobs != 1:
+        # Each worker process loads its own copy of the models
+        data = parallel.predict_parallel(read_table(args.input), args.command, args.models, args.jobs)
+        write_table(data, args.output)
+        rows_done = len(data)
+    else:
+        rows_done = score_table(args.command, args.input, args.output, load_models(args.models))
+    elapsed = time.perf_counter() - start_time
+    print(f"Scored {rows_done} rows in {elapsed:.2f} s ({rows_done / max(elapsed, 1e-9):,.0f} rows/s); predictions saved to {args.output}")
+    return 0
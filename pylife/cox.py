@@ -0,0 +1,221 @@
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from pylife.datasets import prune_dataset_cache, touch_cached
+from pylife.features import FeaturePipeline
+from pylife.instrumentation import timed
+from pylife.shared_cache import DerivedCache
+
+# Define numerical features
+numerical_cols = ['No. of previous failures', 'LENGTH', 'A_DIAM', 'Year', 'PRESSURE(bar)', 'Failure Year',
+                  'AADT (traffic) ( When failure occurred )', 'Mean Dew Point (deg. C) ( When failure occurred )',
+                  'Mean Relative Humidity (%) ( When failure occurred )', 'Total Rainfall (mm) ( When failure occurred )']
+
+# Categorical features, one-hot encoded
+categorical_cols = ['A_MAT', 'LANDUSE', 'LPR_Corros', 'FAULT_TYPE', 'DEFECT1LV1', 'DEF_NATURE', 'TYPE']
+
+# Fitted models keyed by (dataset hash, alpha) (bounded, see DerivedCache), and the latest dataset hash fitted for each source file
+_fits = DerivedCache('cox_fit')
+_latest = {}
+
+# Class holding a fitted Cox model together with the preprocessing it was fitted with
+class CoxFit:
+    def __init__(self, model, imputer, scaler, columns, risk_scores, n_iter, features=None):
+        self.model = model
+        self.imputer = imputer
+        self.scaler = scaler
+        self.columns = columns
+        self.risk_scores = risk_scores
+        self.n_iter = n_iter
+        self.features = features
+
+    # Function to get the coefficients as a table
+    def coefficients(self):
+        return pd.DataFrame(self.model.coef_, index=self.columns, columns=['Coefficient'])
+
+    # Function to score new records with the fitted preprocessing; levels unseen at fit time encode as all zeros
+    def predict_risk(self, data):
+        if self.features is None:
+            raise ValueError("The column layout of this fit could not be compiled for scoring new records.")
+        X = self.features.transform(data)
+        if np.isnan(X).any():
+            raise ValueError("Data contains NaN values. Please clean your data before scoring it.")
+        return self.model.predict(np.asarray(X, dtype=float))
+
+# Function to build the structured survival target without a Python loop
+def survival_target(data):
+    y = np.empty(len(data), dtype=[('Status', bool), ('Duration', float)])
+    y['Status'] = data['Status'].astype(bool).to_numpy()
+    y['Duration'] = data['Duration'].to_numpy(dtype=float)
+    return y
+
+# Function to one-hot encode, impute and scale; pass a fitted imputer and scaler to reuse them
+def design_matrix(data, imputer=None, scaler=None):
+    from sklearn.impute import SimpleImputer
+    from sklearn.preprocessing import StandardScaler
+
+    data = data.copy()
+
+    # Ensure all numerical columns are of numeric type
+    data[numerical_cols] = data[numerical_cols].apply(pd.to_numeric)
+
+    # One-hot encode categorical features
+    with timed('cox_get_dummies', rows=len(data)):
+        data = pd.get_dummies(data, columns=categorical_cols)
+
+    # Convert boolean columns to integers
+    bool_cols = data.select_dtypes(include=['bool']).columns
+    data[bool_cols] = data[bool_cols].astype(int)
+
+    # Handle inf and NaN values
+    data.replace([np.inf, -np.inf], np.nan, inplace=True)
+    if imputer is None:
+        imputer = SimpleImputer(strategy='mean').fit(data[numerical_cols])
+    data[numerical_cols] = imputer.transform(data[numerical_cols])
+
+    # Scale numerical features
+    if scaler is None:
+        scaler = StandardScaler().fit(data[numerical_cols])
+    data[numerical_cols] = scaler.transform(data[numerical_cols])
+
+    if data.isnull().values.any():
+        raise ValueError("Data contains NaN values. Please clean your data before fitting the model.")
+    if np.isinf(data.values.astype(float)).any():
+        raise ValueError("Data contains infinite values. Please clean your data before fitting the model.")
+    return data.drop(columns=['Status', 'Duration']), survival_target(data), imputer, scaler
+
+# Function to compile the preprocessing fitted by design_matrix into a feature pipeline with the same column layout
+# (numeric and other columns in data order, then one indicator per level of each categorical column, as get_dummies does)
+def design_features(data, imputer, scaler, columns):
+    other = [column for column in data.columns if column not in categorical_cols and column not in ('Status', 'Duration')]
+    position = {column: i for i, column in enumerate(numerical_cols)}
+    fill_values = np.array([imputer.statistics_[position[column]] if column in position else np.nan for column in other])
+    means = np.array([scaler.mean_[position[column]] if column in position else 0.0 for column in other])
+    scales = np.array([scaler.scale_[position[column]] if column in position else 1.0 for column in other])
+    blocks = [('numeric', other, fill_values, means, scales)]
+    blocks += [('onehot', column, list(pd.Categorical(data[column]).categories)) for column in categorical_cols]
+    features = FeaturePipeline(other + categorical_cols, blocks, inf_as_missing=True)
+    # Any column layout this does not reproduce falls back to design_matrix at scoring time
+    return features if features.feature_names() == list(columns) else None
+
+# Function to keep the design matrix on disk and memory-map it, so repeat fits skip the preprocessing.
+# Spilled into DATASET_CACHE_DIRECTORY (as page 3 does), it counts towards that directory's size bound and is
+# pruned like the data copies.
+def spill_design_matrix(X, path):
+    if not touch_cached(path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(temp_path, X.to_numpy(dtype=float))
+        os.replace(temp_path, path)
+        prune_dataset_cache(keep=path)
+    try:
+        return np.load(path, mmap_mode='r')
+    except FileNotFoundError:
+        # Pruned by another process in the meantime
+        return X.to_numpy(dtype=float)
+
+# Function to get scikit-survival's Newton-Raphson helper, or None when the installed version does not have it
+# in the form fit_coefficients uses (it is not part of the public API)
+def _cox_optimizer():
+    try:
+        from sksurv.linear_model.coxph import CoxPHOptimizer
+    except ImportError:
+        return None
+    if not all(callable(getattr(CoxPHOptimizer, name, None)) for name in ('update', 'nlog_likelihood')):
+        return None
+    return CoxPHOptimizer
+
+# Function to fit the Cox coefficients with Newton-Raphson, starting from init when given.
+# Mirrors CoxPHSurvivalAnalysis.fit (same objective, step-halving and stopping rule) but lets the
+# search start from the coefficients of a previous fit. It builds on scikit-survival internals; when
+# those are missing or changed, it falls back to the public fit from zero (n_iter is then None).
+def fit_coefficients(X, y, alpha=0.1, init=None):
+    from sksurv.linear_model import CoxPHSurvivalAnalysis
+
+    X = np.asarray(X, dtype=float)
+    optimizer_class = _cox_optimizer()
+    if optimizer_class is not None:
+        try:
+            return _fit_warm(optimizer_class, X, y, alpha, init)
+        except (AttributeError, TypeError) as e:
+            warnings.warn(f"Warm-started Cox fit unavailable with this scikit-survival ({e}); fitting from scratch", RuntimeWarning, stacklevel=2)
+    return CoxPHSurvivalAnalysis(alpha).fit(X, y), None
+
+# Function to run the Newton-Raphson search of fit_coefficients on scikit-survival's optimizer
+def _fit_warm(optimizer_class, X, y, alpha, init):
+    from scipy.linalg import solve
+    from sklearn.exceptions import ConvergenceWarning
+    from sksurv.linear_model import CoxPHSurvivalAnalysis
+
+    model = CoxPHSurvivalAnalysis(alpha)
+    event, time = y['Status'], y['Duration']
+    optimizer = optimizer_class(X, event, time, np.full(X.shape[1], float(alpha)), model.ties)
+
+    w = np.zeros(X.shape[1]) if init is None else np.asarray(init, dtype=float).copy()
+    w_prev = w
+    loss = float('inf')
+    i = 0
+    while True:
+        if i >= model.n_iter:
+            warnings.warn("Optimization did not converge: Maximum number of iterations has been exceeded.", ConvergenceWarning, stacklevel=2)
+            break
+        optimizer.update(w)
+        delta = solve(optimizer.hessian, optimizer.gradient, overwrite_a=False, overwrite_b=False, check_finite=False)
+        if not np.all(np.isfinite(delta)):
+            raise ValueError("search direction contains NaN or infinite values")
+        w_new = w - delta
+        loss_new = optimizer.nlog_likelihood(w_new)
+        if loss_new > loss:
+            # Step halving if the negative log-likelihood does not decrease
+            w = (w_prev + w) / 2
+            loss = optimizer.nlog_likelihood(w)
+            i += 1
+            continue
+        w_prev = w
+        w = w_new
+        if np.abs(1 - (loss_new / loss)) < model.tol:
+            break
+        loss = loss_new
+        i += 1
+
+    # Let scikit-survival set up its fitted state with a single cheap step, then install the coefficients and baseline hazard
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', ConvergenceWarning)
+        model.set_params(n_iter=1).fit(X, y)
+    model.set_params(n_iter=CoxPHSurvivalAnalysis().n_iter)
+    baseline_model = model._baseline_model
+    baseline_model.fit(np.dot(X, w), event, time)
+    model.coef_ = w
+    return model, i + 1
+
+# Function to fit preprocessing and Cox model on a dataset, warm-starting from a previous fit when given
+def fit_cox(data, alpha=0.1, previous=None, spill_path=None):
+    X, y, imputer, scaler = design_matrix(data)
+    columns = list(X.columns)
+    features = design_features(data, imputer, scaler, columns)
+    if spill_path is not None:
+        X = spill_design_matrix(X, spill_path)
+
+    init = None
+    if previous is not None:
+        # Columns new to this dataset (e.g. a new material) start at zero
+        init = previous.coefficients()['Coefficient'].reindex(columns, fill_value=0.0).to_numpy()
+    with timed('cox_fit', rows=len(y)):
+        model, n_iter = fit_coefficients(X, y, alpha, init)
+    risk_scores = model.predict(np.asarray(X, dtype=float))
+    return CoxFit(model, imputer, scaler, columns, risk_scores, n_iter, features)
+
+# Function to fit once per dataset hash; a new version of the same source warm-starts from its latest fit
+def cached_fit_cox(data, data_hash, source=None, alpha=0.1, spill_directory=None):
+    key = (data_hash, alpha)
+    fit = _fits.get(key)
+    if fit is None:
+        previous = _fits.get((_latest.get(source), alpha)) if source is not None else None
+        spill_path = None if spill_directory is None else os.path.join(spill_directory, f"{data_hash[:16]}-cox-design.npy")
+        fit = _fits.put(key, data_hash, fit_cox(data, alpha, previous, spill_path))
+    if source is not None:
+        _latest[source] = data_hash
+    return fit
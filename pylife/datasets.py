@@ -0,0 +1,174 @@
+import hashlib
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from pylife.instrumentation import timed
+from pylife.registry import file_sha256
+from pylife.schema import apply_schema
+
+# Directory holding the Parquet copies of every ingested CSV/XLSX file, and the other files derived from them
+# (Arrow copies of the shared frame cache, spilled Cox design matrices)
+DATASET_CACHE_DIRECTORY = 'dataset_cache'
+
+# Bytes of files kept in DATASET_CACHE_DIRECTORY for all processes (PYLIFE_DATASET_CACHE_MB, default 4 GB);
+# the least recently used files are deleted first
+MAX_DATASET_CACHE_BYTES = int(os.environ.get('PYLIFE_DATASET_CACHE_MB', 4096)) * 1024 * 1024
+
+# Seconds a file stays safe from pruning after it was last used, so a reader that just got its path can open it
+PRUNE_GRACE_SECONDS = 60
+
+# Function to hash a file path or an uploaded file buffer
+def content_sha256(source):
+    if isinstance(source, (str, os.PathLike)):
+        return file_sha256(source)
+    if hasattr(source, 'getvalue'):
+        return hashlib.sha256(source.getvalue()).hexdigest()
+    position = source.tell()
+    digest = hashlib.sha256(source.read()).hexdigest()
+    source.seek(position)
+    return digest
+
+# Function to record that a cached file was used; the modification time orders files for pruning.
+# Returns False when the file does not exist (or was pruned).
+def touch_cached(path):
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return False
+    except OSError:
+        # A read-only deployment never prunes either
+        pass
+    return True
+
+# Function to delete the least recently used files of DATASET_CACHE_DIRECTORY, whatever wrote them, until the
+# rest fit in max_bytes. Files in the middle of being written and files used in the last PRUNE_GRACE_SECONDS
+# are left alone. A process that has a deleted file memory-mapped keeps its mapping; the next process to need
+# the file writes it again. Returns the bytes left.
+def prune_dataset_cache(max_bytes=None, keep=None):
+    max_bytes = MAX_DATASET_CACHE_BYTES if max_bytes is None else max_bytes
+    files = []
+    try:
+        entries = list(os.scandir(DATASET_CACHE_DIRECTORY))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_file():
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path, '.tmp' in entry.name))
+        except FileNotFoundError:
+            continue
+    total = sum(size for _, size, _, _ in files)
+    recent = time.time() - PRUNE_GRACE_SECONDS
+    for mtime, size, path, writing in sorted(files):
+        if total <= max_bytes or mtime > recent:
+            break
+        if writing or (keep is not None and os.path.abspath(path) == os.path.abspath(keep)):
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            # Another process removed it first, or the platform refuses to delete a mapped file
+            continue
+        total -= size
+    return total
+
+# Function to parse a CSV or Excel file the slow way
+def parse_source(source):
+    name = str(getattr(source, 'name', source)).lower()
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    if name.endswith(('.xlsx', '.xls')):
+        return pd.read_excel(source)
+    return pd.read_csv(source)
+
+# Function to make object columns holding mixed types (e.g. numbers and text from Excel) storable in Parquet
+def _arrow_safe(data):
+    data = data.copy()
+    for column in data.select_dtypes(include=['object']).columns:
+        data[column] = data[column].map(lambda value: value if pd.isna(value) else str(value))
+    return data
+
+# Function to write the Parquet copy of a parsed frame, atomically so concurrent sessions never read half a file
+def _write_parquet(data, path):
+    os.makedirs(DATASET_CACHE_DIRECTORY, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        data.to_parquet(temp_path, index=False)
+    except (TypeError, ValueError):
+        data = _arrow_safe(data)
+        data.to_parquet(temp_path, index=False)
+    os.replace(temp_path, path)
+
+# Function to spill a CSV/XLSX file to its Parquet copy on disk, parsing it only the first time its content is seen
+def dataset_path(source):
+    cached = os.path.join(DATASET_CACHE_DIRECTORY, f"{content_sha256(source)[:16]}.parquet")
+    if not touch_cached(cached):
+        with timed('dataset_parse') as timing:
+            data = parse_source(source)
+            timing.rows = len(data)
+            _write_parquet(data, cached)
+        prune_dataset_cache(keep=cached)
+    return cached
+
+# Function to load a CSV/XLSX file through the Parquet cache
+# (pass a schema from pylife.schema to get validated, memory-optimized dtypes)
+def load_dataset(source, columns=None, schema=None):
+    cached = dataset_path(source)
+    with timed('dataset_read_parquet') as timing:
+        data = pd.read_parquet(cached, columns=columns)
+        timing.rows = len(data)
+    if schema is not None:
+        with timed('dataset_apply_schema', rows=len(data)):
+            data = apply_schema(data, schema)
+    return data
+
+# Function to tell from the Parquet metadata alone whether a column may hold nulls
+def _may_have_nulls(parquet_file, column):
+    index = parquet_file.schema_arrow.get_field_index(column)
+    for i in range(parquet_file.metadata.num_row_groups):
+        statistics = parquet_file.metadata.row_group(i).column(index).statistics
+        if statistics is None or not statistics.has_null_count or statistics.null_count > 0:
+            return True
+    return False
+
+# Function to work out the pandas dtype one column of one file reads as
+def _column_dtype(parquet_file, column):
+    dtype = parquet_file.schema_arrow.empty_table().select([column]).to_pandas()[column].dtype
+    if dtype.kind in 'iu' and _may_have_nulls(parquet_file, column):
+        return np.dtype('float64')
+    if dtype.kind == 'b' and _may_have_nulls(parquet_file, column):
+        return np.dtype('object')
+    return dtype
+
+# Function to pick the dtype the stacked column gets, as pd.concat would
+def _common_dtype(dtypes):
+    if all(dtype == dtypes[0] for dtype in dtypes):
+        return dtypes[0]
+    if all(isinstance(dtype, np.dtype) and dtype.kind in 'iuf' for dtype in dtypes):
+        return np.result_type(*dtypes)
+    return np.dtype('object')
+
+# Function to stack the selected columns of several Parquet copies into one frame in a single pre-allocated pass.
+# Row counts and column types come from the file metadata, each output column is allocated once at its final
+# size, and every file is memory-mapped and copied into place one at a time, so peak memory stays close to
+# the size of the result instead of the per-file frames plus their concatenation.
+def combine_datasets(paths, columns):
+    import pyarrow.parquet as pq
+
+    files = [pq.ParquetFile(path, memory_map=True) for path in paths]
+    sizes = [parquet_file.metadata.num_rows for parquet_file in files]
+    arrays = {column: np.empty(sum(sizes), dtype=_common_dtype([_column_dtype(parquet_file, column) for parquet_file in files]))
+              for column in columns}
+    start = 0
+    with timed('dataset_combine', rows=sum(sizes)):
+        for parquet_file, size in zip(files, sizes):
+            table = parquet_file.read(columns=columns)
+            for column in columns:
+                arrays[column][start:start + size] = table.column(column).to_pandas().to_numpy()
+            start += size
+            del table
+    return pd.DataFrame(arrays, copy=False)
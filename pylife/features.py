@@ -0,0 +1,211 @@
+import numpy as np
+import pandas as pd
+
+# Class compiling fitted preprocessing into one dense NumPy transform with a fixed column layout.
+# A model fitted on an array has positions as inputs; column_names, when known, name those positions for frames.
+# It is built from blocks, laid out left to right:
+#   ('numeric', columns, fill_values, means, scales)  missing values filled, then (x - mean) / scale
+#   ('onehot', column, vocabulary)                    one indicator per level; unknown or missing levels are all zeros
+class FeaturePipeline:
+    # Compiled pipelines cached on disk before column_names existed load without it
+    column_names = None
+
+    def __init__(self, input_columns, blocks, inf_as_missing=False, column_names=None):
+        self.input_columns = list(input_columns)
+        self.blocks = blocks
+        self.inf_as_missing = inf_as_missing
+        self.column_names = list(column_names) if column_names is not None else None
+        self._positions = {column: i for i, column in enumerate(self.input_columns)}
+        self._vocabularies = [pd.Index(block[2]) if block[0] == 'onehot' else None for block in blocks]
+
+    # Function to name the output columns, e.g. 'LENGTH' and 'A_MAT_DI'
+    def feature_names(self):
+        names = []
+        for block in self.blocks:
+            if block[0] == 'numeric':
+                names += list(block[1])
+            else:
+                names += [f"{block[1]}_{level}" for level in block[2]]
+        return names
+
+    # Function to find where a numeric input column lands in the output, with the mean and scale applied to it
+    def numeric_position(self, column):
+        offset = 0
+        for block in self.blocks:
+            if block[0] == 'numeric':
+                if column in block[1]:
+                    i = list(block[1]).index(column)
+                    return offset + i, block[3][i], block[4][i]
+                offset += len(block[1])
+            else:
+                offset += len(block[2])
+        raise KeyError(f"{column!r} is not a numeric input of the pipeline")
+
+    # Function to pick the input columns out of a frame or a {column: value(s)} dict (by name), or a 2-D array or
+    # list (by position). For a model fitted on an array (its inputs are positions), a frame is picked by the
+    # recorded column_names if there are any, else it has to hold exactly the inputs, in order.
+    def _input_values(self, data):
+        if isinstance(data, dict):
+            return lambda column: np.atleast_1d(np.asarray(data[column], dtype=object))
+        if isinstance(data, pd.DataFrame):
+            if all(isinstance(column, (int, np.integer)) for column in self.input_columns):
+                if self.column_names is not None:
+                    missing = [column for column in self.column_names if column not in data.columns]
+                    if missing:
+                        raise KeyError(f"The data is missing the following input columns: {missing}")
+                    data = data[self.column_names]
+                elif data.shape[1] != len(self.input_columns):
+                    raise ValueError(f"The data has {data.shape[1]} columns but the model reads {len(self.input_columns)} "
+                                     f"by position; pass exactly its input columns, in the order it was fitted on")
+                data = data.to_numpy()
+            else:
+                missing = [column for column in self.input_columns if column not in data.columns]
+                if missing:
+                    raise KeyError(f"The data is missing the following input columns: {missing}")
+                return lambda column: data[column].to_numpy()
+        data = np.asarray(data, dtype=object) if not isinstance(data, np.ndarray) else data
+        if data.ndim == 1:
+            data = data.reshape(1, -1)
+        return lambda column: data[:, self._positions[column]]
+
+    def transform(self, data):
+        values = self._input_values(data)
+        n_rows = len(values(self.input_columns[0])) if self.input_columns else len(data)
+        width = sum(len(block[1]) if block[0] == 'numeric' else len(block[2]) for block in self.blocks)
+        out = np.zeros((n_rows, width))
+        offset = 0
+        for block, vocabulary in zip(self.blocks, self._vocabularies):
+            if block[0] == 'numeric':
+                _, columns, fill_values, means, scales = block
+                numeric = np.column_stack([np.asarray(values(column), dtype=float) for column in columns])
+                if self.inf_as_missing:
+                    numeric[np.isinf(numeric)] = np.nan
+                if fill_values is not None:
+                    numeric = np.where(np.isnan(numeric), fill_values, numeric)
+                out[:, offset:offset + len(columns)] = (numeric - means) / scales
+                offset += len(columns)
+            else:
+                codes = vocabulary.get_indexer(values(block[1]))
+                rows = np.flatnonzero(codes >= 0)
+                out[rows, offset + codes[rows]] = 1.0
+                offset += len(vocabulary)
+        return out
+
+# Class pairing a compiled feature pipeline with the estimator that consumes its output;
+# predict() takes the same frames or arrays the original model did
+class CompiledModel:
+    def __init__(self, features, estimator, original_type):
+        self.features = features
+        self.estimator = estimator
+        self.original_type = original_type
+
+    def predict(self, data):
+        return self.estimator.predict(self.features.transform(data))
+
+# Function to resolve a ColumnTransformer column spec to input column names
+def _resolve_columns(spec, input_columns):
+    if callable(spec):
+        raise NotImplementedError("callable column selectors are not compiled")
+    if isinstance(spec, (str, int, np.integer)):
+        spec = [spec]
+    spec = list(np.asarray(spec).tolist()) if not isinstance(spec, slice) else input_columns[spec]
+    if spec and isinstance(spec[0], bool):
+        return [column for column, keep in zip(input_columns, spec) if keep]
+    return [input_columns[item] if isinstance(item, int) else item for item in spec]
+
+# Function to compile one fitted transformer of a ColumnTransformer into blocks
+def _compile_transformer(transformer, columns):
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import FunctionTransformer, OneHotEncoder, StandardScaler
+
+    n = len(columns)
+    if isinstance(transformer, str) and transformer == 'passthrough':
+        return [('numeric', columns, None, np.zeros(n), np.ones(n))]
+    if isinstance(transformer, OneHotEncoder):
+        if transformer.drop_idx_ is not None or getattr(transformer, '_infrequent_enabled', False):
+            raise NotImplementedError("one-hot encoders with dropped or infrequent levels are not compiled")
+        return [('onehot', column, list(categories)) for column, categories in zip(columns, transformer.categories_)]
+    steps = transformer.steps if isinstance(transformer, Pipeline) else [(None, transformer)]
+    fill_values, means, scales = None, np.zeros(n), np.ones(n)
+    scaled = False
+    for _, step in steps:
+        if isinstance(step, FunctionTransformer) and step.func is None:
+            # Identity, which is how recent scikit-learn stores remainder='passthrough'
+            continue
+        # Imputing has to come before scaling, as the block applies them in that order
+        if isinstance(step, SimpleImputer) and fill_values is None and not scaled and not step.add_indicator and pd.isna(step.missing_values):
+            fill_values = np.asarray(step.statistics_, dtype=float)
+        elif isinstance(step, StandardScaler) and not scaled:
+            means = step.mean_ if step.with_mean else np.zeros(n)
+            scales = step.scale_ if step.with_std else np.ones(n)
+            scaled = True
+        else:
+            raise NotImplementedError(f"{type(step).__name__} is not compiled")
+    if fill_values is not None and np.isnan(fill_values).any():
+        raise NotImplementedError("imputers that dropped all-missing columns are not compiled")
+    return [('numeric', columns, fill_values, np.asarray(means, dtype=float), np.asarray(scales, dtype=float))]
+
+# Function to compile a fitted scikit-learn Pipeline of ColumnTransformer -> estimator; column_names names the
+# inputs of a model fitted on an array, so frames are read by name rather than by position
+def compile_pipeline(model, column_names=None):
+    from sklearn.compose import ColumnTransformer
+    from sklearn.pipeline import Pipeline
+
+    if not isinstance(model, Pipeline) or len(model.steps) != 2 or not isinstance(model.steps[0][1], ColumnTransformer):
+        raise NotImplementedError("only Pipeline(ColumnTransformer, estimator) models are compiled")
+    column_transformer, estimator = model.steps[0][1], model.steps[1][1]
+    if hasattr(column_transformer, 'feature_names_in_'):
+        input_columns = list(column_transformer.feature_names_in_)
+    else:
+        input_columns = list(range(column_transformer.n_features_in_))
+        if column_names is not None and len(column_names) != len(input_columns):
+            raise ValueError(f"The model reads {len(input_columns)} columns, {len(column_names)} names were given")
+    blocks = []
+    for _, transformer, spec in column_transformer.transformers_:
+        columns = _resolve_columns(spec, input_columns)
+        if (isinstance(transformer, str) and transformer == 'drop') or not columns:
+            continue
+        blocks += _compile_transformer(transformer, columns)
+    positional = not hasattr(column_transformer, 'feature_names_in_')
+    features = FeaturePipeline(input_columns, blocks, column_names=column_names if positional else None)
+    return CompiledModel(features, estimator, type(model).__name__)
+
+# Function to build probe rows covering every category level, plus missing values, in the model's input format
+def probe_rows(features, n_rows=64, seed=0):
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for block in features.blocks:
+        if block[0] == 'numeric':
+            _, names, fill_values, means, scales = block
+            for i, name in enumerate(names):
+                values = means[i] + scales[i] * rng.standard_normal(n_rows)
+                if fill_values is not None:
+                    values[::7] = np.nan
+                columns[name] = values
+        else:
+            levels = [level for level in block[2] if not pd.isna(level)]
+            columns[block[1]] = np.array([levels[i % len(levels)] for i in range(n_rows)], dtype=object)
+    # Columns the model drops still have to be present
+    data = pd.DataFrame({column: columns.get(column, np.zeros(n_rows)) for column in features.input_columns})
+    if all(isinstance(column, str) for column in features.input_columns):
+        return data
+    return data.to_numpy(dtype=object)
+
+# Function to compile every model of an artifact whose compiled form reproduces its predictions;
+# anything else (e.g. TabNet, or unsupported preprocessing) is kept as it is
+def compile_models(models, rtol=1e-9, column_names=None):
+    if not isinstance(models, dict):
+        return models
+    compiled = {}
+    for name, model in models.items():
+        try:
+            candidate = compile_pipeline(model, column_names)
+            probe = probe_rows(candidate.features)
+            if np.allclose(candidate.predict(probe), model.predict(probe), rtol=rtol, atol=0):
+                compiled[name] = candidate
+                continue
+        except Exception:
+            pass
+        compiled[name] = model
+    return compiled
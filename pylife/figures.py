@@ -0,0 +1,132 @@
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from pylife.instrumentation import timed
+
+# Bytes of rendered PNGs kept across reruns and sessions; the least recently shown are dropped first
+MAX_FIGURE_BYTES = 64 * 1024 * 1024
+
+# Resolution of the rendered PNGs (what st.pyplot uses)
+FIGURE_DPI = 200
+
+# Outliers drawn per box at most; the rest of a large group's outliers add nothing visible
+MAX_FLIERS = 200
+
+_figures = OrderedDict()
+_figure_bytes = 0
+_lock = threading.Lock()
+
+# Function to render a figure once per key (dataset hashes and plot parameters) and return its PNG bytes.
+# draw() builds and returns a matplotlib figure; it only runs when the key has not been rendered before.
+def cached_figure(key, draw):
+    global _figure_bytes
+    with _lock:
+        if key in _figures:
+            _figures.move_to_end(key)
+            return _figures[key]
+    import matplotlib.pyplot as plt
+
+    with timed('render_figure'):
+        fig = draw()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', dpi=FIGURE_DPI, bbox_inches='tight')
+        plt.close(fig)
+    png = buffer.getvalue()
+    with _lock:
+        if key not in _figures:
+            _figures[key] = png
+            _figure_bytes += len(png)
+        while _figure_bytes > MAX_FIGURE_BYTES and len(_figures) > 1:
+            _, dropped = _figures.popitem(last=False)
+            _figure_bytes -= len(dropped)
+    return png
+
+# Function to report how many figures are cached and their total size
+def figure_cache_stats():
+    with _lock:
+        return {'figures': len(_figures), 'bytes': _figure_bytes}
+
+# Function to list the levels of a column in plotting order (category order, otherwise sorted)
+def _levels(values):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return [level for level in values.cat.categories if (values == level).any()]
+    return sorted(values.dropna().unique())
+
+# Function to summarize y per x (and hue) as the mean with a 95% normal-approximation confidence interval,
+# in place of the bootstrap seaborn's barplot runs over every row
+def mean_summary(df, x, y, hue=None):
+    keys = [x] if hue is None else [x, hue]
+    with timed('figure_summary', rows=len(df)):
+        summary = df.groupby(keys, observed=True)[y].agg(['mean', 'std', 'count'])
+        summary['ci'] = (1.96 * summary['std'] / np.sqrt(summary['count'])).fillna(0.0)
+    return summary.reset_index()
+
+# Function to summarize y per x (and hue) as box plot statistics: quartiles, Tukey whiskers (1.5 IQR)
+# and at most max_fliers randomly kept outliers per box
+def box_summary(df, x, y, hue=None, max_fliers=MAX_FLIERS, seed=0):
+    keys = [x] if hue is None else [x, hue]
+    data = df[keys + [y]].dropna()
+    with timed('figure_summary', rows=len(data)):
+        grouped = data.groupby(keys, observed=True)[y]
+        stats = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+        stats.columns = ['q1', 'med', 'q3']
+        stats['count'] = grouped.size()
+        iqr = stats['q3'] - stats['q1']
+        # Group number of every row, in the same (sorted) order as the rows of stats
+        codes = data.groupby(keys, observed=True).ngroup().to_numpy()
+        values = data[y].to_numpy(dtype=float)
+        inside = ((values >= (stats['q1'] - 1.5 * iqr).to_numpy()[codes]) &
+                  (values <= (stats['q3'] + 1.5 * iqr).to_numpy()[codes]))
+        stats['whislo'] = pd.Series(np.where(inside, values, np.inf)).groupby(codes).min().to_numpy()
+        stats['whishi'] = pd.Series(np.where(inside, values, -np.inf)).groupby(codes).max().to_numpy()
+        outliers = data[~inside].sample(frac=1.0, random_state=seed)
+        fliers = outliers[outliers.groupby(keys, observed=True).cumcount() < max_fliers]
+    return stats.reset_index(), fliers
+
+# Function to draw grouped bars with error bars from a mean_summary
+def plot_mean_bars(ax, summary, x, hue=None, palette='viridis'):
+    import seaborn as sns
+
+    x_levels = _levels(summary[x])
+    hue_levels = [None] if hue is None else _levels(summary[hue])
+    width = 0.8 / len(hue_levels)
+    colors = sns.color_palette(palette, len(hue_levels))
+    for j, (level, color) in enumerate(zip(hue_levels, colors)):
+        rows = summary if level is None else summary[summary[hue] == level]
+        positions = pd.Index(x_levels).get_indexer(rows[x]) + (j - (len(hue_levels) - 1) / 2) * width
+        ax.bar(positions, rows['mean'], width=width, yerr=rows['ci'], color=color, label=level, capsize=2)
+    ax.set_xticks(range(len(x_levels)))
+    ax.set_xticklabels([str(level) for level in x_levels], rotation=90 if len(x_levels) > 12 else 0)
+    if hue is not None:
+        ax.legend(title=hue)
+
+# Function to draw grouped box plots from a box_summary
+def plot_boxes(ax, stats, fliers, x, y, hue=None, palette=None):
+    import seaborn as sns
+    from matplotlib.patches import Patch
+
+    x_levels = _levels(stats[x])
+    hue_levels = [None] if hue is None else _levels(stats[hue])
+    width = 0.8 / len(hue_levels)
+    colors = sns.color_palette(palette, len(hue_levels))
+    flier_groups = dict(list(fliers.groupby(x if hue is None else [x, hue], observed=True)[y]))
+    for j, (level, color) in enumerate(zip(hue_levels, colors)):
+        rows = stats if level is None else stats[stats[hue] == level]
+        boxes = []
+        for _, row in rows.iterrows():
+            group = row[x] if level is None else (row[x], level)
+            boxes.append({'med': row['med'], 'q1': row['q1'], 'q3': row['q3'], 'whislo': row['whislo'], 'whishi': row['whishi'],
+                          'fliers': flier_groups[group].to_numpy() if group in flier_groups else np.empty(0)})
+        if not boxes:
+            continue
+        positions = pd.Index(x_levels).get_indexer(rows[x]) + (j - (len(hue_levels) - 1) / 2) * width
+        ax.bxp(boxes, positions=positions, widths=width * 0.9, patch_artist=True, manage_ticks=False,
+               boxprops={'facecolor': color}, medianprops={'color': 'black'}, flierprops={'markersize': 3})
+    ax.set_xticks(range(len(x_levels)))
+    ax.set_xticklabels([str(level) for level in x_levels])
+    if hue is not None:
+        ax.legend(handles=[Patch(facecolor=color, label=level) for level, color in zip(hue_levels, colors)], title=hue)
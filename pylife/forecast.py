@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+
+from pylife.instrumentation import timed
+
+# Scenarios simulated per forecast by default
+DEFAULT_SCENARIOS = 1000
+
+# Poisson draws made at once, bounding the memory of one block of scenarios
+CHUNK_CELLS = 4_000_000
+
+# Years at the end of a baseline whose average hazard rate extends it past the longest observed duration
+TAIL_YEARS = 10
+
+# Hazard ratio between the riskiest segment and the median one beyond which Cox risk scores are not used to forecast
+MAX_HAZARD_RATIO = 1e4
+
+# Class holding a cumulative baseline hazard as a right-continuous step function, extended linearly
+# (at the average rate of its last TAIL_YEARS) past its last step
+class Baseline:
+    def __init__(self, times, cumulative_hazard):
+        times = np.asarray(times, dtype=float)
+        cumulative_hazard = np.asarray(cumulative_hazard, dtype=float)
+        keep = np.isfinite(times) & np.isfinite(cumulative_hazard)
+        self.times = times[keep]
+        self.cumulative_hazard = np.maximum.accumulate(cumulative_hazard[keep]) if keep.any() else cumulative_hazard[keep]
+        self.rate = 0.0
+        if not len(self.times):
+            return
+        end_time, end_hazard = self.times[-1], self.cumulative_hazard[-1]
+        tail_start = max(end_time - TAIL_YEARS, 0.0)
+        self.rate = (end_hazard - self.at(np.array([tail_start]))[0]) / max(end_time - tail_start, 1e-9)
+        if self.rate <= 0:
+            self.rate = end_hazard / max(end_time, 1e-9)
+
+    # Function to evaluate the cumulative hazard at times t
+    def at(self, t):
+        if not len(self.times):
+            return np.zeros(len(t))
+        steps = np.concatenate([[0.0], self.cumulative_hazard])[np.searchsorted(self.times, t, side='right')]
+        beyond = t > self.times[-1]
+        return np.where(beyond, self.cumulative_hazard[-1] + self.rate * (t - self.times[-1]), steps)
+
+    # Function to find the first time the cumulative hazard reaches h
+    def inverse(self, h):
+        if not len(self.times):
+            return np.full(len(h), np.inf)
+        index = np.searchsorted(self.cumulative_hazard, h, side='left')
+        inside = index < len(self.times)
+        with np.errstate(divide='ignore'):
+            beyond = self.times[-1] + (h - self.cumulative_hazard[-1]) / self.rate
+        return np.where(inside, self.times[np.minimum(index, len(self.times) - 1)], beyond)
+
+# Function to take the Breslow baseline hazard of a fitted Cox model (see pylife.cox.CoxFit)
+def cox_baseline(cox_fit):
+    step = cox_fit.model.cum_baseline_hazard_
+    return Baseline(step.x, step.y)
+
+# Function to get the hazard multipliers exp(risk score) of a fitted Cox model, refusing degenerate ones. A fit that
+# separates a few records gives them risk scores far above the rest (hazard ratios of 1e9 and more), and those
+# segments then make up nearly all of every forecast year.
+def cox_multipliers(cox_fit, max_ratio=MAX_HAZARD_RATIO):
+    risk_scores = np.asarray(cox_fit.risk_scores, dtype=float)
+    risk_scores = risk_scores[np.isfinite(risk_scores)]
+    if len(risk_scores) == 0:
+        raise ValueError("the regression gave no finite risk scores")
+    log_ratio = risk_scores.max() - np.median(risk_scores)
+    if log_ratio > np.log(max_ratio):
+        raise ValueError(f"its risk scores give some segments {np.exp(min(log_ratio, 700)):.0e} times the hazard of the "
+                         f"median segment (more than {max_ratio:.0e}), so a few records would dominate the forecast")
+    return np.exp(np.asarray(cox_fit.risk_scores, dtype=float))
+
+# Function to turn Kaplan-Meier curves (see pylife.survival.KaplanMeierCurves) into one baseline per level
+def km_baselines(km_curves):
+    curves = km_curves.curves()
+    baselines = {}
+    for level in km_curves.levels():
+        curve = curves.xs(level, level=0)
+        with np.errstate(divide='ignore'):
+            baselines[level] = Baseline(curve.index.to_numpy(dtype=float), -np.log(curve['survival'].to_numpy(dtype=float)))
+    return baselines
+
+# Class simulating future failures of every segment. Segment i has the cumulative hazard
+# multiplier_i * H(t) of its baseline H, starting from its current age; failed pipes are repaired,
+# so their hazard carries on from the age they failed at (a non-homogeneous Poisson process).
+# Failures of such a process in separate years are independent Poisson counts, and sums of Poisson
+# counts are Poisson, so each scenario draws one count per (group levels, year, fault type) cell from
+# the summed expected failures of its segments: exact, and as fast at a million failures as at ten.
+class FailureForecast:
+    def __init__(self, data, baselines, baseline_column=None, multipliers=None, age_column='Duration',
+                 group_columns=('A_MAT',), fault_column='FAULT_TYPE', event_column='Status'):
+        self.group_columns = [column for column in group_columns if column in data.columns]
+        ages = pd.to_numeric(data[age_column], errors='coerce').to_numpy(dtype=float)
+        multipliers = np.ones(len(data)) if multipliers is None else np.asarray(multipliers, dtype=float)
+        if baseline_column is None:
+            self.baselines = [baselines]
+            baseline_codes = np.zeros(len(data), dtype=np.int64)
+        else:
+            levels = list(baselines)
+            self.baselines = [baselines[level] for level in levels]
+            baseline_codes = pd.Index(levels).get_indexer(data[baseline_column])
+        # Segments without an age, risk score or baseline cannot be simulated
+        valid = np.isfinite(ages) & np.isfinite(multipliers) & (baseline_codes >= 0)
+        self.n_skipped = int((~valid).sum())
+        self.ages = ages[valid]
+        self.multipliers = multipliers[valid]
+        self.baseline_codes = baseline_codes[valid]
+        self.group_levels = {}
+        self.group_codes = {}
+        for column in self.group_columns:
+            codes, levels = pd.factorize(data[column].to_numpy()[valid], sort=True)
+            self.group_codes[column] = np.where(codes < 0, len(levels), codes)
+            self.group_levels[column] = list(levels) + (['(missing)'] if (codes < 0).any() else [])
+        self._fault_probabilities(data, valid, fault_column, event_column)
+
+    # Function to set the fault types and, per segment, the probability of each type, from the
+    # share of each type among the observed failures of its level of the first group column
+    def _fault_probabilities(self, data, valid, fault_column, event_column):
+        if fault_column not in data.columns:
+            self.fault_types = ['FAILURE']
+            self.fault_shares = np.ones((len(self.ages), 1))
+            return
+        failures = data[data[event_column].astype(bool)] if event_column in data.columns else data
+        self.fault_types = sorted(failures[fault_column].dropna().unique()) or ['FAILURE']
+        overall = failures[fault_column].value_counts(normalize=True).reindex(self.fault_types, fill_value=0.0)
+        shares = np.tile(overall.to_numpy(), (len(self.ages), 1))
+        if self.group_columns:
+            column = self.group_columns[0]
+            by_level = pd.crosstab(failures[column], failures[fault_column], normalize='index')
+            by_level = by_level.reindex(columns=self.fault_types, fill_value=0.0)
+            rows = by_level.index.get_indexer(data[column].to_numpy()[valid])
+            shares[rows >= 0] = by_level.to_numpy()[rows[rows >= 0]]
+        self.fault_shares = shares
+
+    # Function to evaluate the cumulative hazard of every segment's baseline at times, shaped (segments, ...)
+    def _hazard_at(self, times):
+        if len(self.baselines) == 1:
+            return self.baselines[0].at(times.reshape(-1)).reshape(times.shape)
+        out = np.empty(times.shape)
+        for code, baseline in enumerate(self.baselines):
+            segments = self.baseline_codes == code
+            out[segments] = baseline.at(times[segments].reshape(-1)).reshape(times[segments].shape)
+        return out
+
+    # Function to get the expected failures of every segment in each of the next horizon years, shaped (segments, years)
+    def expected_failures(self, horizon=10):
+        hazard = self._hazard_at(self.ages[:, None] + np.arange(horizon + 1))
+        return self.multipliers[:, None] * np.diff(hazard, axis=1)
+
+    # Function to simulate n_scenarios futures of horizon years; returns the failure counts per scenario
+    def run(self, horizon=10, n_scenarios=DEFAULT_SCENARIOS, seed=0, start_year=None):
+        rng = np.random.default_rng(seed)
+        n_types = len(self.fault_types)
+        sizes = [len(self.group_levels[column]) for column in self.group_columns]
+        # One cell per combination of group levels, so every grouping of a scenario adds up to the same total
+        cells = np.zeros(len(self.ages), dtype=np.int64)
+        for column, size in zip(self.group_columns, sizes):
+            cells = cells * size + self.group_codes[column]
+        n_cells = int(np.prod(sizes, dtype=np.int64))
+        with timed('forecast_rates', rows=len(self.ages)):
+            expected = self.expected_failures(horizon)
+            rates = np.stack([np.stack([np.bincount(cells, weights=expected[:, year] * self.fault_shares[:, fault], minlength=n_cells)
+                                        for fault in range(n_types)], axis=-1)
+                              for year in range(horizon)], axis=1)
+        counts = {column: np.zeros((n_scenarios, horizon, size, n_types), dtype=np.int64) for column, size in zip(self.group_columns, sizes)}
+        counts[None] = np.zeros((n_scenarios, horizon, 1, n_types), dtype=np.int64)
+        block_size = max(1, CHUNK_CELLS // max(rates.size, 1))
+        with timed('forecast_simulate', rows=n_scenarios * rates.size):
+            for block_start in range(0, n_scenarios, block_size):
+                block = slice(block_start, min(block_start + block_size, n_scenarios))
+                # (scenario, level of each group column..., year, fault type)
+                draws = rng.poisson(rates, size=(block.stop - block.start,) + rates.shape).reshape((-1, *sizes, horizon, n_types))
+                for axis, column in enumerate(self.group_columns, start=1):
+                    other_axes = tuple(a for a in range(1, len(sizes) + 1) if a != axis)
+                    counts[column][block] = np.moveaxis(draws.sum(axis=other_axes), 1, 2)
+                counts[None][block] = draws.sum(axis=tuple(range(1, len(sizes) + 1)))[:, :, None, :]
+        start_year = pd.Timestamp.now().year if start_year is None else start_year
+        return ForecastResult(counts, self.group_levels, self.fault_types, list(range(start_year, start_year + horizon)))
+
+# Class holding simulated failure counts, shaped (scenario, year, level, fault type) per group column
+# (key None holds the network totals)
+class ForecastResult:
+    def __init__(self, counts, group_levels, fault_types, years):
+        self.counts = counts
+        self.group_levels = group_levels
+        self.fault_types = fault_types
+        self.years = years
+
+    # Function to summarize the counts per year (and level of column) and fault type, with 'All' for every type:
+    # the expected count over the scenarios and the given quantiles
+    def summary(self, column=None, quantiles=(0.05, 0.5, 0.95)):
+        array = self.counts[column]
+        array = np.concatenate([array, array.sum(axis=3, keepdims=True)], axis=3)
+        levels = [None] if column is None else self.group_levels[column]
+        index = pd.MultiIndex.from_product([self.years, levels, self.fault_types + ['All']], names=['Year', column, 'Fault type'])
+        table = pd.DataFrame({'expected': array.mean(axis=0).reshape(-1)}, index=index)
+        for q, values in zip(quantiles, np.quantile(array, quantiles, axis=0)):
+            table[f'q{round(q * 100):02d}'] = values.reshape(-1)
+        return table.droplevel(1) if column is None else table
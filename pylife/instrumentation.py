@@ -0,0 +1,129 @@
+import importlib
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Every finished stage is also logged as one JSON line on this logger
+logger = logging.getLogger('pylife.timing')
+
+# Upper bounds (seconds) of the duration histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float('inf'))
+
+# Per-stage counters and histograms for this process
+_lock = threading.Lock()
+_stages = {}
+_collectors = []
+_server = None
+
+# Class returned by timed(); set rows on it when the row count is only known inside the block
+class Timing:
+    def __init__(self, stage, rows=None):
+        self.stage = stage
+        self.rows = rows
+        self.seconds = None
+
+# Function to add one observation of a stage
+def record(stage, seconds, rows=None):
+    with _lock:
+        stats = _stages.setdefault(stage, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'last_seconds': 0.0,
+                                           'rows': 0, 'buckets': [0] * len(BUCKETS)})
+        stats['count'] += 1
+        stats['seconds'] += seconds
+        stats['max_seconds'] = max(stats['max_seconds'], seconds)
+        stats['last_seconds'] = seconds
+        stats['rows'] += rows or 0
+        stats['buckets'][next(i for i, bound in enumerate(BUCKETS) if seconds <= bound)] += 1
+    logger.info(json.dumps({'stage': stage, 'seconds': round(seconds, 6), 'rows': rows}))
+
+# Context manager timing the block as one observation of stage
+@contextmanager
+def timed(stage, rows=None):
+    timing = Timing(stage, rows)
+    start_time = time.perf_counter()
+    try:
+        yield timing
+    finally:
+        timing.seconds = time.perf_counter() - start_time
+        record(stage, timing.seconds, timing.rows)
+
+# Function to import a module where a code path first needs it. The first (cold) import in this process is
+# timed as the stage 'import <module>', so heavy libraries show up in the timing panel and /metrics as they load.
+def lazy_import(name):
+    module = sys.modules.get(name)
+    if module is None:
+        with timed(f'import {name}'):
+            module = importlib.import_module(name)
+    return module
+
+# Function to add gauges to /metrics; collect() returns (name, help, value) tuples
+def register_collector(collect):
+    with _lock:
+        _collectors.append(collect)
+
+# Function to list the per-stage totals, slowest first
+def snapshot():
+    with _lock:
+        rows = [{'stage': stage, 'count': stats['count'], 'total_s': stats['seconds'],
+                 'mean_s': stats['seconds'] / stats['count'], 'max_s': stats['max_seconds'],
+                 'last_s': stats['last_seconds'], 'rows': stats['rows']}
+                for stage, stats in _stages.items()]
+    return sorted(rows, key=lambda row: row['total_s'], reverse=True)
+
+# Function to forget every observation
+def reset():
+    with _lock:
+        _stages.clear()
+
+# Function to render the counters and histograms in the Prometheus text exposition format
+def prometheus_text():
+    lines = ['# HELP pylife_stage_seconds Time spent in each instrumented stage.',
+             '# TYPE pylife_stage_seconds histogram']
+    with _lock:
+        stages = {stage: dict(stats, buckets=list(stats['buckets'])) for stage, stats in _stages.items()}
+    for stage, stats in stages.items():
+        cumulative = 0
+        for bound, count in zip(BUCKETS, stats['buckets']):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'pylife_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+        lines.append(f'pylife_stage_seconds_sum{{stage="{stage}"}} {stats["seconds"]}')
+        lines.append(f'pylife_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+    lines += ['# HELP pylife_stage_rows_total Rows processed by each instrumented stage.',
+              '# TYPE pylife_stage_rows_total counter']
+    for stage, stats in stages.items():
+        lines.append(f'pylife_stage_rows_total{{stage="{stage}"}} {stats["rows"]}')
+    with _lock:
+        collectors = list(_collectors)
+    for collect in collectors:
+        for name, description, value in collect():
+            lines += [f'# HELP {name} {description}', f'# TYPE {name} gauge', f'{name} {value}']
+    return '\n'.join(lines) + '\n'
+
+# Class answering GET /metrics with prometheus_text()
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip('/') != '/metrics':
+            self.send_error(404)
+            return
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+# Function to serve /metrics from a background thread; later calls in the same process are no-ops
+def start_metrics_server(port, host='0.0.0.0'):
+    global _server
+    with _lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name='pylife-metrics', daemon=True).start()
+    return _server
@@ -0,0 +1,84 @@
+import numpy as np
+
+from pylife import cascade
+from pylife.features import CompiledModel, compile_pipeline
+from pylife.instrumentation import timed
+
+# Monte Carlo draws per row when propagating uncertainty through the cascade
+DEFAULT_SAMPLES = 100
+
+# (draw, segment) cells sampled at once, bounding the memory of the permutation and the gathered feature rows
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+# Function to split a model into its compiled feature transform and the trees of its random forest
+def forest(model):
+    from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+
+    if not isinstance(model, CompiledModel):
+        model = compile_pipeline(model)
+    if not isinstance(model.estimator, (RandomForestRegressor, ExtraTreesRegressor)):
+        raise NotImplementedError(f"prediction intervals need a random forest, not {type(model.estimator).__name__}")
+    return model.features, model.estimator.estimators_
+
+# Function to transform rows into the float32 matrix the trees read (what the forest's own predict converts to)
+def _tree_inputs(features, data):
+    return np.ascontiguousarray(features.transform(data), dtype=np.float32)
+
+# Function to compute every tree's prediction for every row, as a (trees, rows) array
+def tree_predictions(model, data):
+    features, trees = forest(model)
+    X = _tree_inputs(features, data)
+    with timed('interval_tree_predict', rows=len(X)):
+        return np.stack([tree.predict(X, check_input=False) for tree in trees])
+
+# Function to get the lower and upper bounds of a central interval over the first axis of samples
+def interval_bounds(samples, level=0.9):
+    return np.quantile(samples, [(1 - level) / 2, (1 + level) / 2], axis=0)
+
+# Function to compute per-row prediction intervals of a random forest from the spread of its trees
+def predict_intervals(model, data, level=0.9):
+    return interval_bounds(tree_predictions(model, data), level)
+
+# Function to sample the 1st -> 2nd -> 3rd failure cascade: each draw runs every row through one randomly
+# picked tree per model, feeding the drawn failure ages (not the point estimates) into the next model.
+# Returns a list of three (n_samples, rows) arrays of draws.
+def sample_cascade(data, models, n_samples=DEFAULT_SAMPLES, seed=0, chunk_rows=DEFAULT_CHUNK_ROWS):
+    rng = np.random.default_rng(seed)
+    stages = [('model_first_failure', cascade.numerical_features_model1, cascade.categorical_features_model1, {}),
+              ('model_second_failure', cascade.numerical_features_model2, cascade.categorical_features_model2,
+               {'Age at 1st Failure': 0}),
+              ('model_third_failure', cascade.numerical_features_model3, cascade.categorical_features_model3,
+               {'Age at 1st Failure': 0, 'Age at 2nd Failure': 1})]
+    n_rows = len(data)
+    samples_per_chunk = max(1, chunk_rows // max(n_rows, 1))
+    # The age columns only have to exist for the transform; their values are replaced by the draws
+    data = data.assign(**{'Age at 1st Failure': 0.0, 'Age at 2nd Failure': 0.0})
+    draws = []
+    for name, numerical_features, categorical_features, ages in stages:
+        features, trees = forest(models[name])
+        X = _tree_inputs(features, data[numerical_features + categorical_features])
+        overrides = [(*features.numeric_position(age), stage) for age, stage in ages.items()]
+        stage_draws = np.empty((n_samples, n_rows), dtype=np.float32)
+        with timed('interval_cascade_stage', rows=n_samples * n_rows):
+            for start in range(0, n_samples, samples_per_chunk):
+                block = slice(start, min(start + samples_per_chunk, n_samples))
+                out = stage_draws[block].reshape(-1)
+                # A random permutation of the block's (draw, row) cells, dealt out evenly over the trees,
+                # so every tree is called once per block and no sort is needed to group the cells
+                cells = rng.permutation(len(out))
+                bounds = np.linspace(0, len(cells), len(trees) + 1).astype(np.int64)
+                for t, tree in enumerate(trees):
+                    tree_cells = cells[bounds[t]:bounds[t + 1]]
+                    rows = np.take(X, tree_cells % n_rows, axis=0)
+                    for index, mean, scale, stage in overrides:
+                        rows[:, index] = (draws[stage][block].reshape(-1)[tree_cells] - mean) / scale
+                    out[tree_cells] = tree.predict(rows, check_input=False)
+        draws.append(stage_draws)
+    return draws
+
+# Function to add '<prediction> Lower' and '<prediction> Upper' columns for every cascade output
+def cascade_intervals(data, models, level=0.9, n_samples=DEFAULT_SAMPLES, seed=0):
+    draws = sample_cascade(data, models, n_samples, seed)
+    for column, stage_draws in zip(cascade.PREDICTION_COLUMNS, draws):
+        data[f'{column} Lower'], data[f'{column} Upper'] = interval_bounds(stage_draws, level)
+    return data
@@ -0,0 +1,119 @@
+import os
+import pandas as pd
+
+# Function to tell the table format from the file extension
+def table_format(path):
+    extension = os.path.splitext(str(path))[1].lower()
+    return 'parquet' if extension in ('.parquet', '.pq') else 'csv'
+
+# Function to read a whole CSV/Parquet table
+def read_table(path):
+    if table_format(path) == 'parquet':
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+# Function to read only the column names of a CSV/Parquet table
+def table_columns(path):
+    if table_format(path) == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+# Function to count the data rows of a CSV/Parquet table without parsing it (CSV rows with quoted line breaks count twice)
+def table_rows(path):
+    if table_format(path) == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    lines = 0
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            lines += block.count(b'\n')
+            last = block
+    # The header line does not count, and the last line may lack its line break
+    return max(lines - 1 + (lines > 0 and not last.endswith(b'\n')), 0)
+
+# Function to read a CSV/Parquet table as a sequence of chunks
+def iter_table_chunks(source, chunk_size):
+    if table_format(getattr(source, 'name', source)) == 'parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(source, chunksize=chunk_size)
+
+# Function to find a type that holds the values of both types: int and float widen to float, a column that was
+# empty so far takes the other type, and anything else that does not mix (numbers and text) becomes text
+def _widen_type(current, other):
+    import pyarrow as pa
+    if current == other:
+        return current
+    try:
+        return pa.unify_schemas([pa.schema([('value', current)]), pa.schema([('value', other)])],
+                                promote_options='permissive').field('value').type
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return pa.string()
+
+# Class to append chunks to a CSV/Parquet file, writing the header only once. A Parquet file has one schema, so when
+# a later chunk does not fit the columns written so far (e.g. 2.5 in a column that held only integers), the rows
+# already written are rewritten with the widened types; the file only appears under its name once closed.
+class TableWriter:
+    def __init__(self, path):
+        self.path = path
+        self.format = table_format(path)
+        self.parquet_writer = None
+        self.temp_path = f"{path}.{os.getpid()}.tmp"
+        self.chunks_written = 0
+
+    def write(self, chunk):
+        if self.format == 'parquet':
+            import pyarrow as pa
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self.parquet_writer is None:
+                self._open(table.schema)
+            elif table.schema != self.parquet_writer.schema:
+                schema = self.parquet_writer.schema
+                widened = pa.schema([field.with_type(_widen_type(field.type, table.schema.field(field.name).type))
+                                     for field in schema], metadata=schema.metadata)
+                if widened != schema:
+                    self._rewrite(widened)
+                table = table.select(widened.names)
+            self.parquet_writer.write_table(table.cast(self.parquet_writer.schema))
+        else:
+            first = self.chunks_written == 0
+            chunk.to_csv(self.path, mode='w' if first else 'a', header=first, index=False)
+        self.chunks_written += 1
+
+    def _open(self, schema):
+        import pyarrow.parquet as pq
+        self.parquet_writer = pq.ParquetWriter(self.temp_path, schema)
+
+    # Function to copy the row groups written so far into a new file with the widened schema, one group at a time
+    def _rewrite(self, schema):
+        import pyarrow.parquet as pq
+        self.parquet_writer.close()
+        old_path = f"{self.temp_path}.old"
+        os.replace(self.temp_path, old_path)
+        try:
+            written = pq.ParquetFile(old_path)
+            self._open(schema)
+            for group in range(written.num_row_groups):
+                self.parquet_writer.write_table(written.read_row_group(group).cast(schema))
+        finally:
+            os.remove(old_path)
+
+    def close(self):
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+            self.parquet_writer = None
+            os.replace(self.temp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# Function to write a whole table to CSV/Parquet
+def write_table(data, path):
+    with TableWriter(path) as writer:
+        writer.write(data)
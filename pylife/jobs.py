@@ -0,0 +1,253 @@
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+# Directory holding one sub-directory per job: its spec and status (job.json), input copy and outputs
+JOB_DIRECTORY = 'job_queue'
+
+# Statuses of jobs that have not finished yet
+PENDING_STATUSES = ('queued', 'running')
+
+# Rows per chunk when a scoring job streams its input
+DEFAULT_CHUNK_SIZE = 50000
+
+# Pool shared by every session of this server process, and the jobs it was given
+_executor = None
+_futures = {}
+_lock = threading.Lock()
+_started = False
+
+# Function to pick the number of job worker processes (PYLIFE_JOB_WORKERS, default 2)
+def max_workers():
+    return max(int(os.environ.get('PYLIFE_JOB_WORKERS', 2)), 1)
+
+# Function to name the directory of a job
+def job_directory(job_id):
+    return os.path.join(JOB_DIRECTORY, job_id)
+
+# Function to read the spec and status of a job
+def job_status(job_id):
+    with open(os.path.join(job_directory(job_id), 'job.json')) as file:
+        job = json.load(file)
+    job['fraction'] = min(job['rows_done'] / job['rows_total'], 1.0) if job.get('rows_total') else None
+    return job
+
+# Function to update fields of a job's status, atomically so pollers never read half a file
+def _write_status(job_id, **fields):
+    path = os.path.join(job_directory(job_id), 'job.json')
+    job = {}
+    if os.path.exists(path):
+        with open(path) as file:
+            job = json.load(file)
+    job.update(fields)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as file:
+        json.dump(job, file)
+    os.replace(temp_path, path)
+    return job
+
+# Function to score a table with the cascade or TTNF model, reporting rows done after every chunk
+def _run_scoring(job, report):
+    from pylife import cascade, ttnf
+    from pylife.io import table_rows
+    from pylife.models import load_models
+
+    params = job['params']
+    report(rows_total=table_rows(job['input']))
+    models = load_models(params['model_path'])
+    output_path = os.path.join(job_directory(job['id']), params.get('output_name', 'predictions.csv'))
+    if job['kind'] == 'cascade':
+        progress = cascade.predict_failure_stream(job['input'], output_path, params.get('chunk_size', DEFAULT_CHUNK_SIZE), models)
+    else:
+        progress = ttnf.predict_stream(job['input'], output_path, params.get('chunk_size', DEFAULT_CHUNK_SIZE), models['ttnf'])
+    for rows_done in progress:
+        report(rows_done=rows_done)
+    return [output_path]
+
+# Function to fit the Cox model and save its coefficients and per-record risk scores
+def _run_cox(job, report):
+    from pylife.cox import fit_cox
+    from pylife.datasets import load_dataset
+    from pylife.schema import SURVIVAL_SCHEMA
+
+    data = load_dataset(job['input'], schema=SURVIVAL_SCHEMA)
+    report(rows_total=len(data))
+    cox_fit = fit_cox(data, job['params'].get('alpha', 0.1))
+    directory = job_directory(job['id'])
+    coefficients_path = os.path.join(directory, 'cox_coefficients.csv')
+    cox_fit.coefficients().to_csv(coefficients_path, index_label='Feature')
+    risk_scores_path = os.path.join(directory, 'risk_scores.csv')
+    data.assign(risk_score=cox_fit.risk_scores).to_csv(risk_scores_path, index=False)
+    report(rows_done=len(data))
+    return [coefficients_path, risk_scores_path]
+
+# Function to compute the Kaplan-Meier curves of every level of one column
+def _run_km(job, report):
+    from pylife.datasets import load_dataset
+    from pylife.schema import SURVIVAL_SCHEMA
+    from pylife.survival import KaplanMeierCurves
+
+    data = load_dataset(job['input'], schema=SURVIVAL_SCHEMA)
+    report(rows_total=len(data))
+    km_curves = KaplanMeierCurves(job['params'].get('group_column', 'A_MAT')).sync(data)
+    curves_path = os.path.join(job_directory(job['id']), 'km_curves.csv')
+    km_curves.curves().reset_index().to_csv(curves_path, index=False)
+    report(rows_done=len(data))
+    return [curves_path]
+
+# Job kinds and the functions running them inside a worker process
+RUNNERS = {'cascade': _run_scoring, 'ttnf': _run_scoring, 'cox': _run_cox, 'km': _run_km}
+
+# Function run in a worker process: executes one job and records its progress and outcome on disk
+def _run_job(job_id):
+    job = _write_status(job_id, status='running', started=time.time(), pid=os.getpid())
+    try:
+        outputs = RUNNERS[job['kind']](job, lambda **fields: _write_status(job_id, **fields))
+        _write_status(job_id, status='done', finished=time.time(), outputs=[os.path.basename(path) for path in outputs])
+    except Exception as e:
+        _write_status(job_id, status='failed', finished=time.time(), error=f"{type(e).__name__}: {e}",
+                      traceback=traceback.format_exc())
+
+# Function to tell whether a process is still running on this host
+def _pid_alive(pid):
+    if not pid:
+        return False
+    if os.name == 'nt':
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        # PROCESS_QUERY_LIMITED_INFORMATION; a running process reports STILL_ACTIVE (259) as its exit code
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+        kernel32.CloseHandle(handle)
+        return code.value == 259
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+# Function to tell whether an unfinished job was left behind by a server process that is gone. A job still
+# running in a live worker (even one whose server died) is left alone; it records its own outcome.
+def _orphaned(job):
+    if job['status'] not in PENDING_STATUSES:
+        return False
+    server_pid = job.get('server_pid')
+    if server_pid == os.getpid() or _pid_alive(server_pid):
+        return False
+    return job['status'] == 'queued' or not _pid_alive(job.get('pid'))
+
+# Function to hand a job to the pool, recreating the pool if a dead worker broke it
+def _submit_job(job_id):
+    global _executor
+    for _ in range(2):
+        executor = _get_executor()
+        try:
+            future = executor.submit(_run_job, job_id)
+        except BrokenProcessPool:
+            with _lock:
+                if _executor is executor:
+                    _executor = None
+            continue
+        _futures[job_id] = future
+        future.add_done_callback(partial(_job_finished, job_id, executor))
+        return future
+    raise BrokenProcessPool("could not start the job worker processes")
+
+# Function run when a job's future completes. A worker that died (killed, out of memory, a crash in native code)
+# breaks the whole pool: the job it ran is marked failed, jobs that were only waiting go to a fresh pool.
+def _job_finished(job_id, executor, future):
+    global _executor
+    if future.cancelled() or not isinstance(future.exception(), BrokenProcessPool):
+        return
+    with _lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+    job = job_status(job_id)
+    if job['status'] == 'queued':
+        _submit_job(job_id)
+    elif job['status'] == 'running':
+        _write_status(job_id, status='failed', finished=time.time(),
+                      error="A worker process of the job pool exited unexpectedly while this job ran")
+
+# Function to get the pool of this server process, starting it on first use
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=max_workers())
+        return _executor
+
+# Function to start the job pool when the server starts, re-queueing the jobs that server processes which are
+# no longer running left unfinished (their input is still on disk, so they start over). Runs once per process.
+def start():
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+    for job in list_jobs():
+        if not _orphaned(job):
+            continue
+        if job['status'] == 'running':
+            _write_status(job['id'], status='queued', rows_done=0, server_pid=os.getpid(),
+                          note='restarted after its server process stopped')
+        else:
+            _write_status(job['id'], server_pid=os.getpid())
+        _submit_job(job['id'])
+
+# Function to queue a job and return its ID. source is a file path or an uploaded file;
+# uploads are copied into the job directory so the job outlives the session that sent it.
+def submit(kind, source, **params):
+    if kind not in RUNNERS:
+        raise ValueError(f"unknown job kind {kind!r}; expected one of {sorted(RUNNERS)}")
+    start()
+    job_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    os.makedirs(job_directory(job_id))
+    if isinstance(source, (str, os.PathLike)):
+        input_path = os.path.abspath(source)
+    else:
+        input_path = os.path.abspath(os.path.join(job_directory(job_id), f"input{os.path.splitext(source.name)[1]}"))
+        with open(input_path, 'wb') as file:
+            file.write(source.getvalue())
+    _write_status(job_id, id=job_id, kind=kind, params=params, input=input_path, status='queued',
+                  rows_done=0, rows_total=None, submitted=time.time(), outputs=[], server_pid=os.getpid())
+    _submit_job(job_id)
+    return job_id
+
+# Function to cancel a job that has not started yet
+def cancel(job_id):
+    future = _futures.get(job_id)
+    if future is not None and future.cancel():
+        _write_status(job_id, status='cancelled', finished=time.time())
+        return True
+    return False
+
+# Function to list jobs, newest first (all jobs on disk, or only the given IDs)
+def list_jobs(job_ids=None, kinds=None):
+    if job_ids is None:
+        job_ids = os.listdir(JOB_DIRECTORY) if os.path.isdir(JOB_DIRECTORY) else []
+    jobs = []
+    for job_id in job_ids:
+        try:
+            job = job_status(job_id)
+        except (OSError, ValueError):
+            continue
+        if kinds is None or job['kind'] in kinds:
+            jobs.append(job)
+    return sorted(jobs, key=lambda job: job['submitted'], reverse=True)
+
+# Function to get the paths of a finished job's result files
+def job_outputs(job_id):
+    return [os.path.join(job_directory(job_id), name) for name in job_status(job_id)['outputs']]
@@ -0,0 +1,85 @@
+import pandas as pd
+
+from pylife.changes import diff_rows
+from pylife.instrumentation import timed
+from pylife.shared_cache import DerivedCache
+
+# Cubes keyed by dataset content hash (bounded, see DerivedCache), and the latest hash seen for each source (file name)
+_cubes = DerivedCache('failure_cube')
+_latest = {}
+
+# Class aggregating failure records once per dataset. For every analysed variable it keeps one small
+# cube of failure counts and pipe length by (variable, Failure Year, FAULT_TYPE); the metrics table,
+# bar plots and heatmap are all slices of that cube instead of fresh pivots over the raw rows.
+class FailureCube:
+    def __init__(self, df, value_column='LENGTH', year_column='Failure Year', fault_column='FAULT_TYPE'):
+        self.df = df
+        self.value_column = value_column
+        self.year_column = year_column
+        self.fault_column = fault_column
+        self._cubes = {}
+
+    # Function to aggregate some rows for one variable
+    def _aggregate(self, df, index_var):
+        keys = list(dict.fromkeys([index_var, self.year_column, self.fault_column]))
+        return df.groupby(keys, observed=True, dropna=False)[self.value_column].agg(['count', 'sum', 'size'])
+
+    # Function to aggregate the raw rows for one variable, the only step that scans them
+    def cube(self, index_var):
+        if index_var not in self._cubes:
+            with timed('failure_cube_aggregate', rows=len(self.df)):
+                self._cubes[index_var] = self._aggregate(self.df, index_var)
+        return self._cubes[index_var]
+
+    # Function to derive the cube of a new version of the records, re-aggregating only the changed rows
+    def updated(self, df):
+        new = FailureCube(df, self.value_column, self.year_column, self.fault_column)
+        if list(df.columns) != list(self.df.columns):
+            return new
+        changes = diff_rows(self.df, df)
+        if len(changes.deleted) + len(changes.inserted) >= len(df):
+            return new
+        with timed('failure_cube_update', rows=len(changes.deleted) + len(changes.inserted)):
+            for index_var, cube in self._cubes.items():
+                patched = (cube.sub(self._aggregate(changes.deleted, index_var), fill_value=0)
+                               .add(self._aggregate(changes.inserted, index_var), fill_value=0))
+                # Groups whose last record was deleted disappear, as they would from a fresh groupby
+                patched = patched[patched['size'] > 0].sort_index()
+                new._cubes[index_var] = patched.astype({'count': int, 'size': int})
+        return new
+
+    # Function to calculate metrics: failures by fault type, total km, bursts/km and leaks/km
+    def metrics(self, index_var):
+        cube = self.cube(index_var)
+        value = self.value_column
+        table_count = cube['count'].groupby(level=[index_var, self.fault_column], observed=True).sum().unstack(fill_value=0)
+        table_count.columns = pd.MultiIndex.from_product([[value], table_count.columns])
+        table_sum = cube['sum'].groupby(level=index_var, observed=True).sum().to_frame(value)
+        table_sum[f'{index_var}_Km'] = table_sum[value] / 1000
+        table_combined = pd.concat([table_count, table_sum], axis=1)
+
+        if (value, 'BURST') in table_combined.columns:
+            table_combined[f'bursts/km_{index_var}'] = table_combined[(value, 'BURST')] / table_combined[f'{index_var}_Km']
+        if (value, 'LEAK') in table_combined.columns:
+            table_combined[f'leaks/km_{index_var}'] = table_combined[(value, 'LEAK')] / table_combined[f'{index_var}_Km']
+
+        return table_combined
+
+    # Function to get failures per length by year, as shown in the heatmap
+    def heatmap(self, index_var, scale=100):
+        cube = self.cube(index_var)
+        failure_counts = cube['count'].groupby(level=[self.year_column, index_var], observed=True).sum().unstack(index_var)
+        # Levels without any counted failure are left out, as pivot_table does
+        failure_counts = failure_counts.loc[:, (failure_counts.fillna(0) != 0).any()].fillna(0)
+        total_lengths = cube['sum'].groupby(level=index_var, observed=True).sum()
+        return failure_counts.div(total_lengths, axis=1) * scale
+
+# Function to get the cube of a dataset version, patched from the previous version of the same source when there is one
+def cached_failure_cube(df, data_hash, source=None):
+    cube = _cubes.get(data_hash)
+    if cube is None:
+        previous = _cubes.get(_latest.get(source)) if source is not None else None
+        cube = _cubes.put(data_hash, data_hash, previous.updated(df) if previous is not None else FailureCube(df))
+    if source is not None:
+        _latest[source] = data_hash
+    return cube
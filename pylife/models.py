@@ -0,0 +1,22 @@
+import functools
+import hashlib
+import json
+
+from pylife.features import compile_models
+from pylife.registry import artifact_path, load_artifact, load_variant
+
+# Default model artifacts: the promoted retrained versions, else the pickles shipped next to Home.py
+CASCADE_MODEL_PATH = artifact_path('cascade')
+TTNF_MODEL_PATH = artifact_path('ttnf_rf')
+
+# Function to load the models; with compiled=True each scikit-learn pipeline whose preprocessing can be
+# compiled to a NumPy transform (and reproduces its predictions) is swapped for the compiled version.
+# column_names names the inputs of models fitted on arrays, so frames passed to them are read by name.
+def load_models(model_path, compiled=True, column_names=None):
+    if not compiled:
+        return load_artifact(model_path)
+    if column_names is None:
+        return load_variant(model_path, 'compiled', compile_models)
+    names_sha256 = hashlib.sha256(json.dumps(list(column_names)).encode()).hexdigest()
+    return load_variant(model_path, f'compiled-{names_sha256[:8]}',
+                        functools.partial(compile_models, column_names=list(column_names)))
@@ -0,0 +1,82 @@
+import math
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from pylife import cascade, ttnf
+from pylife.io import TableWriter, iter_table_chunks
+from pylife.models import load_models
+from pylife.prediction_cache import row_hashes
+
+# Models loaded once per worker process by _init_worker
+_worker_models = None
+_worker_kind = None
+
+# Function to load the models once when a worker process starts
+def _init_worker(kind, model_path):
+    global _worker_models, _worker_kind
+    _worker_models = load_models(model_path)
+    _worker_kind = kind
+
+# Function to score one shard inside a worker process
+def _score_shard(shard):
+    if _worker_kind == 'cascade':
+        return cascade.predict_failure_cascade(shard, _worker_models)
+    shard['Prediction'] = ttnf.predict_batch(_worker_models['ttnf'], shard[ttnf.required_columns])
+    return shard
+
+# Function to pick the number of worker processes
+def default_jobs(n_jobs=None):
+    if n_jobs is None or n_jobs <= 0:
+        return os.cpu_count() or 1
+    return n_jobs
+
+# Function to start a pool whose workers each hold their own copy of the models
+def make_pool(kind, model_path, n_jobs=None):
+    return ProcessPoolExecutor(max_workers=default_jobs(n_jobs), initializer=_init_worker, initargs=(kind, model_path))
+
+# Function to cut a frame into contiguous shards, keeping input order
+def split_shards(data, n_shards):
+    shard_size = max(1, math.ceil(len(data) / max(n_shards, 1)))
+    return [data.iloc[start:start + shard_size] for start in range(0, len(data), shard_size)]
+
+# Function to score a whole frame across all CPU cores ('cascade' or 'ttnf');
+# with a cache, only the rows it has not seen are sent to the workers
+def predict_parallel(data, kind, model_path, n_jobs=None, shards_per_job=4, cache=None):
+    if cache is not None:
+        features, outputs = (cascade.input_features, cascade.PREDICTION_COLUMNS) if kind == 'cascade' else (ttnf.required_columns, ['Prediction'])
+        values = cache.resolve(row_hashes(data, features),
+                               lambda positions: predict_parallel(data.iloc[positions].copy(), kind, model_path, n_jobs, shards_per_job)[outputs])
+        if kind == 'cascade':
+            return cascade.assign_predictions(data, values)
+        data['Prediction'] = values[:, 0]
+        return data
+    n_jobs = default_jobs(n_jobs)
+    shards = split_shards(data, n_jobs * shards_per_job)
+    if not shards:
+        return data
+    with make_pool(kind, model_path, n_jobs) as pool:
+        # map returns the shards in submission order, so rows stay in input order
+        return pd.concat(pool.map(_score_shard, shards))
+
+# Function to stream a CSV/Parquet source through a pool, writing chunks back in input order
+def predict_parallel_stream(source, output_path, chunk_size, kind, model_path, n_jobs=None):
+    n_jobs = default_jobs(n_jobs)
+    rows_done = 0
+    pending = deque()
+    with make_pool(kind, model_path, n_jobs) as pool, TableWriter(output_path) as writer:
+        for chunk in iter_table_chunks(source, chunk_size):
+            pending.append(pool.submit(_score_shard, chunk))
+            # Keep at most two chunks per worker in flight so memory stays bounded
+            while len(pending) >= 2 * n_jobs:
+                scored = pending.popleft().result()
+                writer.write(scored)
+                rows_done += len(scored)
+                yield rows_done
+        while pending:
+            scored = pending.popleft().result()
+            writer.write(scored)
+            rows_done += len(scored)
+            yield rows_done
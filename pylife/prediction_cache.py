@@ -0,0 +1,124 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from pylife.registry import file_sha256
+
+# Rows each cache remembers before evicting the least recently used
+DEFAULT_MAX_ROWS = 200_000
+
+# Caches in this process, keyed by (name, model version)
+_caches = {}
+_caches_lock = threading.Lock()
+
+# Function to key the values of a text/mixed column exactly: text as it is (' DI' is not 'DI'), numbers as
+# float64 (1990 and 1990.0 match, the text '1990' does not), anything else by type and value
+def _object_keys(values):
+    array = values.to_numpy(dtype=object)
+    missing = pd.isna(array)
+    if pd.api.types.infer_dtype(array, skipna=True) in ('string', 'empty'):
+        return np.where(missing, '', array)
+    keys = np.empty(len(array), dtype=object)
+    for i, value in enumerate(array):
+        if missing[i]:
+            keys[i] = ''
+        elif isinstance(value, str):
+            keys[i] = f"str:{value}"
+        elif isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, (bool, np.bool_)):
+            keys[i] = f"num:{float(value)!r}"
+        else:
+            keys[i] = f"{type(value).__name__}:{value!r}"
+    return keys
+
+# Function to hash each row of the feature columns from their raw values. Integers and floats of the same
+# value share a key (a column the editor turned from int to float is unchanged); everything else, including
+# surrounding whitespace, is kept. Missing values are marked in a separate column, so they never match a
+# string such as 'nan' or ''.
+def row_hashes(data, columns):
+    normalized = {}
+    for i, column in enumerate(columns):
+        values = data[column]
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            normalized[i] = values.to_numpy(dtype='float64', na_value=np.nan)
+        elif values.dtype == object or isinstance(values.dtype, (pd.CategoricalDtype, pd.StringDtype)):
+            normalized[i] = _object_keys(values)
+            normalized[f'{i} missing'] = values.isna().to_numpy()
+        else:
+            normalized[i] = values.to_numpy()
+    return pd.util.hash_pandas_object(pd.DataFrame(normalized, index=pd.RangeIndex(len(data))), index=False).to_numpy()
+
+# Class holding the outputs of one model version for feature rows it has already scored
+class PredictionCache:
+    def __init__(self, outputs, max_rows=DEFAULT_MAX_ROWS):
+        self.outputs = list(outputs)
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self.last_hits = 0
+        self.last_rows = 0
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Returns a hit mask and the cached outputs (NaN where the row was not cached)
+    def lookup(self, hashes):
+        values = np.full((len(hashes), len(self.outputs)), np.nan)
+        found = np.zeros(len(hashes), dtype=bool)
+        with self._lock:
+            for i, key in enumerate(hashes.tolist()):
+                cached = self._rows.get(key)
+                if cached is not None:
+                    self._rows.move_to_end(key)
+                    values[i] = cached
+                    found[i] = True
+            self.last_hits = int(found.sum())
+            self.last_rows = len(hashes)
+            self.hits += self.last_hits
+            self.misses += self.last_rows - self.last_hits
+        return found, values
+
+    def store(self, hashes, values):
+        with self._lock:
+            for key, row in zip(hashes.tolist(), values.tolist()):
+                self._rows[key] = row
+                self._rows.move_to_end(key)
+            while len(self._rows) > self.max_rows:
+                self._rows.popitem(last=False)
+
+    # Fills the outputs for every row; predict(positions) is only called for the distinct rows not cached yet
+    def resolve(self, hashes, predict):
+        found, values = self.lookup(hashes)
+        missing = np.flatnonzero(~found)
+        if len(missing):
+            unique_hashes, first, inverse = np.unique(hashes[missing], return_index=True, return_inverse=True)
+            scored = np.asarray(predict(missing[first]), dtype='float64').reshape(len(first), len(self.outputs))
+            values[missing] = scored[inverse.ravel()]
+            self.store(unique_hashes, scored)
+        return values
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+            self.hits = self.misses = self.last_hits = self.last_rows = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'rows': len(self._rows), 'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else 0.0}
+
+# Function to get the process-wide cache for a model, keyed by the artifact's content hash
+# so retraining or swapping the pickle never serves stale predictions
+def get_cache(name, model_path, outputs, max_rows=DEFAULT_MAX_ROWS):
+    key = (name, file_sha256(model_path)[:12])
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = PredictionCache(outputs, max_rows)
+        return _caches[key]
+
+# Function to list the hit rates of every cache in this process
+def cache_stats():
+    with _caches_lock:
+        caches = list(_caches.items())
+    return [dict({'cache': name, 'version': version}, **cache.stats()) for (name, version), cache in caches]
@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+
+from pylife.instrumentation import timed
+from pylife.shared_cache import DerivedCache
+
+# Ways to order segments: by Cox risk score (log relative hazard), or by relative hazard per km of pipe,
+# the greedy choice when a length budget has to buy as much risk reduction as possible
+RANK_BY = ('risk', 'risk_per_km')
+
+# Rankings by dataset hash, shared across reruns (bounded, see DerivedCache)
+_rankings = DerivedCache('ranking')
+
+# Class ranking segments by risk for replacement planning. For each ranking it keeps the row positions
+# sorted by priority, globally and per level of every filter column that has been queried (a partitioned
+# index), so a top-K query reads the first K positions of one partition instead of sorting the register.
+# When only some risk scores change, update() moves those rows within the sorted orders instead of re-sorting.
+class RiskRanking:
+    def __init__(self, data, score_column='risk_score', length_column='LENGTH'):
+        self.data = data
+        self.score_column = score_column
+        self.length_column = length_column
+        self.scores = pd.to_numeric(data[score_column], errors='coerce').to_numpy(dtype=float).copy()
+        self.lengths = pd.to_numeric(data[length_column], errors='coerce').to_numpy(dtype=float) / 1000
+        self._orders = {}
+        self._partitions = {}
+
+    # Function to compute the priority keys (higher first) of some rows; missing scores rank last
+    def _keys(self, positions, rank_by):
+        scores = self.scores[positions]
+        if rank_by == 'risk_per_km':
+            with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+                scores = np.exp(scores) / self.lengths[positions]
+        return np.where(np.isfinite(scores), scores, -np.inf)
+
+    # Function to get the row positions sorted by priority for a ranking
+    def order(self, rank_by='risk'):
+        if rank_by not in RANK_BY:
+            raise ValueError(f"rank_by must be one of {RANK_BY}")
+        if rank_by not in self._orders:
+            with timed('priority_sort', rows=len(self.scores)):
+                positions = np.arange(len(self.scores))
+                self._orders[rank_by] = positions[np.argsort(-self._keys(positions, rank_by), kind='stable')]
+        return self._orders[rank_by]
+
+    # Function to get the priority-sorted positions of one level of a column, split off the global order once
+    def _partition(self, column, level, rank_by):
+        key = (column, rank_by)
+        if key not in self._partitions:
+            order = self.order(rank_by)
+            levels = self.data[column].to_numpy()[order]
+            codes, uniques = pd.factorize(levels)
+            # A stable sort by level keeps every level's positions in priority order
+            grouped = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[grouped], np.arange(len(uniques) + 1))
+            self._partitions[key] = {uniques[i]: order[grouped[bounds[i]:bounds[i + 1]]] for i in range(len(uniques))}
+        return self._partitions[key].get(level, np.empty(0, dtype=np.int64))
+
+    # Function to list the candidate positions in priority order that pass the filters ({column: level or levels})
+    def _candidates(self, filters, rank_by):
+        filters = {column: levels if isinstance(levels, (list, tuple, set)) else [levels]
+                   for column, levels in (filters or {}).items()}
+        if not filters:
+            return self.order(rank_by)
+        # Start from the partitions of one filter column, then merge its levels back into priority order
+        column, levels = next(iter(filters.items()))
+        candidates = np.concatenate([self._partition(column, level, rank_by) for level in levels] or [np.empty(0, dtype=np.int64)])
+        if len(levels) > 1:
+            candidates = candidates[np.argsort(-self._keys(candidates, rank_by), kind='stable')]
+        for other_column, other_levels in list(filters.items())[1:]:
+            candidates = candidates[np.isin(self.data[other_column].to_numpy()[candidates], list(other_levels))]
+        return candidates
+
+    # Function to get the K highest-priority segments that pass the filters
+    def top_k(self, k, filters=None, rank_by='risk'):
+        with timed('priority_query') as timing:
+            positions = self._candidates(filters, rank_by)[:k]
+            timing.rows = len(positions)
+        return self._result(positions, rank_by)
+
+    # Function to schedule segments in priority order until the next one would exceed budget_km of pipe
+    def within_budget(self, budget_km, filters=None, rank_by='risk', k=None):
+        with timed('priority_query') as timing:
+            candidates = self._candidates(filters, rank_by)
+            lengths = np.nan_to_num(self.lengths[candidates])
+            positions = candidates[:np.searchsorted(np.cumsum(lengths), budget_km, side='right')][:k]
+            timing.rows = len(positions)
+        return self._result(positions, rank_by)
+
+    # Function to build the result table of some positions, with their rank, relative hazard and cumulative length
+    def _result(self, positions, rank_by):
+        result = self.data.iloc[positions].copy()
+        result.insert(0, 'priority', np.arange(1, len(positions) + 1))
+        result[self.score_column] = self.scores[positions]
+        with np.errstate(over='ignore'):
+            result['relative_hazard'] = np.exp(self.scores[positions])
+        result['cumulative_km'] = np.nancumsum(self.lengths[positions])
+        return result
+
+    # Function to take in recomputed risk scores (a Series indexed like data). Few changes are moved within the
+    # sorted orders; many changes just drop the orders so they are re-sorted on the next query.
+    def update(self, scores):
+        positions = self.data.index.get_indexer(scores.index)
+        if (positions < 0).any():
+            raise KeyError("update() only takes scores of rows already in the ranking; build a new ranking for new rows")
+        new_scores = pd.to_numeric(scores, errors='coerce').to_numpy(dtype=float)
+        changed = self.scores[positions] != new_scores
+        positions, new_scores = positions[changed], new_scores[changed]
+        if not len(positions):
+            return self
+        with timed('priority_update', rows=len(positions)):
+            self.scores[positions] = new_scores
+            if len(positions) > len(self.scores) // 10:
+                self._orders.clear()
+                self._partitions.clear()
+                return self
+            for rank_by in list(self._orders):
+                self._orders[rank_by] = self._reinsert(self._orders[rank_by], positions, rank_by)
+            for (column, rank_by), partitions in self._partitions.items():
+                levels = self.data[column].to_numpy()[positions]
+                for level, order in partitions.items():
+                    moved = positions[levels == level]
+                    if len(moved):
+                        partitions[level] = self._reinsert(order, moved, rank_by)
+        return self
+
+    # Function to move some positions of a priority-sorted order to where their new keys belong
+    def _reinsert(self, order, moved, rank_by):
+        kept = order[~np.isin(order, moved)]
+        kept_keys = -self._keys(kept, rank_by)
+        moved = moved[np.argsort(-self._keys(moved, rank_by), kind='stable')]
+        return np.insert(kept, np.searchsorted(kept_keys, -self._keys(moved, rank_by), side='right'), moved)
+
+# Function to rank once per dataset hash; recomputed risk scores for the same records update the ranking in place
+def cached_ranking(data, data_hash, score_column='risk_score', length_column='LENGTH'):
+    key = (data_hash, score_column, length_column)
+    ranking = _rankings.get(key)
+    if ranking is None:
+        return _rankings.put(key, data_hash, RiskRanking(data, score_column, length_column))
+    return ranking.update(data[score_column])
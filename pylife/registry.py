@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import pickle
+
+import joblib
+
+from pylife.instrumentation import timed
+
+# Directory holding the memory-mappable copies of the pickled models
+CACHE_DIRECTORY = 'model_cache'
+
+# Model artifacts shipped next to Home.py
+ARTIFACTS = {
+    'cascade': {'path': 'FW_123.pkl', 'description': 'Time to 1st, 2nd and 3rd failure'},
+    'ttnf_rf': {'path': 'ttnf_rf_fw1.pkl', 'description': 'Time to next failure (random forest)'},
+    'ttnf_tabnet': {'path': 'ttnf_tabnet_fw.pkl', 'description': 'Time to next failure (TabNet)'},
+}
+
+# Directory holding retrained model versions (see pylife.training), and the file naming the version each artifact serves
+VERSION_DIRECTORY = 'model_versions'
+CURRENT_VERSIONS = os.path.join(VERSION_DIRECTORY, 'current.json')
+
+# Models already loaded in this process, and file hashes keyed by (path, size, mtime)
+_loaded = {}
+_hashes = {}
+
+# Function to hash a file in blocks, reusing the result while the file is unchanged
+def file_sha256(path):
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _hashes:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+        _hashes[key] = digest.hexdigest()
+    return _hashes[key]
+
+# Function to name the cached joblib copy of a pickle (or a variant derived from it, e.g. 'compiled') by its content hash
+def cache_path(model_path, sha256, variant=None):
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    suffix = f"-{variant}" if variant else ''
+    return os.path.join(CACHE_DIRECTORY, f"{stem}-{sha256[:12]}{suffix}.joblib")
+
+# Function to read the promoted version of every artifact, {name: path}
+def current_versions():
+    if not os.path.exists(CURRENT_VERSIONS):
+        return {}
+    with open(CURRENT_VERSIONS) as file:
+        return json.load(file)
+
+# Function to get the path an artifact is served from: its promoted retrained version if any, else the shipped pickle
+def artifact_path(name):
+    if name not in ARTIFACTS:
+        raise KeyError(f"Unknown model '{name}'. Available models: {sorted(ARTIFACTS)}")
+    path = current_versions().get(name)
+    return path if path and os.path.exists(path) else ARTIFACTS[name]['path']
+
+# Function to serve an artifact from a retrained version from now on (path=None goes back to the shipped pickle)
+def promote(name, path=None):
+    if name not in ARTIFACTS:
+        raise KeyError(f"Unknown model '{name}'. Available models: {sorted(ARTIFACTS)}")
+    current = current_versions()
+    if path is None:
+        current.pop(name, None)
+    else:
+        current[name] = path
+    os.makedirs(VERSION_DIRECTORY, exist_ok=True)
+    temp_path = f"{CURRENT_VERSIONS}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as file:
+        json.dump(current, file, indent=2)
+    os.replace(temp_path, CURRENT_VERSIONS)
+    _loaded.pop(name, None)
+
+# Function to list the registered artifacts with their versions and hashes
+def list_artifacts():
+    rows = []
+    for name, artifact in ARTIFACTS.items():
+        path = artifact_path(name)
+        available = os.path.exists(path)
+        sha256 = file_sha256(path) if available else None
+        rows.append({
+            'name': name,
+            'path': path,
+            'description': artifact['description'],
+            'available': available,
+            'size_mb': os.path.getsize(path) / 1e6 if available else None,
+            'version': sha256[:12] if available else None,
+            'sha256': sha256,
+            'cached': available and os.path.exists(cache_path(path, sha256)),
+        })
+    return rows
+
+# Function to write the joblib copy and its manifest, atomically so concurrent workers never read half a file
+def _write_cache(obj, cached, source_sha256):
+    os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+    temp_path = f"{cached}.{os.getpid()}.tmp"
+    # No compression, so numpy payloads can be memory-mapped on load
+    joblib.dump(obj, temp_path)
+    manifest = {'source_sha256': source_sha256, 'sha256': file_sha256(temp_path)}
+    with open(f"{temp_path}.json", 'w') as file:
+        json.dump(manifest, file)
+    os.replace(temp_path, cached)
+    os.replace(f"{temp_path}.json", f"{cached}.json")
+
+# Function to load a cached copy if its manifest matches the source pickle, else None
+def _load_cached(cached, source_sha256, mmap_mode, verify):
+    if os.path.exists(cached) and os.path.exists(f"{cached}.json"):
+        with open(f"{cached}.json") as file:
+            manifest = json.load(file)
+        if manifest.get('source_sha256') == source_sha256 and (not verify or file_sha256(cached) == manifest.get('sha256')):
+            # Array payloads stay on disk and are shared through the OS page cache between processes
+            with timed('model_mmap_load'):
+                return joblib.load(cached, mmap_mode=mmap_mode)
+    return None
+
+# Function to load a pickled model through the integrity-checked, memory-mapped cache
+def load_artifact(model_path, mmap_mode='r', verify=True):
+    source_sha256 = file_sha256(model_path)
+    cached = cache_path(model_path, source_sha256)
+    obj = _load_cached(cached, source_sha256, mmap_mode, verify)
+    if obj is not None:
+        return obj
+
+    # First load, or the cached copy is stale or corrupt: rebuild it from the pickle
+    with timed('model_unpickle'), open(model_path, 'rb') as file:
+        obj = pickle.load(file)
+    try:
+        _write_cache(obj, cached, source_sha256)
+    except OSError:
+        # A read-only deployment can still serve the model straight from the pickle
+        pass
+    return obj
+
+# Function to load a variant built from a pickled model (build(obj) -> variant), cached next to the joblib copy
+def load_variant(model_path, variant, build, mmap_mode='r', verify=True):
+    source_sha256 = file_sha256(model_path)
+    cached = cache_path(model_path, source_sha256, variant)
+    obj = _load_cached(cached, source_sha256, mmap_mode, verify)
+    if obj is not None:
+        return obj
+    with timed(f'model_build_{variant}'):
+        obj = build(load_artifact(model_path, mmap_mode, verify))
+    try:
+        _write_cache(obj, cached, source_sha256)
+    except OSError:
+        pass
+    return obj
+
+# Function to get a registered model by name, loading it on first request only
+def get_model(name):
+    if name not in ARTIFACTS:
+        raise KeyError(f"Unknown model '{name}'. Available models: {sorted(ARTIFACTS)}")
+    if name not in _loaded:
+        _loaded[name] = load_artifact(artifact_path(name))
+    return _loaded[name]
@@ -0,0 +1,104 @@
+import pandas as pd
+
+# Column kinds: 'integer' is downcast to the smallest integer type that fits (float64 if it has gaps),
+# 'float' stays float64 so model and Cox inputs keep full precision, 'category' is stored as category
+# codes, and 'text' is left as plain strings for the pickled models, whose handling of pandas
+# categoricals is unknown
+
+# Low-cardinality text columns shared by the asset / failure tables
+CATEGORICAL_COLUMNS = ['A_MAT', 'LANDUSE', 'LPR_Corros', 'FAULT_TYPE', 'DEFECT1LV1', 'DEF_NATURE', 'TYPE']
+
+# Survival.csv (page 3)
+SURVIVAL_SCHEMA = {
+    'Duration': 'integer',
+    'Status': 'integer',
+    'No. of previous failures': 'integer',
+    'LENGTH': 'float',
+    'A_DIAM': 'integer',
+    'Year': 'integer',
+    'PRESSURE(bar)': 'float',
+    'Failure Year': 'integer',
+    'AADT (traffic) ( When failure occurred )': 'float',
+    'Mean Dew Point (deg. C) ( When failure occurred )': 'float',
+    'Mean Relative Humidity (%) ( When failure occurred )': 'float',
+    'Total Rainfall (mm) ( When failure occurred )': 'float',
+    **{column: 'category' for column in CATEGORICAL_COLUMNS},
+}
+
+# Failure records uploaded on page 4 (the analysed variable is picked by the user)
+FAILURE_RECORD_SCHEMA = {
+    'LENGTH': 'float',
+    'FAULT_TYPE': 'category',
+    'Failure Year': 'integer',
+}
+
+# Inventory scored by the failure cascade (page 5)
+CASCADE_INPUT_SCHEMA = {
+    'Year of Installation': 'integer',
+    'SA': 'float',
+    'PRESSURE(bar)': 'float',
+    'AADT': 'float',
+    'MWI_1': 'float',
+    'A_MAT': 'text',
+    'LANDUSE': 'text',
+    'TYPE': 'text',
+    'LPR_Corros': 'text',
+}
+
+# Segments scored by the time-to-next-failure model (page 6)
+TTNF_INPUT_SCHEMA = {
+    'Year of Installation': 'integer',
+    'NOPF': 'integer',
+    'APF': 'float',
+    'Length': 'float',
+    'Pressure': 'float',
+    'FAULT_TYPE': 'text',
+    'A_DIAM': 'integer',
+    'Material': 'text',
+    'Urbanization': 'text',
+    'Soil Corrosivity': 'text',
+    'Latitude': 'float',
+    'Longitude': 'float',
+    'Effect of Traffic Load': 'float',
+}
+
+# Function to list the schema columns the data does not have
+def missing_columns(data, schema):
+    return [column for column in schema if column not in data.columns]
+
+# Function to convert one column to the kind declared in the schema
+def coerce_column(series, kind):
+    if kind == 'category':
+        return series.astype('category')
+    if kind == 'text':
+        return series
+    numeric = pd.to_numeric(series, errors='coerce')
+    bad_values = numeric.isna() & series.notna()
+    if bad_values.any():
+        raise ValueError(f"Column '{series.name}' has {bad_values.sum()} non-numeric values, e.g. {series[bad_values].iloc[0]!r}")
+    if kind == 'integer' and numeric.notna().all() and (numeric % 1 == 0).all():
+        return pd.to_numeric(numeric, downcast='integer')
+    return numeric.astype('float64')
+
+# Function to shrink columns outside the schema: low-cardinality text to category, integers downcast
+def optimize_dtypes(data, columns=None, categorize=True, max_category_ratio=0.5):
+    for column in data.columns if columns is None else columns:
+        series = data[column]
+        if series.dtype == object:
+            if not categorize:
+                continue
+            if series.nunique() <= max_category_ratio * len(series):
+                data[column] = series.astype('category')
+        elif pd.api.types.is_integer_dtype(series.dtype):
+            data[column] = pd.to_numeric(series, downcast='integer')
+    return data
+
+# Function to validate and convert a frame to a schema; columns the schema does not name are optimized generically
+def apply_schema(data, schema, optimize_rest=True):
+    data = data.copy()
+    for column, kind in schema.items():
+        if column in data.columns:
+            data[column] = coerce_column(data[column], kind)
+    if optimize_rest:
+        data = optimize_dtypes(data, [column for column in data.columns if column not in schema])
+    return data
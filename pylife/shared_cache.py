@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from pylife.datasets import DATASET_CACHE_DIRECTORY, _arrow_safe, content_sha256, load_dataset, prune_dataset_cache, touch_cached
+from pylife.instrumentation import register_collector, timed
+
+# Bytes of frames held for all sessions of this server process (PYLIFE_FRAME_CACHE_MB, default 1 GB);
+# the least recently used frames are dropped first
+MAX_FRAME_BYTES = int(os.environ.get('PYLIFE_FRAME_CACHE_MB', 1024)) * 1024 * 1024
+
+# Results kept per derived cache (failure cubes, Cox fits, rankings); the least recently used are dropped first
+MAX_DERIVED_ENTRIES = 16
+
+# Every derived cache of the process, so an evicted frame takes the results computed from it along
+_derived = []
+
+# Function to name a schema by its content, so the same file loaded with another schema is a separate entry
+def _schema_id(schema):
+    if schema is None:
+        return 'raw'
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode()).hexdigest()[:8]
+
+# Function to write a frame as an uncompressed Arrow IPC file, atomically so concurrent processes never read half a file
+def _write_arrow(data, path):
+    import pyarrow.feather as feather
+
+    os.makedirs(DATASET_CACHE_DIRECTORY, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        feather.write_feather(data, temp_path, compression='uncompressed')
+    except (TypeError, ValueError):
+        feather.write_feather(_arrow_safe(data), temp_path, compression='uncompressed')
+    os.replace(temp_path, path)
+
+# Function to follow a NumPy view down to the array that holds its memory
+def _root(array):
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+    return array
+
+# Function to memory-map an Arrow IPC file as a frame. Numeric, datetime and category-code columns without
+# gaps point straight into the mapping (zero-copy, shared with every process on the host through the page
+# cache); the rest are converted once. Every column comes back read-only. Returns (frame, mapped bytes).
+def _read_arrow(path):
+    import pyarrow.feather as feather
+
+    table = feather.read_table(path, memory_map=True)
+    data = table.to_pandas(split_blocks=True)
+    mapped_bytes = 0
+    for column in data.columns:
+        values = data[column].values
+        root = _root(values.codes if hasattr(values, 'codes') else values)
+        if root.base is not None:
+            # Backed by the Arrow buffer, which is read-only already
+            mapped_bytes += root.nbytes
+        else:
+            root.flags.writeable = False
+    return data, mapped_bytes
+
+# Class holding one read-only frame per (file content, schema) for every session of the process. Sessions that
+# load the same file, under any name, share one copy; loads of the same content wait for the first one instead
+# of parsing it again.
+class SharedFrameCache:
+    def __init__(self, max_bytes=MAX_FRAME_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._frames = OrderedDict()
+        self._bytes = 0
+        self._mapped_bytes = 0
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    # Function to get the frame of a source, loading it through the Arrow copy on first use. Callers get a
+    # shallow copy: adding or replacing columns stays private to them, writing into the shared values raises.
+    def get(self, source, schema=None):
+        key = (content_sha256(source), _schema_id(schema))
+        with self._lock:
+            if key in self._frames:
+                self._frames.move_to_end(key)
+                self.hits += 1
+                return self._frames[key][0].copy(deep=False)
+            loading = self._loading.setdefault(key, threading.Lock())
+        try:
+            with loading:
+                with self._lock:
+                    if key in self._frames:
+                        self.hits += 1
+                        return self._frames[key][0].copy(deep=False)
+                    self.misses += 1
+                data, mapped_bytes = self._load(source, schema, key)
+                self._store(key, data, mapped_bytes)
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+        return data.copy(deep=False)
+
+    def _load(self, source, schema, key):
+        path = os.path.join(DATASET_CACHE_DIRECTORY, f"{key[0][:16]}-{key[1]}.arrow")
+        if not touch_cached(path):
+            data = load_dataset(source, schema=schema)
+            try:
+                _write_arrow(data, path)
+            except OSError:
+                # A read-only deployment still shares the frame within this process
+                return data, 0
+            # The directory is bounded as a whole, together with the Parquet copies and spilled design matrices
+            prune_dataset_cache(keep=path)
+        try:
+            with timed('frame_cache_map') as timing:
+                data, mapped_bytes = _read_arrow(path)
+                timing.rows = len(data)
+        except FileNotFoundError:
+            # Pruned by another process in the meantime
+            return load_dataset(source, schema=schema), 0
+        return data, mapped_bytes
+
+    def _store(self, key, data, mapped_bytes):
+        size = int(data.memory_usage(deep=True, index=True).sum())
+        evicted = []
+        with self._lock:
+            self._frames[key] = (data, size, mapped_bytes)
+            self._bytes += size
+            self._mapped_bytes += mapped_bytes
+            while self._bytes > self.max_bytes and len(self._frames) > 1:
+                (data_sha256, _), (_, dropped, dropped_mapped) = self._frames.popitem(last=False)
+                self._bytes -= dropped
+                self._mapped_bytes -= dropped_mapped
+                self.evictions += 1
+                if not any(held == data_sha256 for held, _ in self._frames):
+                    evicted.append(data_sha256)
+        # Cubes, fits and rankings of an evicted frame hold on to its columns, so they go with it
+        for data_sha256 in evicted:
+            for cache in _derived:
+                cache.drop(data_sha256)
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._bytes = self._mapped_bytes = 0
+            self.hits = self.misses = self.evictions = 0
+        for cache in _derived:
+            cache.clear()
+
+    # Function to report the entries, their size (and how much of it is memory-mapped) and the hit rate
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'frames': len(self._frames), 'bytes': self._bytes, 'mapped_bytes': self._mapped_bytes,
+                    'max_bytes': self.max_bytes, 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'hit_rate': self.hits / lookups if lookups else 0.0}
+
+# Class holding results computed from a dataset (e.g. failure cubes, Cox fits, rankings) by key, for the dataset
+# content hash they were computed from. Such results keep columns of the frame alive, so they are bounded
+# (least recently used first) and dropped when the shared cache evicts the frame of their dataset.
+class DerivedCache:
+    def __init__(self, name, max_entries=MAX_DERIVED_ENTRIES):
+        self.name = name
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        _derived.append(self)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key][1]
+
+    def put(self, key, data_sha256, value):
+        with self._lock:
+            self._entries[key] = (data_sha256, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    # Function to drop every result computed from one dataset
+    def drop(self, data_sha256):
+        with self._lock:
+            for key in [key for key, (held, _) in self._entries.items() if held == data_sha256]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+# The cache every page of this process shares
+_cache = SharedFrameCache()
+
+# Function to load a CSV/XLSX file (path or upload) as a shared read-only frame (see SharedFrameCache.get)
+def shared_dataset(source, schema=None):
+    return _cache.get(source, schema)
+
+def shared_cache_stats():
+    return dict(_cache.stats(), derived={cache.name: len(cache) for cache in _derived})
+
+# Function to expose the cache on /metrics
+def _collect():
+    stats = shared_cache_stats()
+    return [('pylife_frame_cache_bytes', 'Bytes of frames held in the shared frame cache.', stats['bytes']),
+            ('pylife_frame_cache_mapped_bytes', 'Bytes of those frames memory-mapped from Arrow files.', stats['mapped_bytes']),
+            ('pylife_frame_cache_frames', 'Frames held in the shared frame cache.', stats['frames']),
+            ('pylife_frame_cache_hits', 'Shared frame cache lookups served from memory.', stats['hits']),
+            ('pylife_frame_cache_misses', 'Shared frame cache lookups that loaded the file.', stats['misses'])] + \
+           [(f'pylife_{name}_cache_entries', f'Results held in the {name} cache.', entries)
+            for name, entries in stats['derived'].items()]
+
+register_collector(_collect)
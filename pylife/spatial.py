@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+from pylife.instrumentation import timed
+from pylife.shared_cache import DerivedCache
+
+# Mean Earth radius (km) for great-circle distances
+EARTH_RADIUS_KM = 6371.0088
+
+# Indexes by (dataset hash, model version, cell size), shared across reruns and sessions (bounded, see DerivedCache)
+_indexes = DerivedCache('spatial_index')
+
+# Function to compute great-circle distances (km) from one point to arrays of points
+def haversine_km(lat, lon, lats, lons):
+    lat, lon, lats, lons = map(np.radians, (lat, lon, lats, lons))
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+# Class indexing scored segments on a regular latitude/longitude grid. Rows are sorted by grid cell once,
+# so a query only visits the cells it overlaps (one binary search per grid row), and the per-cell
+# aggregates behind hotspot maps are computed once per index instead of once per render.
+class SpatialIndex:
+    def __init__(self, data, value_column='Prediction', lat_column='Latitude', lon_column='Longitude', cell_size=0.01):
+        self.data = data
+        self.value_column = value_column
+        self.cell_size = cell_size
+        self._aggregates = {}
+        with timed('spatial_index_build', rows=len(data)):
+            lat = pd.to_numeric(data[lat_column], errors='coerce').to_numpy(dtype=float)
+            lon = pd.to_numeric(data[lon_column], errors='coerce').to_numpy(dtype=float)
+            # Segments without coordinates are left out of the index
+            rows = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+            cell_i = np.floor(lat[rows] / cell_size).astype(np.int64)
+            cell_j = np.floor(lon[rows] / cell_size).astype(np.int64)
+            self.i0 = cell_i.min() if len(rows) else 0
+            self.j0 = cell_j.min() if len(rows) else 0
+            self.width = (cell_j.max() - self.j0 + 1) if len(rows) else 1
+            keys = (cell_i - self.i0) * self.width + (cell_j - self.j0)
+            order = np.argsort(keys, kind='stable')
+            self.rows = rows[order]
+            self.keys = keys[order]
+            self.lat = lat[self.rows]
+            self.lon = lon[self.rows]
+            self.values = pd.to_numeric(data[value_column], errors='coerce').to_numpy(dtype=float)[self.rows]
+
+    # Function to list the positions (into self.rows) of the indexed rows whose cell overlaps the box
+    def _candidates(self, min_lat, min_lon, max_lat, max_lon):
+        if not len(self.keys):
+            return np.empty(0, dtype=np.int64)
+        i_low = max(int(np.floor(min_lat / self.cell_size)) - self.i0, 0)
+        i_high = int(np.floor(max_lat / self.cell_size)) - self.i0
+        j_low = max(int(np.floor(min_lon / self.cell_size)) - self.j0, 0)
+        j_high = min(int(np.floor(max_lon / self.cell_size)) - self.j0, self.width - 1)
+        i_high = min(i_high, int(self.keys[-1] // self.width))
+        if i_low > i_high or j_low > j_high:
+            return np.empty(0, dtype=np.int64)
+        # Within one grid row the overlapped cells have consecutive keys, i.e. one contiguous run of sorted rows
+        grid_rows = np.arange(i_low, i_high + 1) * self.width
+        starts = np.searchsorted(self.keys, grid_rows + j_low, side='left')
+        ends = np.searchsorted(self.keys, grid_rows + j_high, side='right')
+        return np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)])
+
+    # Function to get the segments inside a latitude/longitude box
+    def bbox(self, min_lat, min_lon, max_lat, max_lon):
+        with timed('spatial_query') as timing:
+            candidates = self._candidates(min_lat, min_lon, max_lat, max_lon)
+            inside = ((self.lat[candidates] >= min_lat) & (self.lat[candidates] <= max_lat) &
+                      (self.lon[candidates] >= min_lon) & (self.lon[candidates] <= max_lon))
+            result = self.data.iloc[np.sort(self.rows[candidates[inside]])]
+            timing.rows = len(result)
+        return result
+
+    # Function to get the segments within radius_km of a point, nearest first, with their distance
+    def within_radius(self, lat, lon, radius_km):
+        with timed('spatial_query') as timing:
+            # Box around the circle; a degree of longitude shrinks with the cosine of the latitude
+            dlat = np.degrees(radius_km / EARTH_RADIUS_KM)
+            dlon = dlat / max(np.cos(np.radians(lat)), 1e-6)
+            candidates = self._candidates(lat - dlat, lon - dlon, lat + dlat, lon + dlon)
+            distances = haversine_km(lat, lon, self.lat[candidates], self.lon[candidates])
+            inside = distances <= radius_km
+            order = np.argsort(distances[inside], kind='stable')
+            result = self.data.iloc[self.rows[candidates[inside]][order]].assign(distance_km=distances[inside][order])
+            timing.rows = len(result)
+        return result
+
+    # Function to aggregate the scored value per grid cell, with each cell's centre coordinates
+    def cells(self):
+        if None not in self._aggregates:
+            columns = ['Latitude', 'Longitude', 'segments', 'mean', 'min', 'max']
+            if not len(self.keys):
+                return pd.DataFrame(columns=columns)
+            # The rows are sorted by cell, so every cell is one run and reduceat aggregates all runs in one call
+            starts = np.flatnonzero(np.r_[True, self.keys[1:] != self.keys[:-1]])
+            keys = self.keys[starts]
+            scored = np.isfinite(self.values)
+            scored_counts = np.add.reduceat(scored.astype(np.int64), starts)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                cells = pd.DataFrame({
+                    'Latitude': (keys // self.width + self.i0 + 0.5) * self.cell_size,
+                    'Longitude': (keys % self.width + self.j0 + 0.5) * self.cell_size,
+                    'segments': np.diff(np.r_[starts, len(self.keys)]),
+                    'mean': np.add.reduceat(np.where(scored, self.values, 0.0), starts) / scored_counts,
+                    'min': np.minimum.reduceat(np.where(scored, self.values, np.inf), starts),
+                    'max': np.maximum.reduceat(np.where(scored, self.values, -np.inf), starts),
+                }, columns=columns)
+            cells.loc[scored_counts == 0, ['min', 'max']] = np.nan
+            self._aggregates[None] = cells
+        return self._aggregates[None]
+
+    # Function to aggregate the scored value per level of a region column (e.g. a district)
+    def regions(self, column):
+        if column not in self._aggregates:
+            values = self.data[self.value_column]
+            self._aggregates[column] = (values.groupby(self.data[column], observed=True)
+                                              .agg(['size', 'mean', 'min', 'max'])
+                                              .rename(columns={'size': 'segments'}))
+        return self._aggregates[column]
+
+# Function to index the scored segments of a dataset once per model version and cell size; the index goes
+# when the shared cache evicts the dataset's frame
+def cached_spatial_index(data, data_hash, model_version, cell_size):
+    key = (data_hash, model_version, cell_size)
+    index = _indexes.get(key)
+    if index is None:
+        index = _indexes.put(key, data_hash, SpatialIndex(data, cell_size=cell_size))
+    return index
+
+# Function to summarize the scored value of a query result
+def summarize(result, value_column='Prediction'):
+    values = pd.to_numeric(result[value_column], errors='coerce')
+    return {'segments': len(result), 'mean': values.mean(), 'min': values.min(), 'max': values.max()}
@@ -0,0 +1,102 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from pylife.changes import diff_rows
+from pylife.instrumentation import timed
+
+# Class holding Kaplan-Meier curves for every level of one categorical column.
+# Only per-(level, duration) event and removal counts are kept, so appended, edited or
+# deleted records add or subtract their counts and the curves are re-derived without
+# touching the other rows.
+class KaplanMeierCurves:
+    def __init__(self, group_column, duration_column='Duration', event_column='Status', alpha=0.05):
+        self.group_column = group_column
+        self.duration_column = duration_column
+        self.event_column = event_column
+        self.alpha = alpha
+        self.lock = threading.Lock()
+        self.reset()
+
+    # Function to forget every record seen so far
+    def reset(self):
+        self.counts = None
+        self.records = None
+        self._curves = None
+
+    # Function to add failure records to the counts (sign=-1 takes them back out)
+    def update(self, records, sign=1):
+        records = records[[self.group_column, self.duration_column, self.event_column]].dropna()
+        new_counts = (records.assign(observed=records[self.event_column].astype(bool).astype(int))
+                             .groupby([self.group_column, self.duration_column], observed=True)['observed']
+                             .agg(['sum', 'size'])
+                             .rename(columns={'sum': 'observed', 'size': 'removed'})) * sign
+        if self.counts is None:
+            self.counts = new_counts
+        else:
+            self.counts = self.counts.add(new_counts, fill_value=0)
+            # Durations whose last record was taken out drop from the risk sets
+            self.counts = self.counts[self.counts['removed'] > 0].astype(int)
+        self._curves = None
+        return self
+
+    # Function to update the counts from a change set (see pylife.changes)
+    def apply_changes(self, changes):
+        self.update(changes.removed_rows(), sign=-1)
+        return self.update(changes.added_rows())
+
+    # Function to bring the curves in line with a new version of the table, counting only the changed records
+    def sync(self, data):
+        columns = [self.group_column, self.duration_column, self.event_column]
+        records = data[columns]
+        with self.lock:
+            changes = None if self.records is None else diff_rows(self.records, records)
+            if changes is None or len(changes.deleted) + len(changes.inserted) >= len(records):
+                # First call, or most rows changed: counting from scratch is cheaper
+                with timed('km_update', rows=len(records)):
+                    self.reset()
+                    self.update(records)
+            elif not changes.empty:
+                with timed('km_update', rows=len(changes.deleted) + len(changes.inserted)):
+                    self.apply_changes(changes)
+            self.records = records.copy()
+            return self
+
+    # Function to compute the survival estimates and confidence bands of all levels in one grouped pass
+    def curves(self):
+        from scipy.stats import norm
+
+        if self._curves is None:
+            counts = self.counts.sort_index()
+            observed = counts['observed']
+            # Everyone whose duration is >= t is still at risk at t
+            at_risk = counts['removed'][::-1].groupby(level=0, observed=True).cumsum()[::-1]
+            survival = (1 - observed / at_risk).groupby(level=0, observed=True).cumprod()
+            # Greenwood variance with the exponential (log(-log)) confidence interval, as lifelines does
+            with np.errstate(divide='ignore', invalid='ignore'):
+                greenwood = (observed / (at_risk * (at_risk - observed))).groupby(level=0, observed=True).cumsum()
+                log_survival = np.log(survival)
+                z = norm.ppf(1 - self.alpha / 2)
+                lower = np.exp(-np.exp(np.log(-log_survival) - z * np.sqrt(greenwood) / log_survival))
+                upper = np.exp(-np.exp(np.log(-log_survival) + z * np.sqrt(greenwood) / log_survival))
+            self._curves = pd.DataFrame({
+                'at_risk': at_risk,
+                'observed': observed,
+                'removed': counts['removed'],
+                'survival': survival,
+                'lower': lower.fillna(survival),
+                'upper': upper.fillna(survival),
+            })
+        return self._curves
+
+    # Function to get the curve of one level, starting at time 0 with survival 1
+    def curve(self, level):
+        curve = self.curves().xs(level, level=0)
+        start = pd.DataFrame({'at_risk': curve['at_risk'].iloc[0], 'observed': 0, 'removed': 0,
+                              'survival': 1.0, 'lower': 1.0, 'upper': 1.0}, index=[0])
+        return pd.concat([start, curve[curve.index > 0]]) if curve.index[0] > 0 else curve
+
+    # Function to list the levels that have a curve
+    def levels(self):
+        return list(self.counts.index.get_level_values(0).unique())
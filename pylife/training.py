@@ -0,0 +1,218 @@
+import hashlib
+import itertools
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from pylife import cascade, ttnf
+from pylife.instrumentation import timed
+from pylife.parallel import default_jobs
+from pylife.registry import ARTIFACTS, CURRENT_VERSIONS, VERSION_DIRECTORY, file_sha256
+
+# Directory holding the encoded cross-validation folds, reused by every trial and by later runs on the same data
+FOLD_CACHE_DIRECTORY = 'training_cache'
+
+# Target column of each cascade model; rows without a target (pipes that have not failed that often) are left out of its fit
+CASCADE_TARGETS = {'model_first_failure': 'Age at 1st Failure',
+                   'model_second_failure': 'Age at 2nd Failure',
+                   'model_third_failure': 'Age at 3rd Failure'}
+
+# Target column of the time-to-next-failure model
+TTNF_TARGET = 'Time to Next Failure'
+
+# Categorical inputs of the time-to-next-failure model; the model takes its inputs by position
+TTNF_CATEGORICAL = ['FAULT_TYPE', 'Material', 'Urbanization', 'Soil Corrosivity']
+
+# Random forest settings searched by default (every combination is one trial)
+DEFAULT_GRID = {
+    'n_estimators': [100, 300],
+    'max_depth': [None, 12, 20],
+    'min_samples_leaf': [1, 5],
+    'max_features': [1.0, 'sqrt'],
+}
+
+DEFAULT_FOLDS = 5
+
+# Function to list the models an artifact is retrained into: (key, numerical inputs, categorical inputs, target, by position)
+def model_specs(artifact):
+    if artifact == 'cascade':
+        return [('model_first_failure', cascade.numerical_features_model1, cascade.categorical_features_model1,
+                 CASCADE_TARGETS['model_first_failure'], False),
+                ('model_second_failure', cascade.numerical_features_model2, cascade.categorical_features_model2,
+                 CASCADE_TARGETS['model_second_failure'], False),
+                ('model_third_failure', cascade.numerical_features_model3, cascade.categorical_features_model3,
+                 CASCADE_TARGETS['model_third_failure'], False)]
+    if artifact == 'ttnf_rf':
+        numerical = [column for column in ttnf.required_columns if column not in TTNF_CATEGORICAL]
+        return [('ttnf', numerical, TTNF_CATEGORICAL, TTNF_TARGET, True)]
+    raise ValueError(f"Only the 'cascade' and 'ttnf_rf' artifacts are retrained, not '{artifact}'")
+
+# Function to list the columns a training table needs for an artifact
+def missing_columns(artifact, columns):
+    needed = []
+    for _, numerical, categorical, target, _ in model_specs(artifact):
+        needed += [column for column in numerical + categorical + [target] if column not in needed]
+    return [column for column in needed if column not in columns]
+
+# Function to build the (unfitted) preprocessing the shipped pipelines use: median-filled numbers and one-hot levels.
+# Both steps compile to the NumPy transform of pylife.features, so retrained models score as fast as the shipped ones.
+def make_encoder(numerical, categorical, columns=None):
+    from sklearn.compose import ColumnTransformer
+    from sklearn.impute import SimpleImputer
+    from sklearn.preprocessing import OneHotEncoder
+
+    # Positional models (TTNF) select their columns by index
+    if columns is not None:
+        numerical = [columns.index(column) for column in numerical]
+        categorical = [columns.index(column) for column in categorical]
+    return ColumnTransformer([('numeric', SimpleImputer(strategy='median'), numerical),
+                              ('onehot', OneHotEncoder(handle_unknown='ignore'), categorical)],
+                             sparse_threshold=0)
+
+# Function to build the full pipeline for one set of forest settings
+def make_pipeline(numerical, categorical, params, columns=None, seed=0, n_jobs=None):
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.pipeline import Pipeline
+
+    return Pipeline([('encode', make_encoder(numerical, categorical, columns)),
+                     ('forest', RandomForestRegressor(random_state=seed, n_jobs=n_jobs, **params))])
+
+# Function to list every combination of a grid as keyword arguments
+def grid_trials(grid):
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+# Function to pick the inputs and target of one model out of a training table (inputs as the model will get them)
+def training_rows(data, numerical, categorical, target, positional):
+    y = pd.to_numeric(data[target], errors='coerce')
+    keep = y.notna().to_numpy()
+    if positional:
+        X = np.array(data.loc[keep, ttnf.required_columns], dtype=object)
+    else:
+        X = data.loc[keep, numerical + categorical]
+    return X, y.to_numpy(dtype=float)[keep]
+
+# Function to encode the cross-validation folds of one model once and store them as .npy files, so every trial
+# memory-maps the same matrices instead of re-running the preprocessing; returns the paths of every fold
+def encode_folds(X, y, numerical, categorical, positional, data_sha256, key, n_folds=DEFAULT_FOLDS, seed=0):
+    from sklearn.model_selection import KFold
+
+    columns = ttnf.required_columns if positional else None
+    directory = os.path.join(FOLD_CACHE_DIRECTORY, f"{data_sha256[:12]}-{key}-k{n_folds}-s{seed}")
+    folds = [{part: os.path.join(directory, f"fold{i}-{part}.npy") for part in ('X_train', 'y_train', 'X_test', 'y_test')}
+             for i in range(n_folds)]
+    if all(os.path.exists(path) for fold in folds for path in fold.values()):
+        return folds
+    os.makedirs(directory, exist_ok=True)
+    with timed('train_encode_folds', rows=len(y) * n_folds):
+        splits = KFold(n_splits=n_folds, shuffle=True, random_state=seed).split(np.arange(len(y)))
+        for fold, (train, test) in zip(folds, splits):
+            # The encoder only sees the training part of the fold, as it would in production
+            encoder = make_encoder(numerical, categorical, columns)
+            take = (lambda rows: X[rows]) if positional else (lambda rows: X.iloc[rows])
+            parts = {'X_train': encoder.fit_transform(take(train)), 'y_train': y[train],
+                     'X_test': encoder.transform(take(test)), 'y_test': y[test]}
+            for part, values in parts.items():
+                # Trees split on float32, so that is all the matrices need to hold
+                temp_path = f"{fold[part]}.{os.getpid()}.tmp.npy"
+                np.save(temp_path, np.ascontiguousarray(values, dtype=np.float32))
+                os.replace(temp_path, fold[part])
+    return folds
+
+# Function to fit one trial on one fold inside a worker process; returns its test RMSE and MAE
+def _score_trial(fold, params, seed):
+    from sklearn.ensemble import RandomForestRegressor
+
+    X_train, y_train, X_test, y_test = (np.load(fold[part], mmap_mode='r') for part in ('X_train', 'y_train', 'X_test', 'y_test'))
+    forest = RandomForestRegressor(random_state=seed, n_jobs=1, **params).fit(X_train, y_train)
+    errors = forest.predict(X_test) - y_test
+    return float(np.sqrt(np.mean(errors ** 2))), float(np.mean(np.abs(errors)))
+
+# Function to run every (trial, fold) fit of a grid across n_jobs processes; returns one row per trial, best first
+def search(folds, grid=None, seed=0, n_jobs=None):
+    trials = grid_trials(grid or DEFAULT_GRID)
+    tasks = [(t, f) for t in range(len(trials)) for f in range(len(folds))]
+    with timed('train_search', rows=len(tasks)), ProcessPoolExecutor(max_workers=default_jobs(n_jobs)) as pool:
+        futures = [pool.submit(_score_trial, folds[f], trials[t], seed) for t, f in tasks]
+        scores = [future.result() for future in futures]
+    results = pd.DataFrame([{'trial': t, 'fold': f, 'rmse': rmse, 'mae': mae} for (t, f), (rmse, mae) in zip(tasks, scores)])
+    table = results.groupby('trial').agg(cv_rmse=('rmse', 'mean'), cv_rmse_std=('rmse', 'std'), cv_mae=('mae', 'mean'))
+    table.insert(0, 'params', [trials[t] for t in table.index])
+    return table.sort_values('cv_rmse').reset_index()
+
+# Function to name a new version of an artifact, e.g. 'FW_123-20240131-120000-250000' (to the microsecond)
+def version_name(artifact):
+    stem = os.path.splitext(os.path.basename(ARTIFACTS[artifact]['path']))[0]
+    return f"{stem}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+
+# Function to retrain every model of an artifact ('cascade' or 'ttnf_rf') from a training table: search the grid with
+# cross-validation, refit the best settings on all rows, and write the models (in the same dict as the shipped pickle)
+# with a JSON manifest of the search to VERSION_DIRECTORY. Returns the path of the new version.
+def train_artifact(artifact, data, data_sha256=None, grid=None, n_folds=DEFAULT_FOLDS, seed=0, n_jobs=None, report=None):
+    import sklearn
+
+    missing = missing_columns(artifact, data.columns)
+    if missing:
+        raise KeyError(f"The training data is missing the following columns: {sorted(missing)}")
+    if data_sha256 is None:
+        data_sha256 = hashlib.sha256(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes()).hexdigest()
+    models, manifest = {}, {'artifact': artifact, 'data_sha256': data_sha256, 'rows': len(data), 'folds': n_folds,
+                            'seed': seed, 'sklearn': sklearn.__version__, 'models': {}}
+    for key, numerical, categorical, target, positional in model_specs(artifact):
+        X, y = training_rows(data, numerical, categorical, target, positional)
+        if len(y) < n_folds:
+            raise ValueError(f"Only {len(y)} rows have a '{target}' value, too few for {n_folds}-fold cross-validation")
+        folds = encode_folds(X, y, numerical, categorical, positional, data_sha256, key, n_folds, seed)
+        trials = search(folds, grid, seed, n_jobs)
+        best = trials.iloc[0]
+        with timed('train_refit', rows=len(y)):
+            model = make_pipeline(numerical, categorical, best['params'], ttnf.required_columns if positional else None,
+                                  seed, default_jobs(n_jobs)).fit(X, y)
+            # Scoring spreads work over processes itself, so the saved forest predicts on one core
+            model.set_params(forest__n_jobs=None)
+        models[key] = model
+        manifest['models'][key] = {'target': target, 'rows': len(y), 'params': best['params'],
+                                   'cv_rmse': best['cv_rmse'], 'cv_mae': best['cv_mae'],
+                                   'trials': trials.drop(columns='trial').to_dict('records')}
+        if report is not None:
+            report(key, trials)
+
+    os.makedirs(VERSION_DIRECTORY, exist_ok=True)
+    temp_path = os.path.join(VERSION_DIRECTORY, f"{artifact}.{os.getpid()}.tmp")
+    with open(temp_path, 'wb') as file:
+        pickle.dump(models, file)
+    # Linking (unlike renaming) never replaces an existing version, e.g. one retrained at the same moment by another process
+    while True:
+        version = version_name(artifact)
+        path = os.path.join(VERSION_DIRECTORY, f"{version}.pkl")
+        try:
+            os.link(temp_path, path)
+            break
+        except FileExistsError:
+            continue
+    os.remove(temp_path)
+    manifest['version'] = version
+    manifest['sha256'] = file_sha256(path)
+    with open(f"{os.path.splitext(path)[0]}.json", 'w') as file:
+        json.dump(manifest, file, indent=2, default=str)
+    return path
+
+# Function to list the retrained versions on disk with their manifests, by artifact and newest first
+def list_versions():
+    rows = []
+    if not os.path.isdir(VERSION_DIRECTORY):
+        return rows
+    for name in sorted(os.listdir(VERSION_DIRECTORY), reverse=True):
+        if not name.endswith('.json') or name == os.path.basename(CURRENT_VERSIONS):
+            continue
+        with open(os.path.join(VERSION_DIRECTORY, name)) as file:
+            manifest = json.load(file)
+        rows.append({'version': manifest['version'], 'artifact': manifest['artifact'], 'rows': manifest['rows'],
+                     'path': os.path.join(VERSION_DIRECTORY, f"{manifest['version']}.pkl"),
+                     **{f"{key} cv_rmse": model['cv_rmse'] for key, model in manifest['models'].items()}})
+    return rows
@@ -0,0 +1,39 @@
+import numpy as np
+
+from pylife.instrumentation import timed
+from pylife.io import TableWriter, iter_table_chunks
+from pylife.prediction_cache import row_hashes
+
+# Features expected by the time-to-next-failure model, in model order
+required_columns = ['Year of Installation', 'NOPF', 'APF', 'Length', 'Pressure',
+                    'FAULT_TYPE', 'A_DIAM', 'Material', 'Urbanization', 'Soil Corrosivity',
+                    'Latitude', 'Longitude', 'Effect of Traffic Load']
+
+# Define a function for prediction
+def predict(model, features):
+    features = np.array(features).reshape(1, -1)
+    prediction = model.predict(features)
+    return prediction[0]
+
+# Define a function for predicting every row of a frame in one model call,
+# skipping the rows the cache (if given) has already scored
+def predict_batch(model, features, cache=None):
+    if cache is not None:
+        return cache.resolve(row_hashes(features, required_columns),
+                             lambda positions: predict_batch(model, features.iloc[positions]))[:, 0]
+    with timed('ttnf_predict', rows=len(features)):
+        return model.predict(np.array(features))
+
+# Function to list the required columns the data does not have
+def missing_columns(columns):
+    return [column for column in required_columns if column not in columns]
+
+# Function to stream a CSV/Parquet source through the model chunk by chunk, appending to output_path
+def predict_stream(source, output_path, chunk_size, model, cache=None):
+    rows_done = 0
+    with TableWriter(output_path) as writer:
+        for chunk in iter_table_chunks(source, chunk_size):
+            chunk['Prediction'] = predict_batch(model, chunk[required_columns], cache)
+            writer.write(chunk)
+            rows_done += len(chunk)
+            yield rows_done
@@ -0,0 +1,87 @@
+# Streamlit helpers shared by the pages; the only pylife module that imports streamlit
+import os
+
+import pandas as pd
+import streamlit as st
+
+from pylife import instrumentation, jobs, prediction_cache, shared_cache
+from pylife.figures import figure_cache_stats
+
+# The first page a server process runs picks up the background jobs an earlier server left unfinished
+jobs.start()
+
+# Function to show the per-stage timings in the sidebar and, when PYLIFE_METRICS_PORT is set, serve them to Prometheus
+def timing_panel():
+    port = os.environ.get('PYLIFE_METRICS_PORT')
+    if port:
+        try:
+            instrumentation.start_metrics_server(int(port))
+        except OSError as e:
+            st.sidebar.warning(f"Could not start the metrics endpoint on port {port}: {e}")
+    if st.sidebar.checkbox('Show stage timings', key='timing_panel', help='Time spent in parsing, encoding, model loading, prediction and plotting in this server process'):
+        timings = pd.DataFrame(instrumentation.snapshot())
+        if timings.empty:
+            st.sidebar.write('No stages timed yet.')
+        else:
+            st.sidebar.dataframe(timings.set_index('stage').round(4))
+        caches = pd.DataFrame(prediction_cache.cache_stats())
+        if not caches.empty:
+            st.sidebar.write('Prediction caches:')
+            st.sidebar.dataframe(caches.set_index('cache').round(3))
+        # Shared by every session of this server process
+        frames = shared_cache.shared_cache_stats()
+        st.sidebar.write(f"Data cache: {frames['frames']} frames, {frames['bytes'] / 1e6:.1f} of {frames['max_bytes'] / 1e6:.0f} MB "
+                         f"({frames['mapped_bytes'] / 1e6:.1f} MB memory-mapped), {frames['hit_rate']:.0%} hit rate, "
+                         f"{frames['evictions']} evicted, {sum(frames['derived'].values())} results computed from them")
+        figures = figure_cache_stats()
+        st.sidebar.write(f"Figure cache: {figures['figures']} figures, {figures['bytes'] / 1e6:.1f} MB")
+
+# Function to report how many rows a scoring run took from the prediction cache (before is cache.stats() taken beforehand)
+def cache_report(cache, before):
+    after = cache.stats()
+    hits = after['hits'] - before['hits']
+    rows = hits + after['misses'] - before['misses']
+    st.write(f"Reused {hits} of {rows} rows from the prediction cache ({after['hit_rate']:.0%} hit rate since the server started)")
+
+# Function to remember a background job in this session so job_panel() keeps showing it across reruns
+def track_job(job_id):
+    st.session_state.setdefault('jobs', []).append(job_id)
+
+# Function to show this session's background jobs of the given kinds, polling while any is unfinished
+def job_panel(kinds=None):
+    job_ids = st.session_state.get('jobs', [])
+    if not jobs.list_jobs(job_ids, kinds):
+        return
+    st.subheader('Background jobs')
+    if any(job['status'] in jobs.PENDING_STATUSES for job in jobs.list_jobs(job_ids, kinds)):
+        _live_job_status(job_ids, kinds)
+    else:
+        _show_jobs(job_ids, kinds)
+
+# Fragment re-run every two seconds on its own, without re-running the page, until every job has finished
+@st.fragment(run_every=2)
+def _live_job_status(job_ids, kinds):
+    if not any(job['status'] in jobs.PENDING_STATUSES for job in _show_jobs(job_ids, kinds)):
+        # Re-run the page once so the panel stops polling
+        st.rerun()
+
+# Function to draw one row per job: its progress, error or result downloads
+def _show_jobs(job_ids, kinds):
+    listed = jobs.list_jobs(job_ids, kinds)
+    for job in listed:
+        label = f"{job['kind']} job {job['id']}: {job['status']}"
+        if job['status'] in jobs.PENDING_STATUSES:
+            st.progress(job['fraction'] or 0.0, text=f"{label} ({job['rows_done']} of {job['rows_total'] or '?'} rows)")
+            if job['status'] == 'queued' and st.button('Cancel', key=f"cancel-{job['id']}"):
+                jobs.cancel(job['id'])
+        elif job['status'] == 'failed':
+            st.error(f"{label}: {job['error']}")
+        elif job['status'] == 'done':
+            st.write(f"{label} in {job['finished'] - job['started']:.1f} s")
+            for path in jobs.job_outputs(job['id']):
+                with open(path, 'rb') as file:
+                    st.download_button(f"Download {os.path.basename(path)}", file.read(), file_name=os.path.basename(path),
+                                       key=f"download-{job['id']}-{os.path.basename(path)}")
+        else:
+            st.write(label)
+    return listed
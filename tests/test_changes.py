@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from pylife.changes import diff_frames, diff_rows
+
+
+def frame():
+    return pd.DataFrame({'A_MAT': ['DI', 'PE', 'S', None], 'LENGTH': [10, 20, 30, 40]})
+
+
+def test_diff_frames_finds_inserted_modified_and_deleted_rows():
+    base = frame()
+    edited = base.drop(index=2)
+    edited.loc[1, 'LENGTH'] = 25
+    edited.loc[7] = ['SS', 70]
+    changes = diff_frames(base, edited)
+    assert changes.summary() == {'inserted': 1, 'modified': 1, 'deleted': 1}
+    assert changes.modified_before['LENGTH'].tolist() == [20]
+    assert changes.modified_after['LENGTH'].tolist() == [25]
+    assert changes.deleted.index.tolist() == [2]
+    assert changes.inserted.index.tolist() == [7]
+
+
+def test_diff_frames_ignores_int_to_float():
+    base = frame()
+    assert diff_frames(base, base.astype({'LENGTH': float})).empty
+
+
+def test_diff_frames_reports_whitespace_and_missing_value_edits():
+    base = frame()
+    edited = base.copy()
+    edited.loc[0, 'A_MAT'] = ' DI'
+    edited.loc[1, 'A_MAT'] = 'PE '
+    edited.loc[3, 'A_MAT'] = 'nan'
+    changes = diff_frames(base, edited)
+    assert changes.modified_after.index.tolist() == [0, 1, 3]
+
+    edited = base.copy()
+    edited.loc[2, 'A_MAT'] = np.nan
+    assert diff_frames(base, edited).modified_after.index.tolist() == [2]
+
+
+def test_diff_rows_matches_by_content_and_keeps_duplicates():
+    base = pd.concat([frame(), frame().iloc[[0]]], ignore_index=True)
+    new = base.iloc[[4, 1, 2, 3]].reset_index(drop=True)
+    new.loc[1, 'A_MAT'] = ' PE'
+    changes = diff_rows(base, new)
+    # One of the two identical DI rows went, and the edited PE row shows up as deleted and inserted
+    assert changes.deleted['A_MAT'].tolist() == ['PE', 'DI']
+    assert changes.inserted['A_MAT'].tolist() == [' PE']
+
+
+def test_diff_rows_reports_nan_replaced_by_text():
+    base = frame()
+    new = base.copy()
+    new.loc[3, 'A_MAT'] = 'nan'
+    changes = diff_rows(base, new)
+    assert changes.summary() == {'inserted': 1, 'modified': 0, 'deleted': 1}
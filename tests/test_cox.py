@@ -0,0 +1,85 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pylife import cox, datasets
+
+
+@pytest.fixture
+def survival():
+    rng = np.random.default_rng(0)
+    n = 300
+    X = rng.normal(size=(n, 3))
+    hazard = np.exp(X @ np.array([0.8, -0.5, 0.0]))
+    event_time = rng.exponential(1 / hazard)
+    censor_time = rng.exponential(2.0, n)
+    y = np.empty(n, dtype=[('Status', bool), ('Duration', float)])
+    y['Status'] = event_time <= censor_time
+    y['Duration'] = np.minimum(event_time, censor_time)
+    return X, y
+
+
+def reference(X, y, alpha=0.1):
+    from sksurv.linear_model import CoxPHSurvivalAnalysis
+    return CoxPHSurvivalAnalysis(alpha).fit(X, y)
+
+
+def test_coefficients_match_scikit_survival(survival):
+    X, y = survival
+    model, _ = cox.fit_coefficients(X, y)
+    expected = reference(X, y)
+    np.testing.assert_allclose(model.coef_, expected.coef_, rtol=1e-6, atol=1e-8)
+    np.testing.assert_allclose(model.predict(X), expected.predict(X), rtol=1e-6, atol=1e-8)
+    np.testing.assert_allclose(model.cum_baseline_hazard_.y, expected.cum_baseline_hazard_.y, rtol=1e-6)
+
+
+def test_warm_start_reaches_the_same_coefficients(survival):
+    X, y = survival
+    cold, cold_iterations = cox.fit_coefficients(X, y)
+    warm, warm_iterations = cox.fit_coefficients(X, y, init=cold.coef_ + 0.01)
+    np.testing.assert_allclose(warm.coef_, cold.coef_, rtol=1e-5, atol=1e-7)
+    assert warm_iterations <= cold_iterations
+
+
+def test_falls_back_to_the_public_fit_without_the_optimizer(survival, monkeypatch):
+    X, y = survival
+    monkeypatch.setattr(cox, '_cox_optimizer', lambda: None)
+    model, iterations = cox.fit_coefficients(X, y, init=np.ones(3))
+    assert iterations is None
+    np.testing.assert_allclose(model.coef_, reference(X, y).coef_)
+
+
+def test_falls_back_when_the_optimizer_changed(survival, monkeypatch):
+    X, y = survival
+
+    class ChangedOptimizer:
+        def __init__(self, X, event, time, alpha, ties):
+            pass
+
+        def update(self, w):
+            pass
+
+        def nlog_likelihood(self, w):
+            return 0.0
+
+    monkeypatch.setattr(cox, '_cox_optimizer', lambda: ChangedOptimizer)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        model, iterations = cox.fit_coefficients(X, y)
+    assert iterations is None
+    assert any(issubclass(w.category, RuntimeWarning) for w in caught)
+    np.testing.assert_allclose(model.coef_, reference(X, y).coef_)
+
+
+def test_spilled_design_matrices_are_bounded_with_the_dataset_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(datasets, 'DATASET_CACHE_DIRECTORY', str(tmp_path))
+    monkeypatch.setattr(datasets, 'PRUNE_GRACE_SECONDS', -1)
+    X = pd.DataFrame(np.ones((100, 4)))
+    first = cox.spill_design_matrix(X, str(tmp_path / 'a-cox-design.npy'))
+    np.testing.assert_array_equal(first, X.to_numpy())
+    size = (tmp_path / 'a-cox-design.npy').stat().st_size
+    monkeypatch.setattr(datasets, 'MAX_DATASET_CACHE_BYTES', size)
+    cox.spill_design_matrix(X, str(tmp_path / 'b-cox-design.npy'))
+    assert [path.name for path in tmp_path.iterdir()] == ['b-cox-design.npy']
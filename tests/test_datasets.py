@@ -0,0 +1,43 @@
+import os
+import time
+
+import pandas as pd
+
+from pylife import datasets
+
+
+def write(path, size, age):
+    with open(path, 'wb') as file:
+        file.write(b'x' * size)
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+
+
+def test_prune_bounds_every_kind_of_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(datasets, 'DATASET_CACHE_DIRECTORY', str(tmp_path))
+    write(tmp_path / 'a.parquet', 100, 500)
+    write(tmp_path / 'b-raw.arrow', 100, 400)
+    write(tmp_path / 'c-cox-design.npy', 100, 300)
+    write(tmp_path / 'd.parquet', 100, 200)
+    assert datasets.prune_dataset_cache(max_bytes=250) == 200
+    assert sorted(os.listdir(tmp_path)) == ['c-cox-design.npy', 'd.parquet']
+
+
+def test_prune_spares_recent_files_and_files_being_written(tmp_path, monkeypatch):
+    monkeypatch.setattr(datasets, 'DATASET_CACHE_DIRECTORY', str(tmp_path))
+    write(tmp_path / 'old.parquet.123.tmp', 100, 500)
+    write(tmp_path / 'kept.arrow', 100, 400)
+    write(tmp_path / 'new.parquet', 100, 0)
+    datasets.prune_dataset_cache(max_bytes=0, keep=str(tmp_path / 'kept.arrow'))
+    assert sorted(os.listdir(tmp_path)) == ['kept.arrow', 'new.parquet', 'old.parquet.123.tmp']
+
+
+def test_dataset_path_reuses_and_touches_the_parquet_copy(tmp_path, monkeypatch):
+    monkeypatch.setattr(datasets, 'DATASET_CACHE_DIRECTORY', str(tmp_path / 'cache'))
+    source = tmp_path / 'data.csv'
+    pd.DataFrame({'A_MAT': ['DI', 'PE'], 'LENGTH': [1.0, 2.0]}).to_csv(source, index=False)
+    cached = datasets.dataset_path(str(source))
+    os.utime(cached, (0, 0))
+    assert datasets.dataset_path(str(source)) == cached
+    assert os.path.getmtime(cached) > 0
+    pd.testing.assert_frame_equal(datasets.load_dataset(str(source)), pd.read_csv(source))
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pylife.features import compile_models, compile_pipeline
+
+COLUMNS = ['Length', 'Pressure', 'Material']
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    n = 200
+    return pd.DataFrame({'Length': rng.uniform(1, 100, n), 'Pressure': rng.uniform(1, 10, n),
+                         'Material': rng.choice(np.array(['DI', 'PE', 'CI'], dtype=object), n)})
+
+
+@pytest.fixture
+def positional_model(data):
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    # Fitted on an array, like the time-to-next-failure model, so its inputs are positions
+    encoder = ColumnTransformer([('numeric', StandardScaler(), [0, 1]),
+                                 ('onehot', OneHotEncoder(handle_unknown='ignore'), [2])])
+    target = data['Length'] * 0.1 + data['Pressure'] + data['Material'].map({'DI': 5, 'PE': 10, 'CI': 15})
+    model = Pipeline([('encode', encoder), ('forest', RandomForestRegressor(n_estimators=10, random_state=0))])
+    return model.fit(data[COLUMNS].to_numpy(dtype=object), target)
+
+
+def test_compiled_model_matches_on_arrays(positional_model, data):
+    compiled = compile_pipeline(positional_model)
+    X = data[COLUMNS].to_numpy(dtype=object)
+    np.testing.assert_allclose(compiled.predict(X), positional_model.predict(X))
+    np.testing.assert_allclose(compiled.predict(data[COLUMNS]), positional_model.predict(X))
+
+
+def test_positional_model_rejects_frames_of_another_width(positional_model, data):
+    compiled = compile_pipeline(positional_model)
+    with pytest.raises(ValueError):
+        compiled.predict(data[COLUMNS].assign(ID=1)[['ID'] + COLUMNS])
+
+
+def test_positional_model_with_column_names_reads_frames_by_name(positional_model, data):
+    compiled = compile_models({'ttnf': positional_model}, column_names=COLUMNS)['ttnf']
+    expected = positional_model.predict(data[COLUMNS].to_numpy(dtype=object))
+    shuffled = data[COLUMNS[::-1]].assign(ID=1)
+    np.testing.assert_allclose(compiled.predict(shuffled), expected)
+    with pytest.raises(KeyError):
+        compiled.predict(data[['Length', 'Material']])
+
+
+def test_column_names_have_to_match_the_model_width(positional_model):
+    with pytest.raises(ValueError):
+        compile_pipeline(positional_model, COLUMNS[:2])
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pylife.prediction_cache import PredictionCache, row_hashes
+
+
+def test_row_hashes_match_int_and_float():
+    data = pd.DataFrame({'Year': [1990, 2000]})
+    assert (row_hashes(data, ['Year']) == row_hashes(data.astype(float), ['Year'])).all()
+
+
+def test_row_hashes_keep_whitespace_and_missing_values_apart():
+    data = pd.DataFrame({'A_MAT': ['DI', ' DI', 'DI ', np.nan, 'nan', None, '']})
+    hashes = row_hashes(data, ['A_MAT'])
+    # NaN and None are both missing; every other value is its own key
+    assert hashes[3] == hashes[5]
+    assert len(set(hashes.tolist())) == 6
+
+
+def test_row_hashes_keep_numbers_and_text_apart_in_mixed_columns():
+    data = pd.DataFrame({'value': [1, 1.0, '1', None, 'None']}, dtype=object)
+    hashes = row_hashes(data, ['value'])
+    assert hashes[0] == hashes[1]
+    assert len(set(hashes.tolist())) == 4
+
+
+def test_row_hashes_of_categories_match_their_values():
+    data = pd.DataFrame({'A_MAT': ['DI', ' DI', None]})
+    categorical = data.astype('category')
+    assert (row_hashes(data, ['A_MAT']) == row_hashes(categorical, ['A_MAT'])).all()
+
+
+@pytest.fixture
+def model():
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder
+
+    rng = np.random.default_rng(0)
+    n = 400
+    train = pd.DataFrame({'LENGTH': rng.uniform(1, 100, n),
+                          'A_MAT': rng.choice(np.array(['DI', ' DI', 'PE', 'nan', None], dtype=object), n)})
+    target = train['LENGTH'] * 0.1 + train['A_MAT'].map({'DI': 5, ' DI': 10, 'PE': 15, 'nan': 20}).fillna(25)
+    encoder = ColumnTransformer([('numeric', SimpleImputer(strategy='median'), ['LENGTH']),
+                                 ('onehot', OneHotEncoder(handle_unknown='ignore'), ['A_MAT'])])
+    return Pipeline([('encode', encoder), ('forest', RandomForestRegressor(n_estimators=20, random_state=0))]).fit(train, target)
+
+
+def test_cached_predictions_match_direct_scoring(model):
+    columns = ['LENGTH', 'A_MAT']
+    cache = PredictionCache(['Prediction'])
+    warm = pd.DataFrame({'LENGTH': [50.0], 'A_MAT': ['DI']})
+    cache.resolve(row_hashes(warm, columns), lambda positions: model.predict(warm.iloc[positions]))
+
+    variants = pd.DataFrame({'LENGTH': [50.0] * 5, 'A_MAT': ['DI', ' DI', np.nan, 'nan', 'PE']})
+    cached = cache.resolve(row_hashes(variants, columns), lambda positions: model.predict(variants.iloc[positions]))[:, 0]
+    np.testing.assert_allclose(cached, model.predict(variants))
+    # Only the exact 'DI' row was served from the cache
+    assert cache.last_hits == 1
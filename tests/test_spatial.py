@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pylife.spatial import SpatialIndex, haversine_km, summarize
+
+
+@pytest.fixture
+def segments():
+    rng = np.random.default_rng(0)
+    n = 2000
+    data = pd.DataFrame({'Latitude': rng.uniform(45.0, 45.5, n), 'Longitude': rng.uniform(-73.9, -73.3, n),
+                         'Prediction': rng.uniform(0, 10, n), 'District': rng.choice(['A', 'B', 'C'], n)})
+    # Segments without coordinates are not indexed
+    data.loc[::97, 'Latitude'] = np.nan
+    return data
+
+
+@pytest.mark.parametrize('cell_size', [0.01, 0.037, 1.0])
+def test_bbox_matches_brute_force(segments, cell_size):
+    index = SpatialIndex(segments, cell_size=cell_size)
+    for box in [(45.1, -73.8, 45.2, -73.6), (45.0, -74.0, 45.5, -73.0), (44.0, -75.0, 44.5, -74.5), (45.2, -73.5, 45.2, -73.5)]:
+        min_lat, min_lon, max_lat, max_lon = box
+        expected = segments[segments['Latitude'].between(min_lat, max_lat) & segments['Longitude'].between(min_lon, max_lon)]
+        pd.testing.assert_frame_equal(index.bbox(*box), expected)
+
+
+@pytest.mark.parametrize('cell_size', [0.01, 0.037])
+def test_within_radius_matches_brute_force(segments, cell_size):
+    index = SpatialIndex(segments, cell_size=cell_size)
+    for lat, lon, radius_km in [(45.25, -73.6, 5.0), (45.0, -73.9, 12.0), (45.3, -73.4, 0.5)]:
+        distances = haversine_km(lat, lon, segments['Latitude'].to_numpy(), segments['Longitude'].to_numpy())
+        inside = distances <= radius_km
+        result = index.within_radius(lat, lon, radius_km)
+        assert sorted(result.index) == sorted(segments.index[inside])
+        np.testing.assert_allclose(result['distance_km'].to_numpy(), np.sort(distances[inside]))
+
+
+def test_cells_and_regions_match_brute_force(segments):
+    index = SpatialIndex(segments, cell_size=0.05)
+    located = segments.dropna(subset=['Latitude'])
+    cells = index.cells()
+    assert cells['segments'].sum() == len(located)
+    assert cells['max'].max() == pytest.approx(located['Prediction'].max())
+    regions = index.regions('District')
+    expected = segments.groupby('District')['Prediction'].agg(['size', 'mean'])
+    np.testing.assert_array_equal(regions['segments'], expected['size'])
+    np.testing.assert_allclose(regions['mean'], expected['mean'])
+    assert summarize(segments)['segments'] == len(segments)
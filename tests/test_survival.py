@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pylife.survival import KaplanMeierCurves
+
+
+def failures(n, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'Material': rng.choice(['DI', 'PE', 'CI'], n),
+                         'Duration': rng.integers(1, 40, n).astype(float),
+                         'Status': rng.integers(0, 2, n)})
+
+
+def assert_same_curves(synced, data):
+    expected = KaplanMeierCurves('Material').sync(data).curves()
+    pd.testing.assert_frame_equal(synced.curves().sort_index(), expected.sort_index(), check_dtype=False)
+
+
+def test_incremental_sync_matches_a_full_recompute(monkeypatch):
+    data = failures(500, 0)
+    curves = KaplanMeierCurves('Material').sync(data)
+    # Every later sync has to go through the change set, not a recount
+    monkeypatch.setattr(curves, 'reset', lambda: pytest.fail('sync counted every record again'))
+
+    appended = pd.concat([data, failures(20, 1)], ignore_index=True)
+    assert_same_curves(curves.sync(appended), appended)
+
+    edited = appended.copy()
+    edited.loc[[3, 50, 400], 'Duration'] = [2.0, 39.0, 17.0]
+    edited.loc[[7, 8], 'Status'] = 1 - edited.loc[[7, 8], 'Status']
+    edited.loc[9, 'Material'] = 'PE'
+    assert_same_curves(curves.sync(edited), edited)
+
+    deleted = edited.drop(index=[0, 1, 2, 100]).reset_index(drop=True)
+    assert_same_curves(curves.sync(deleted), deleted)
+
+
+def test_sync_drops_durations_whose_last_record_is_deleted():
+    data = failures(200, 2)
+    curves = KaplanMeierCurves('Material').sync(data)
+    last = data[(data['Material'] == 'DI') & (data['Duration'] == data['Duration'].max())]
+    remaining = data.drop(index=last.index)
+    synced = curves.sync(remaining).curves()
+    assert len(last) and data['Duration'].max() not in synced.xs('DI', level=0).index
+    assert_same_curves(curves, remaining)
+
+
+def test_curve_starts_at_one():
+    curve = KaplanMeierCurves('Material').sync(failures(100, 3)).curve('DI')
+    assert curve['survival'].iloc[0] == pytest.approx(1.0)
+    assert (np.diff(curve['survival'].to_numpy()) <= 1e-12).all()
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pylife import training, ttnf
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    n = 40
+    columns = {column: rng.uniform(1, 100, n) for column in ttnf.required_columns}
+    for column in training.TTNF_CATEGORICAL:
+        columns[column] = rng.choice(np.array(['A', 'B'], dtype=object), n)
+    return pd.DataFrame(columns).assign(**{training.TTNF_TARGET: rng.uniform(1, 10, n)})
+
+
+def test_version_names_are_unique_within_a_second():
+    assert len({training.version_name('ttnf_rf') for _ in range(20)}) == 20
+
+
+def test_retraining_never_overwrites_a_version(data, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    names = iter(['ttnf_rf_fw1-same', 'ttnf_rf_fw1-same', 'ttnf_rf_fw1-next'])
+    monkeypatch.setattr(training, 'version_name', lambda artifact: next(names))
+    grid = {'n_estimators': [5]}
+    first = training.train_artifact('ttnf_rf', data, grid=grid, n_folds=2, n_jobs=1)
+    second = training.train_artifact('ttnf_rf', data, grid=grid, n_folds=2, n_jobs=1)
+    assert first.endswith('ttnf_rf_fw1-same.pkl') and second.endswith('ttnf_rf_fw1-next.pkl')
+    assert sorted(row['version'] for row in training.list_versions()) == ['ttnf_rf_fw1-next', 'ttnf_rf_fw1-same']
+    assert not list(tmp_path.joinpath(training.VERSION_DIRECTORY).glob('*.tmp'))